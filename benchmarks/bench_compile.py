@@ -0,0 +1,103 @@
+"""Compares frames/sec of the hello_world example shape with per-frame handler binding (the way PipelineElement used to
+call handlers) against precompiled handlers and the fused loop produced by Stream.compile.
+
+Run with: python benchmarks/bench_compile.py [frames]
+"""
+import inspect
+import sys
+import time
+
+from strom import *
+
+
+@stream_source(all_at_once=True)
+def range_source(up_until=20):
+    return list(range(up_until))
+
+
+@stream_transformer
+def add_number(frame, number=0):
+    return frame + number
+
+
+@stream_gate(fatal=False)
+def is_even(frame):
+    return frame % 2 == 0
+
+
+@stream_sink
+def collect_sink(frame, result):
+    result.append(frame)
+
+
+def build_stream(frames):
+    stream = Stream()
+    stream.source = range_source(frames)
+    stream.add(add_number(10))
+
+    even_stream = stream.split()
+    even_stream.add(is_even())
+    even_stream.sink = collect_sink([])
+
+    stream.sink = collect_sink([])
+    return stream, even_stream
+
+
+def per_frame_binding(element):
+    """Reproduces the old PipelineElement.call_handler which inspected the handler signature on every call."""
+    def call_handler(*args):
+        handler_signature = inspect.signature(element._handler, follow_wrapped=False)
+        if 'self' in handler_signature.parameters:
+            args_head, *args_tail = element._handler_args
+            args_for_handler = [args_head] + list(args) + args_tail
+        else:
+            args_for_handler = args + element._handler_args
+        return element._handler(*args_for_handler, **element._handler_kwargs)
+    return call_handler
+
+
+def run_interpreted(stream):
+    while not stream.is_closed():
+        frame = stream.get_frame()
+        if frame is not None:
+            stream.sink.process(frame)
+
+
+def bench_before(frames):
+    stream, even_stream = build_stream(frames)
+    for s in (stream, even_stream):
+        for element in [s.source, s.sink] + s.elements:
+            element._call = per_frame_binding(element)
+
+    start = time.perf_counter()
+    run_interpreted(stream)
+    run_interpreted(even_stream)
+    return time.perf_counter() - start
+
+
+def bench_precompiled(frames):
+    stream, even_stream = build_stream(frames)
+    start = time.perf_counter()
+    run_interpreted(stream)
+    run_interpreted(even_stream)
+    return time.perf_counter() - start
+
+
+def bench_fused(frames):
+    stream, even_stream = build_stream(frames)
+    start = time.perf_counter()
+    stream.compile()()
+    even_stream.compile()()
+    return time.perf_counter() - start
+
+
+def main(frames=200000):
+    for name, bench in [('per-frame binding', bench_before),
+                        ('precompiled handlers', bench_precompiled),
+                        ('Stream.compile', bench_fused)]:
+        duration = bench(frames)
+        print("%-22s %12.0f frames/sec" % (name, frames / duration))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,63 @@
+"""Measures CsvSource throughput and peak memory on a large generated file.
+
+Run with: python benchmarks/bench_csv_source.py [rows]
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from strom import Stream, stream_sink
+from strom.stdlib import CsvSource
+
+
+@stream_sink
+def count_sink(frame, counter):
+    counter[0] += 1
+
+
+def generate_file(filename, rows):
+    with open(filename, 'w') as csv_file:
+        csv_file.write('id;name;score;comment\n')
+        for idx in range(rows):
+            csv_file.write('%d;name%d;%f;some comment text for row %d\n' % (idx, idx % 1000, idx / 3, idx))
+
+
+def bench(name, make_source, rows, batch_size=None):
+    counter = [0]
+    start = time.perf_counter()
+    Stream(source=make_source(), sink=count_sink(counter)).run(batch_size=batch_size)
+    duration = time.perf_counter() - start
+
+    # tracemalloc slows everything down, so memory is measured in a separate pass
+    tracemalloc.start()
+    Stream(source=make_source(), sink=count_sink([0])).run(batch_size=batch_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("%-28s %10d frames %12.0f rows/sec  peak %8.1f KiB" % (name, counter[0], rows / duration, peak / 1024))
+
+
+def main(rows=1000000):
+    handle, filename = tempfile.mkstemp(suffix='.csv')
+    os.close(handle)
+    try:
+        generate_file(filename, rows)
+        print("%s: %d rows, %.1f MiB" % (filename, rows, os.path.getsize(filename) / 2 ** 20))
+
+        bench('rows', lambda: CsvSource(filename), rows)
+        bench('rows, batched', lambda: CsvSource(filename), rows, batch_size=1024)
+        bench('rows, usecols+dtype',
+              lambda: CsvSource(filename, usecols=['id', 'score'], dtype={'id': int, 'score': float}), rows)
+        if importlib.util.find_spec('pandas') is None:
+            print('pandas is not installed, skipping chunk mode')
+        else:
+            bench('chunks of 100k', lambda: CsvSource(filename, chunks=True, chunksize=100000), rows)
+    finally:
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,91 @@
+"""Times the railroad diagram layout on synthetic streams: a deep one (a single long chain of transformers), a wide one
+(many splits off one stream) and a nested one (every split splitting again). The layout pass runs on its own; if
+svgwrite is installed, drawing the whole diagram is timed as well.
+
+Run with: python benchmarks/bench_railroad.py [elements]
+"""
+import sys
+import time
+
+from strom import *
+from strom.painter import RailroadDiagram
+
+try:
+    import svgwrite
+except ImportError:
+    svgwrite = None
+
+
+@stream_source
+def numbers():
+    yield from range(10)
+
+
+@stream_transformer
+def add_one(frame):
+    return frame + 1
+
+
+@stream_sink
+def discard(frame):
+    pass
+
+
+def deep_stream(elements):
+    stream = Stream(source=numbers(), sink=discard())
+    for _ in range(elements):
+        stream.add(add_one())
+    return stream
+
+
+def wide_stream(elements):
+    stream = Stream(source=numbers(), sink=discard())
+    for _ in range(elements // 2):
+        branch = stream.split()
+        branch.add(add_one())
+        branch.sink = discard()
+    return stream
+
+
+def nested_stream(elements):
+    stream = Stream(source=numbers(), sink=discard())
+    current = stream
+    for _ in range(elements // 2):
+        current.add(add_one())
+        current = current.split()
+        current.sink = discard()
+    return stream
+
+
+class _Element:
+    """Stands in for svgwrite elements and the drawing, so that the layout can be timed without svgwrite."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: _Element()
+
+
+def time_layout(stream):
+    start = time.perf_counter()
+    symbols = RailroadDiagram._create_symbols(stream, _Element())
+    placed = RailroadDiagram._place_symbols(symbols)
+    return len(placed), time.perf_counter() - start
+
+
+def time_draw(stream):
+    start = time.perf_counter()
+    RailroadDiagram(stream).draw()
+    return time.perf_counter() - start
+
+
+def main():
+    elements = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print('%-8s %10s %12s %12s' % ('shape', 'symbols', 'layout [ms]', 'draw [ms]'))
+    for name, build in [('deep', deep_stream), ('wide', wide_stream), ('nested', nested_stream)]:
+        stream = build(elements)
+        symbols, layout_seconds = time_layout(stream)
+        draw = '%12.1f' % (time_draw(stream) * 1000) if svgwrite is not None else '%12s' % 'n/a'
+        print('%-8s %10d %12.1f %s' % (name, symbols, layout_seconds * 1000, draw))
+
+
+if __name__ == '__main__':
+    main()
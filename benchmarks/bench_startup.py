@@ -0,0 +1,70 @@
+"""Measures the cold start of the strom command line with python -X importtime and checks it against a budget, so that
+CI can catch imports creeping into the startup path. Fails (exit code 1) if importing strom.command_line takes longer
+than the budget, or if it pulls in any of the modules which must only be imported once an element needs them.
+
+The package is byte-compiled first, so the measurement doesn't include compiling the sources.
+
+Run with: python benchmarks/bench_startup.py [--budget-ms 50] [--runs 5]
+"""
+import argparse
+import compileall
+import os
+import subprocess
+import sys
+
+# Modules the command line must not import by itself: optional dependencies and the machinery of optional features.
+LAZY_MODULES = ['pandas', 'numpy', 'svgwrite', 'strom.painter', 'strom.parallel', 'strom.asynchronous',
+                'multiprocessing', 'concurrent.futures', 'asyncio']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module):
+    """Imports module in a fresh interpreter and returns the import times (module name -> (self, cumulative)) in us."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module], env=env,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=50.0, help='The cold start budget in milliseconds')
+    parser.add_argument('--runs', type=int, default=5, help='The number of measurements, the fastest counts')
+    parser.add_argument('--module', default='strom.command_line', help='The module to import')
+    args = parser.parse_args()
+
+    compileall.compile_dir(os.path.join(ROOT, 'strom'), quiet=1)
+    runs = [measure(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda times: times[args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    print('%-40s %12s %12s' % ('module', 'self [ms]', 'total [ms]'))
+    for name, (self_us, cumulative_us) in sorted(best.items(), key=lambda item: -item[1][1])[:15]:
+        print('%-40s %12.2f %12.2f' % (name, self_us / 1000, cumulative_us / 1000))
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append('importing %s takes %.1f ms, the budget is %.1f ms' % (args.module, total_ms, args.budget_ms))
+    eager = [name for name in LAZY_MODULES if name in best]
+    if eager:
+        failures.append('importing %s imports %s' % (args.module, ", ".join(eager)))
+
+    print()
+    for failure in failures:
+        print('FAIL: %s' % failure)
+    if not failures:
+        print('OK: importing %s takes %.1f ms (budget %.1f ms)' % (args.module, total_ms, args.budget_ms))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,11 +7,14 @@ setup(name='strom',
       author='Christian Weichel',
       author_email='info@32leav.es',
       license='MIT',
-      packages=['strom'],
+      packages=['strom', 'strom.stdlib'],
       zip_safe=False,
       entry_points={
           'console_scripts': ['strom=strom.command_line:main'],
       },
-      install_requires=['pandas', 'svgwrite'])
+      extras_require={
+          'pandas': ['pandas'],
+          'railroad': ['svgwrite'],
+      })
 
 
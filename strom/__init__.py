@@ -2,5 +2,9 @@ from .model import stream_source
 from .model import stream_transformer
 from .model import stream_gate
 from .model import stream_sink
+from .model import stream_barrier
 
 from .model import Stream
+from .runtime import Runtime
+from .records import record_type
+from .records import RecordBatch
@@ -0,0 +1,175 @@
+"""asyncio runtime for streams, see Stream.run_async.
+
+A stream runs as a chain of tasks connected by bounded queues: one task draws frames from the source, one task per
+stage transforms them and one task feeds them to the sink. Consecutive synchronous elements are fused into a single
+stage, so only async elements pay for the hand-over between tasks.
+"""
+import asyncio
+import inspect
+from collections import deque
+
+from strom.model import Gate, GateFailedException
+
+# Put into a queue after the last frame.
+_END = object()
+
+
+async def run_stream(stream, concurrency=1, queue_size=64):
+    stages = _create_stages(stream.elements, concurrency)
+    sink = _create_stage([stream.sink], concurrency)
+    queues = [asyncio.Queue(queue_size) for _ in range(len(stages) + 1)]
+
+    tasks = [asyncio.ensure_future(_produce(stream.source, queues[0]))]
+    for stage, inbox, outbox in zip(stages, queues, queues[1:]):
+        tasks.append(asyncio.ensure_future(_run_stage(stage, inbox, outbox)))
+    tasks.append(asyncio.ensure_future(_run_stage(sink, queues[-1], None)))
+
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def _produce(source, outbox):
+    async for frame in _source_frames(source):
+        await outbox.put(frame)
+    await outbox.put(_END)
+
+
+async def _source_frames(source, batch_size=64):
+    if inspect.isasyncgenfunction(source._handler):
+        async for frame in source._call():
+            if frame is not None:
+                yield frame
+    elif source.is_async:
+        while not source.is_closed():
+            frame = await source._call()
+            if frame is not None:
+                yield frame
+    else:
+        # synchronous sources may block, so we ask them for frames from the executor, a batch at a time
+        loop = asyncio.get_running_loop()
+        while True:
+            frames = await loop.run_in_executor(None, _next_frames, source, batch_size)
+            if frames is None:
+                return
+            for frame in frames:
+                yield frame
+
+
+# How long the executor waits for an idle synchronous source at a time, which bounds how long a cancelled stream keeps
+# an executor thread busy.
+IDLE_WAIT = 0.1
+
+
+def _next_frames(source, size):
+    """Returns a batch of frames from the source, None once it is closed. If it has no frame ready, waits for it (see
+    Source.wait) like a synchronous run does, so that idle streams don't keep asking.
+    """
+    if source.is_closed():
+        return None
+    frames = source.get_batch(size)
+    if not frames and not source.is_closed():
+        source.wait(IDLE_WAIT)
+    return frames
+
+
+class _Stage:
+    """A step of the async pipeline: either a single async element or a run of fused synchronous elements."""
+
+    def __init__(self, step, flush, is_async, concurrency):
+        self.step = step
+        self.flush = flush
+        self.is_async = is_async
+        self.concurrency = concurrency
+
+
+def _create_stages(elements, concurrency):
+    stages = []
+    run = []
+    for element in elements:
+        if element.is_async:
+            if run:
+                stages.append(_create_stage(run, concurrency))
+                run = []
+            stages.append(_create_stage([element], concurrency))
+        else:
+            run.append(element)
+    if run:
+        stages.append(_create_stage(run, concurrency))
+    return stages
+
+
+def _create_stage(elements, concurrency):
+    if len(elements) == 1 and elements[0].is_async:
+        element = elements[0]
+        return _Stage(_async_step(element), getattr(element, 'flush', tuple), True, concurrency)
+
+    steps = tuple(element.compile() for element in elements)
+
+    def step(frame):
+        for element_step in steps:
+            if frame is None: break
+            frame = element_step(frame)
+        return frame
+
+    def flush():
+        result = []
+        for idx, element in enumerate(elements):
+            for frame in getattr(element, 'flush', tuple)():
+                for element_step in steps[idx + 1:]:
+                    if frame is None: break
+                    frame = element_step(frame)
+                if frame is not None:
+                    result.append(frame)
+        return result
+
+    return _Stage(step, flush, False, 1)
+
+
+def _async_step(element):
+    call = element._call
+
+    if isinstance(element, Gate):
+        is_fatal = element._is_fatal
+
+        async def passes_gate(frame):
+            if await call(frame):
+                return frame
+            if is_fatal:
+                raise GateFailedException("Frame %s did not pass gate %s" % (str(frame), str(element)))
+            return None
+        return passes_gate
+
+    return call
+
+
+async def _run_stage(stage, inbox, outbox):
+    async def emit(frame):
+        if frame is not None and outbox is not None:
+            await outbox.put(frame)
+
+    step = stage.step
+    pending = deque()
+    while True:
+        frame = await inbox.get()
+        if frame is _END:
+            break
+
+        if not stage.is_async:
+            await emit(step(frame))
+        elif stage.concurrency == 1:
+            await emit(await step(frame))
+        else:
+            pending.append(asyncio.ensure_future(step(frame)))
+            while pending and (pending[0].done() or len(pending) >= stage.concurrency):
+                await emit(await pending.popleft())
+
+    while pending:
+        await emit(await pending.popleft())
+    for frame in stage.flush():
+        await emit(frame)
+    if outbox is not None:
+        await outbox.put(_END)
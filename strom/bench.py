@@ -0,0 +1,176 @@
+"""Benchmark suite measuring the per-frame overhead of strom, run with `strom bench`.
+
+Each benchmark builds a stream, runs it over a fixed number of frames and reports frames/sec and nanoseconds per frame.
+Results can be written as JSON and compared against an earlier run to catch regressions.
+"""
+import json
+import os
+import platform
+import tempfile
+import time
+
+from strom.model import Stream, stream_source, stream_transformer, stream_gate, stream_sink
+from strom.runtime import Runtime
+
+
+@stream_source
+def _counter(count):
+    yield from range(count)
+
+
+@stream_source
+def _payloads(count, size):
+    payload = bytes(size)
+    for _ in range(count):
+        yield payload
+
+
+@stream_transformer
+def _increment(frame):
+    return frame + 1
+
+
+@stream_transformer
+def _payload_size(frame):
+    return len(frame) and frame
+
+
+@stream_gate
+def _keep_percent(frame, percent):
+    return frame % 100 < percent
+
+
+@stream_sink
+def _discard(frame):
+    pass
+
+
+def _empty(frames):
+    return [Stream(source=_counter(frames), sink=_discard())]
+
+
+def _chain(length):
+    def build(frames):
+        stream = Stream(source=_counter(frames), sink=_discard())
+        for _ in range(length):
+            stream.add(_increment())
+        return [stream]
+    return build
+
+
+def _gates(percent):
+    def build(frames):
+        stream = Stream(source=_counter(frames), sink=_discard())
+        for _ in range(4):
+            stream.add(_keep_percent(percent))
+        return [stream]
+    return build
+
+
+def _fan_out(width):
+    def build(frames):
+        stream = Stream(source=_counter(frames), sink=_discard())
+        for _ in range(width):
+            stream.split().sink = _discard()
+        return [stream]
+    return build
+
+
+def _large_frames(size):
+    def build(frames):
+        stream = Stream(source=_payloads(frames, size), sink=_discard())
+        for _ in range(3):
+            stream.add(_payload_size())
+        return [stream]
+    return build
+
+
+def _csv(frames):
+    from strom.stdlib.sources import CsvSource
+
+    handle, filename = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(handle, 'w') as csv_file:
+        csv_file.write('id;name;score\n')
+        for idx in range(frames):
+            csv_file.write('%d;name%d;%f\n' % (idx, idx % 1000, idx / 3))
+    return [Stream(source=CsvSource(filename), sink=_discard())], lambda: os.remove(filename)
+
+
+# name -> function building the streams of the benchmark for a number of frames
+BENCHMARKS = {
+    'empty': _empty,
+    'chain_10': _chain(10),
+    'chain_100': _chain(100),
+    'gates_1pct': _gates(1),
+    'gates_50pct': _gates(50),
+    'gates_99pct': _gates(99),
+    'split_1': _fan_out(1),
+    'split_4': _fan_out(4),
+    'split_16': _fan_out(16),
+    'frames_64k': _large_frames(64 * 1024),
+    'csv_source': _csv,
+}
+
+
+def run_benchmark(name, frames, repeat=3):
+    """Runs a benchmark repeat times and returns the result of the fastest run as a dictionary."""
+    build = BENCHMARKS[name]
+    best = None
+    for _ in range(repeat):
+        built = build(frames)
+        streams, cleanup = built if isinstance(built, tuple) else (built, None)
+        try:
+            start = time.perf_counter()
+            if len(Runtime.find_streams(streams)) > 1:
+                Runtime(streams).run()
+            else:
+                streams[0].run()
+            duration = time.perf_counter() - start
+        finally:
+            if cleanup is not None:
+                cleanup()
+        best = duration if best is None else min(best, duration)
+
+    return {
+        'name': name,
+        'frames': frames,
+        'seconds': best,
+        'frames_per_second': frames / best,
+        'ns_per_frame': best * 1e9 / frames,
+    }
+
+
+def run_suite(names=None, frames=100000, repeat=3):
+    """Runs the given benchmarks (all if names is None) and returns a JSON-serializable report."""
+    names = list(BENCHMARKS) if names is None else names
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'timestamp': time.time(),
+        'results': [run_benchmark(name, frames, repeat) for name in names],
+    }
+
+
+def format_report(report, baseline=None):
+    """Renders a report as a table. If a baseline report is given, each benchmark is compared against it."""
+    baseline_results = {} if baseline is None else {r['name']: r for r in baseline['results']}
+    lines = []
+    for result in report['results']:
+        line = "%-14s %14.0f frames/sec %10.1f ns/frame" % (result['name'], result['frames_per_second'],
+                                                          result['ns_per_frame'])
+        if result['name'] in baseline_results:
+            ratio = result['ns_per_frame'] / baseline_results[result['name']]['ns_per_frame']
+            line += "  %+6.1f%%" % ((ratio - 1) * 100)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def load_report(filename):
+    with open(filename) as report_file:
+        return json.load(report_file)
+
+
+def save_report(report, filename):
+    with open(filename, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
@@ -0,0 +1,170 @@
+"""Bounded caches for memoizing transformers and gates, see stream_transformer(cache=...).
+
+All caches count their hits and misses, so the hit rate can be checked when tuning their size. They are thread-safe,
+which threaded transformers rely on; the handler itself is called outside the lock.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Marks a key which is not in the cache, as None is a value worth caching (e.g. a dropped frame).
+MISSING = object()
+
+
+def create_cache(cache):
+    """Turns the cache option of stream_transformer and stream_gate into a cache: an int is the number of entries of an
+    LRUCache, anything else is used as the cache as is.
+    """
+    if isinstance(cache, bool):
+        raise ValueError('cache must be the number of entries or a cache, not a bool')
+    if isinstance(cache, int):
+        return LRUCache(cache)
+    return cache
+
+
+class Cache:
+    """Base class of caches, keeping entries in an OrderedDict whose first entry is the next to evict."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key):
+        """Returns the value cached for key, or MISSING."""
+        with self._lock:
+            value = self._lookup(key)
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def wrap(self, function, key=None, scope=None):
+        """Returns a memoizing version of a function taking a single frame. The frame itself is the cache key, unless a
+        key function is given which computes the key from the frame. If given, scope is made part of every key, so that
+        functions wrapped with different scopes can share the cache without seeing each other's entries.
+        """
+        get = self.get
+        put = self.put
+
+        def memoized(frame):
+            frame_key = frame if key is None else key(frame)
+            if scope is not None:
+                frame_key = (scope, frame_key)
+            value = get(frame_key)
+            if value is MISSING:
+                value = function(frame)
+                put(frame_key, value)
+            return value
+        return memoized
+
+
+class LRUCache(Cache):
+    """Keeps the maxsize most recently used entries."""
+
+    def __init__(self, maxsize=1024):
+        super().__init__()
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+
+    def _lookup(self, key):
+        value = self._entries.get(key, MISSING)
+        if value is not MISSING:
+            self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class SizedLRUCache(Cache):
+    """Keeps the most recently used entries which fit into max_bytes. The size of an entry is estimated with sizeof,
+    sys.getsizeof of key and value by default, which doesn't follow references; pass a deeper function for nested values.
+    """
+
+    def __init__(self, max_bytes, sizeof=None):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._sizeof = sizeof or (lambda key, value: sys.getsizeof(key) + sys.getsizeof(value))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _store(self, key, value):
+        size = self._sizeof(key, value)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[1]
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+
+class TTLCache(Cache):
+    """Keeps entries for ttl seconds after they were stored, and at most maxsize of them (oldest go first)."""
+
+    def __init__(self, ttl, maxsize=None, clock=time.monotonic):
+        super().__init__()
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        if entry[0] <= self._clock():
+            del self._entries[key]
+            return MISSING
+        return entry[1]
+
+    def _store(self, key, value):
+        now = self._clock()
+        self._entries.pop(key, None)
+        self._entries[key] = (now + self.ttl, value)
+
+        # entries are in the order they expire, as they all live equally long
+        entries = self._entries
+        while entries:
+            oldest_key, (expires, _) = next(iter(entries.items()))
+            if expires > now and (self.maxsize is None or len(entries) <= self.maxsize):
+                break
+            del entries[oldest_key]
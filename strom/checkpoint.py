@@ -0,0 +1,186 @@
+"""Checkpoints of a running stream, see Stream.enable_checkpoints and Stream.run(resume_from=...).
+
+A checkpoint records the position of the stream's source (see Source.position) and the state of every element which
+opts in by implementing get_state and set_state. Checkpoints are taken between two frames, so they are consistent: every
+frame before the position has made it through the whole stream. Frames processed after the last checkpoint are
+processed again after resuming, i.e. sinks see them at least once. Streams with elements which hold frames beyond the
+current one (threaded transformers, process stages, splits, ...) cannot be checkpointed, as these frames would be lost.
+
+Taking a checkpoint pickles it on the stream's thread; writing it to disk happens on a background thread. The file is
+written to a temporary file which then replaces the checkpoint, so a checkpoint is never torn even if the process dies
+while writing it.
+"""
+import os
+import pickle
+import threading
+import time
+
+CHECKPOINT_VERSION = 1
+
+
+def has_state(element):
+    return hasattr(element, 'get_state') and hasattr(element, 'set_state')
+
+
+def snapshot(stream):
+    """Returns the checkpoint of a stream as a dictionary."""
+    return {
+        'version': CHECKPOINT_VERSION,
+        'position': stream.source.position(),
+        'states': {idx: element.get_state() for idx, element in enumerate(stream.elements) if has_state(element)},
+    }
+
+
+def load_checkpoint(path):
+    """Reads a checkpoint, returns None if there is none at path."""
+    try:
+        with open(path, 'rb') as checkpoint_file:
+            checkpoint = pickle.load(checkpoint_file)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError('%s is not a checkpoint this version of strom can read' % path)
+    return checkpoint
+
+
+def restore(stream, checkpoint):
+    """Moves the source of a stream to the checkpoint's position and restores the state of its elements."""
+    for idx, state in checkpoint['states'].items():
+        if idx >= len(stream.elements) or not has_state(stream.elements[idx]):
+            raise ValueError('Checkpoint does not match the elements of stream %s' % str(stream))
+        stream.elements[idx].set_state(state)
+    if checkpoint['position'] is not None:
+        stream.source.seek(checkpoint['position'])
+
+
+def write_atomically(path, data):
+    """Writes data to path such that path holds either the old or the new content, whenever the process may die."""
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as temporary_file:
+        temporary_file.write(data)
+        temporary_file.flush()
+        os.fsync(temporary_file.fileno())
+    os.replace(temporary_path, path)
+
+    # make the rename itself durable, where the platform lets us open directories
+    try:
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory)
+    except OSError:
+        pass
+    finally:
+        os.close(directory)
+
+
+class CheckpointWriter:
+    """Writes checkpoints on a background thread. If checkpoints come in faster than they can be written, only the most
+    recent one is written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._condition = threading.Condition()
+        self._pending = None
+        self._writing = False
+        self._closed = False
+        self._error = None
+        self._thread = threading.Thread(target=self._write_pending, name='strom-checkpoints', daemon=True)
+        self._thread.start()
+
+    def submit(self, data):
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            self._pending = data
+            self._condition.notify()
+
+    def close(self):
+        """Waits for the pending checkpoint to be written and stops the writer thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _write_pending(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                data, self._pending = self._pending, None
+            try:
+                write_atomically(self.path, data)
+            except OSError as error:
+                with self._condition:
+                    self._error = error
+                return
+
+
+class Checkpointer:
+    """Takes a checkpoint of a stream every interval seconds while it runs and once more when it is done."""
+
+    # the clock is only looked at every that many frames
+    CHECK_EVERY = 64
+
+    def __init__(self, stream, path, interval):
+        self.stream = stream
+        self.path = path
+        self.interval = interval
+        self._writer = None
+        self._countdown = self.CHECK_EVERY
+        self._next_checkpoint = None
+
+    def checkpoint(self):
+        # buffered sinks write what they hold, so that every frame before the position has reached the sink's output
+        sync = getattr(self.stream.sink, 'sync', None)
+        if sync is not None:
+            sync()
+        if self._writer is None:
+            self._writer = CheckpointWriter(self.path)
+        self._writer.submit(pickle.dumps(snapshot(self.stream), protocol=pickle.HIGHEST_PROTOCOL))
+
+    def due(self):
+        """Called between frames, takes a checkpoint once interval seconds have passed since the last one."""
+        self._countdown -= 1
+        if self._countdown > 0:
+            return
+        self._countdown = self.CHECK_EVERY
+
+        now = time.monotonic()
+        if self._next_checkpoint is None:
+            self._next_checkpoint = now + self.interval
+        elif now >= self._next_checkpoint:
+            self._next_checkpoint = now + self.interval
+            self.checkpoint()
+
+    def finish(self):
+        """Takes the final checkpoint once the stream is done."""
+        self.checkpoint()
+        self.close()
+
+    def close(self):
+        """Waits for the checkpoint being written, without taking a new one. This is what happens when a run fails, as
+        the stream may be in the middle of a frame.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._next_checkpoint = None
+
+    def wrap(self, get):
+        """Wraps the callable drawing frames from the source so that checkpoints are taken before drawing."""
+        for element in self.stream.elements:
+            if not getattr(element, 'checkpointable', True):
+                raise ValueError('%s holds frames in flight and cannot be checkpointed' % str(element))
+        due = self.due
+
+        def get_with_checkpoints(*args):
+            due()
+            return get(*args)
+        return get_with_checkpoints
@@ -1,7 +1,6 @@
 import inspect
 import sys
 import argparse
-import json
 
 from strom import Stream
 
@@ -29,11 +28,75 @@ class StromCommandLine(object):
         parser = argparse.ArgumentParser(description='Draws a railroad diagram for a stream')
         parser.add_argument('--module', help='The Python module which defines the stream', action='store')
         parser.add_argument('--save', help='The output filename', action='store_true')
+        parser.add_argument('--profile', help='Run the streams for up to N frames (0: until they close) and annotate '
+                            'the diagram with where the time goes', type=int, metavar='N', action='store')
         args = parser.parse_args(sys.argv[2:])
         module = __import__(args.module, fromlist=[1])
         streams = inspect.getmembers(module, lambda x: isinstance(x, Stream))
+        if args.profile is not None:
+            from strom.metrics import profile_stream
+            for stream in self._root_streams([stream for _, stream in streams]):
+                profile_stream(stream, args.profile or None)
         for idx, stream in enumerate(streams):
-            print(RailroadDiagram(stream[1]).draw("output_%d.svg" % idx))
+            print(RailroadDiagram(stream[1], profile=args.profile is not None).draw("output_%d.svg" % idx))
+
+    @staticmethod
+    def _root_streams(streams):
+        """Returns the streams which aren't split off from any of the others."""
+        from strom.runtime import Runtime
+
+        split_off = set()
+        for stream in streams:
+            split_off.update(id(split) for split in Runtime.find_streams([stream])[1:])
+        return [stream for stream in streams if id(stream) not in split_off]
+
+    def run(self):
+        from strom.runtime import Runtime
+
+        parser = argparse.ArgumentParser(description='Runs the streams of a module along with their splits')
+        parser.add_argument('--module', help='The Python module which defines the streams', action='store',
+                            required=True)
+        parser.add_argument('--stream', help='Only run the stream of this name (variable or stream name)',
+                            action='store')
+        args = parser.parse_args(sys.argv[2:])
+        module = __import__(args.module, fromlist=[1])
+        streams = inspect.getmembers(module, lambda x: isinstance(x, Stream))
+        if args.stream is not None:
+            streams = [(name, stream) for name, stream in streams if args.stream in (name, stream.name)]
+            if not streams:
+                parser.error('module %s has no stream %s' % (args.module, args.stream))
+        if not streams:
+            parser.error('module %s has no streams' % args.module)
+
+        streams = Runtime.find_streams([stream for _, stream in streams])
+        without_sink = [str(stream) for stream in streams if stream.sink is None]
+        if without_sink:
+            parser.error('streams without sink: %s' % ", ".join(without_sink))
+        if len(streams) == 1:
+            streams[0].run()
+        else:
+            Runtime(streams).run()
+
+    def bench(self):
+        from strom import bench
+
+        parser = argparse.ArgumentParser(description='Runs the strom benchmark suite')
+        parser.add_argument('names', help='The benchmarks to run (default: all): %s' % ", ".join(bench.BENCHMARKS),
+                            nargs='*')
+        parser.add_argument('--frames', help='The number of frames per benchmark', type=int, default=100000)
+        parser.add_argument('--repeat', help='The number of runs per benchmark, the fastest counts', type=int, default=3)
+        parser.add_argument('--json', help='Write the results to this file as JSON', action='store')
+        parser.add_argument('--compare', help='Compare against the JSON results of an earlier run', action='store')
+        args = parser.parse_args(sys.argv[2:])
+        unknown = [name for name in args.names if name not in bench.BENCHMARKS]
+        if unknown:
+            parser.error('unknown benchmarks: %s' % ", ".join(unknown))
+
+        report = bench.run_suite(args.names or None, args.frames, args.repeat)
+        baseline = bench.load_report(args.compare) if args.compare else None
+        print(bench.format_report(report, baseline))
+        if args.json:
+            bench.save_report(report, args.json)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
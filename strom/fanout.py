@@ -0,0 +1,289 @@
+"""Fan-out buffers connecting a stream with the streams split off from it, see Stream.split.
+
+A stream writes each frame reaching a split into the split's buffer once, and every split stream reads it from there
+through its own cursor, so splitting a stream many ways at the same point costs a single write per frame. Only the
+writing stream removes frames from the buffer, once every reader has passed them. Readers merely move their cursor,
+so a buffer needs no lock as long as its readers keep up.
+
+A buffer holds at most capacity frames (any number if None); what happens once it is full is up to its overflow
+policy:
+
+- 'block': the writing stream waits until the slowest reader has made room. This only makes sense if the split
+  streams run on other threads or next to their origin in a Runtime. A writer which would wait for readers that cannot
+  make progress raises a SplitBufferBlocked error instead: readers which run on the writer's own thread, or which no
+  split stream has read from for START_TIMEOUT seconds. Buffers of streams run by a Runtime are scheduled: the runtime
+  doesn't draw frames for a stream whose blocking buffers are full, so frames which elements hand out on their own
+  (see Transformer.poll and flush) may take the buffer beyond its capacity instead of blocking the runtime's thread.
+- 'drop_oldest': the oldest frames are dropped, readers which haven't read them yet skip them (see dropped).
+- 'spill': further frames are pickled to a temporary file until the readers have caught up again.
+"""
+import array
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from strom.model import Stream, Transformer, stream_source
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'spill')
+
+# Marks a frame which isn't in memory, either because it has been dropped or because it has been spilled to disk.
+_MISSING = object()
+
+
+class SplitBufferBlocked(RuntimeError):
+    """Raised by a stream writing into a full 'block' buffer whose readers cannot catch up."""
+    pass
+
+
+class FanOutBuffer:
+    """A buffer written by one stream and read by any number of split streams, each through its own cursor. The writer
+    closes the buffer once its stream is done, after which readers close as soon as they have read all frames.
+    """
+
+    # How long a blocked writer sleeps at most before checking whether readers made room.
+    POLL_INTERVAL = 0.001
+
+    # How long a blocked writer waits for readers which have not read anything yet, e.g. because the thread running
+    # their stream is just starting.
+    START_TIMEOUT = 1.0
+
+    def __init__(self, capacity=None, overflow='block', spill_directory=None):
+        if capacity is not None and capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of %s' % ", ".join(OVERFLOW_POLICIES))
+        self.capacity = capacity
+        self.overflow = overflow
+        self.spill_directory = spill_directory
+        self.dropped = 0
+        self.closed = False
+        self.scheduled = False
+        self._readers = []
+        # frames by their index, from the oldest frame still held (start) up to the next one written (end)
+        self._frames = {}
+        self._start = 0
+        self._end = 0
+        self._trim_at = 64 if capacity is None else min(64, capacity)
+        # frames from spill_base on are in the spill file, at the offsets given (the last offset is where the next goes)
+        self._spill_file = None
+        self._spill_base = None
+        self._spill_offsets = None
+        self._space = threading.Condition()
+        self._blocked = False
+
+    def add_reader(self):
+        """Returns a new reader, which gets the frames written from now on."""
+        reader = FanOutReader(self)
+        self._readers.append(reader)
+        return reader
+
+    def remove_reader(self, reader):
+        self._readers.remove(reader)
+        self._trim()
+
+    def qsize(self):
+        """Returns the number of frames the slowest reader has yet to read."""
+        return self._end - self._low()
+
+    def _low(self):
+        return min((reader.cursor for reader in self._readers), default=self._end)
+
+    def put(self, frame):
+        """Writes a frame for all readers and returns it."""
+        if not self._readers:
+            return frame
+        if self._end - self._start >= self._trim_at:
+            self._make_room()
+
+        if self._spill_base is not None:
+            self._spill(frame)
+        else:
+            self._frames[self._end] = frame
+        self._end += 1
+        return frame
+
+    def put_batch(self, batch):
+        for frame in batch:
+            self.put(frame)
+        return batch
+
+    def close(self):
+        """Tells the readers that no more frames are coming. Closing a closed buffer does nothing."""
+        self.closed = True
+
+    def _trim(self):
+        """Forgets the frames every reader has read. Returns the number of frames still held."""
+        low = max(self._low(), self._start)
+        frames = self._frames
+        for index in range(self._start, min(low, self._end if self._spill_base is None else self._spill_base)):
+            frames.pop(index, None)
+        self._start = low
+
+        if self._spill_base is not None and low == self._end:
+            # everyone caught up, start over with an empty spill file
+            os.ftruncate(self._spill_file.fileno(), 0)
+            self._spill_base = None
+
+        held = self._end - self._start
+        # scanning the readers is amortized over at least as many frames as there are readers
+        self._trim_at = max(2 * held, held + len(self._readers), 64)
+        if self.capacity is not None:
+            self._trim_at = min(self._trim_at, self.capacity)
+        return held
+
+    def _make_room(self):
+        held = self._trim()
+        if self.capacity is None or held < self.capacity:
+            return
+
+        if self.overflow == 'drop_oldest':
+            # dropping a bit more than needed keeps us from scanning the readers for every frame
+            count = held - self.capacity + 1 + self.capacity // 8
+            count = min(count, len(self._frames))
+            for index in range(self._start, self._start + count):
+                self._frames.pop(index, None)
+            self._start += count
+            self.dropped += count
+        elif self.overflow == 'spill':
+            if self._spill_base is None:
+                self._spill_base = self._end
+            self._trim_at = self._end - self._start + self.capacity
+        elif self.scheduled:
+            # the scheduler holds back the stream until the readers caught up, check again once they might have
+            self._trim_at = held + 1
+        else:
+            self._blocked = True
+            deadline = time.monotonic() + self.START_TIMEOUT
+            try:
+                with self._space:
+                    while self._trim() >= self.capacity:
+                        self._check_readers(deadline)
+                        self._space.wait(self.POLL_INTERVAL)
+            finally:
+                self._blocked = False
+
+    def _check_readers(self, deadline):
+        """Raises SplitBufferBlocked if the readers holding up the blocked writer cannot make progress."""
+        low = self._low()
+        stuck = [reader for reader in self._readers if reader.cursor == low]
+        if any(reader.thread == threading.get_ident() for reader in stuck):
+            raise SplitBufferBlocked('Split buffer of capacity %d is full, and its readers run on the thread writing to '
+                                     'it. Run the split streams along with their origin in a strom.runtime.Runtime, '
+                                     'or on threads of their own.' % self.capacity)
+        if all(reader.thread is None for reader in stuck) and time.monotonic() >= deadline:
+            raise SplitBufferBlocked('Split buffer of capacity %d is full, and no split stream has read from it for '
+                                     '%s seconds. Split streams must run on threads of their own or in a '
+                                     'strom.runtime.Runtime.' % (self.capacity, self.START_TIMEOUT))
+
+    def _spill(self, frame):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix='strom-split-', dir=self.spill_directory)
+            self._spill_offsets = array.array('q', [0])
+        index = self._end - self._spill_base
+        if index == 0:
+            del self._spill_offsets[1:]
+        data = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+        offset = self._spill_offsets[index]
+        os.pwrite(self._spill_file.fileno(), data, offset)
+        self._spill_offsets.append(offset + len(data))
+
+    def _read_spilled(self, index):
+        offsets = self._spill_offsets
+        position = index - self._spill_base
+        start, end = offsets[position], offsets[position + 1]
+        return pickle.loads(os.pread(self._spill_file.fileno(), end - start, start))
+
+    def _wake_writer(self):
+        with self._space:
+            self._space.notify()
+
+
+class FanOutReader:
+    """A cursor into a FanOutBuffer."""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self.cursor = buffer._end
+        self.dropped = 0
+        # the thread which read first, blocked writers check that it isn't themselves
+        self.thread = None
+
+    def is_closed(self):
+        """Returns whether the writer has closed the buffer and this reader has read all frames."""
+        return self._buffer.closed and self.cursor >= self._buffer._end
+
+    def pending(self):
+        """Returns the number of frames written which this reader has yet to read."""
+        return self._buffer._end - self.cursor
+
+    def get(self):
+        """Returns the next frame, or None if there is none yet."""
+        if self.thread is None:
+            self.thread = threading.get_ident()
+        buffer = self._buffer
+        cursor = self.cursor
+        while cursor < buffer._end:
+            if cursor < buffer._start:
+                # the frames up to start have been dropped
+                self.dropped += buffer._start - cursor
+                cursor = buffer._start
+                continue
+            frame = buffer._frames.get(cursor, _MISSING)
+            if frame is _MISSING:
+                spill_base = buffer._spill_base
+                if spill_base is None or cursor < spill_base:
+                    # dropped while we looked
+                    continue
+                frame = buffer._read_spilled(cursor)
+            self.cursor = cursor + 1
+            if buffer._blocked:
+                buffer._wake_writer()
+            return frame
+
+        self.cursor = cursor
+        return None
+
+
+class SplitTransformer(Transformer):
+    """Writes the frames reaching it into the fan-out buffer its split streams read from, and passes them on."""
+
+    # frames the split streams haven't read yet would be lost when resuming from a checkpoint
+    checkpointable = False
+
+    def __init__(self, buffer):
+        super().__init__(buffer.put, (), {})
+        self.is_split_stream = True
+        self.split_buffer = buffer
+        self.split_streams = []
+        self._readers = []
+
+    def __str__(self):
+        return 'split'
+
+    def compile_batch(self):
+        return self.split_buffer.put_batch
+
+    def flush(self):
+        # the frames elements before us held back have been written by now
+        self.split_buffer.close()
+        return ()
+
+    def add_split(self, origin):
+        """Returns a new stream which gets every frame reaching this split of origin. It closes once origin is done and
+        it has read all frames, which it learns from the buffer rather than from origin's source, as the split stream
+        may run on another thread.
+        """
+        reader = self.split_buffer.add_reader()
+        split = Stream()
+        split.source = stream_source(reader.get, closer=reader.is_closed)()
+        self._readers.append(reader)
+        self.split_streams.append(split)
+        return split
+
+    def remove_split(self, stream):
+        """Disconnects a split stream, which no longer gets any frames."""
+        idx = self.split_streams.index(stream)
+        del self.split_streams[idx]
+        self.split_buffer.remove_reader(self._readers.pop(idx))
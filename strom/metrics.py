@@ -0,0 +1,227 @@
+"""Per-element runtime metrics, see Stream.enable_stats.
+
+Instrumentation is applied when a stream is compiled: each element's callable is wrapped by one which times it and
+counts the frames going in and out. Streams without stats enabled are compiled from the bare callables and pay
+nothing.
+"""
+import time
+
+from strom.model import Gate, Sink, Source, Transformer
+
+
+class LatencyHistogram:
+    """Histogram of call latencies with power-of-two nanosecond buckets: bucket i counts calls which took at least
+    2**(i-1) and less than 2**i nanoseconds.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * 64
+
+    def add(self, nanoseconds):
+        self.buckets[min(nanoseconds.bit_length(), 63)] += 1
+
+    def quantile(self, q):
+        """Returns an upper bound, in seconds, for the latency of the given quantile of calls (e.g. 0.99)."""
+        count = sum(self.buckets)
+        if not count:
+            return 0.0
+        threshold = q * count
+        seen = 0
+        for idx, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= threshold:
+                return (1 << idx) / 1e9
+        return (1 << 63) / 1e9
+
+
+class ElementStats:
+    """Metrics recorded for a single stream element.
+
+    For sources, frames counts calls to get_frame and passed the calls which delivered a frame. For transformers and
+    gates, passed counts frames which made it through and dropped those which were turned into None or filtered out.
+    In batch mode, calls counts batches and frames counts the frames in them.
+    """
+
+    def __init__(self, element):
+        self.name = str(element)
+        self.kind = _element_kind(element)
+        self.calls = 0
+        self.frames = 0
+        self.passed = 0
+        self.total_time = 0
+        self.histogram = LatencyHistogram()
+
+    @property
+    def dropped(self):
+        return self.frames - self.passed
+
+    @property
+    def seconds(self):
+        """The time spent in the element, in seconds."""
+        return self.total_time / 1e9
+
+    @property
+    def frames_per_second(self):
+        """The number of frames the element could handle per second if it ran on its own."""
+        return self.frames / self.seconds if self.total_time else 0.0
+
+    @property
+    def selectivity(self):
+        """The share of frames which made it through the element."""
+        return self.passed / self.frames if self.frames else 1.0
+
+    def record(self, nanoseconds, frames, passed):
+        self.calls += 1
+        self.frames += frames
+        self.passed += passed
+        self.total_time += nanoseconds
+        self.histogram.add(nanoseconds)
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'calls': self.calls,
+            'frames': self.frames,
+            'passed': self.passed,
+            'dropped': self.dropped,
+            'seconds': self.seconds,
+            'frames_per_second': self.frames_per_second,
+            'p50': self.histogram.quantile(0.5),
+            'p99': self.histogram.quantile(0.99),
+        }
+
+    def __str__(self):
+        text = "%-8s %-24s %10d frames %12.0f frames/sec  p50 < %.1fus  p99 < %.1fus" % (
+            self.kind, self.name, self.frames, self.frames_per_second,
+            self.histogram.quantile(0.5) * 1e6, self.histogram.quantile(0.99) * 1e6)
+        if self.kind in ('gate', 'source', 'transformer'):
+            text += "  %d passed, %d dropped" % (self.passed, self.dropped)
+        return text
+
+
+def _element_kind(element):
+    if isinstance(element, Source):
+        return 'source'
+    if isinstance(element, Gate):
+        return 'gate'
+    if isinstance(element, Transformer):
+        return 'transformer'
+    if isinstance(element, Sink):
+        return 'sink'
+    return type(element).__name__.lower()
+
+
+def format_stats(stats):
+    """Renders a list of ElementStats as text, one element per line."""
+    return "\n".join(str(element_stats) for element_stats in stats)
+
+
+def print_stats(stats):
+    """A reporter printing the stats."""
+    print(format_stats(stats))
+
+
+class StatsReporting:
+    """Hands a stream's stats to its reporter, at most once per interval."""
+
+    def __init__(self, stream, reporter, interval):
+        self.stream = stream
+        self.reporter = reporter
+        self.interval = int(interval * 1e9)
+        self.next_report = None
+
+    def report(self):
+        if self.reporter is not None:
+            self.reporter(self.stream.stats())
+
+    def due(self, now):
+        if self.next_report is None:
+            self.next_report = now + self.interval
+        elif now >= self.next_report:
+            self.next_report = now + self.interval
+            self.report()
+
+
+def profile_stream(stream, max_frames=None, quantum=64):
+    """Runs a stream along with the streams split off from it with stats enabled, so that the stats of their elements
+    show where the time goes (see strom railroad --profile).
+
+    :param max_frames: the number of frames drawn from the stream's source, all of them if None
+    :param quantum: the number of frames the stream processes before its splits get to process theirs
+    """
+    from strom.runtime import Runtime
+
+    streams = Runtime.find_streams([stream])
+    for profiled in streams:
+        if profiled.sink is None:
+            raise ValueError('Stream %s has no sink' % str(profiled))
+        profiled.enable_stats()
+    for profiled in streams:
+        for buffer in Runtime._split_buffers(profiled):
+            buffer.scheduled = True
+    run_step = stream.compile_step()
+    buffers = Runtime._split_buffers(stream)
+    splits = [(split.compile_step(), Runtime._split_buffers(split)) for split in streams[1:]]
+
+    def run_splits():
+        # like a Runtime, never fill a blocking buffer as its readers run on this thread as well
+        for split_step, split_buffers in list(splits):
+            if split_step(Runtime.step_limit(split_buffers, float('inf'))) is None:
+                splits.remove((split_step, split_buffers))
+
+    drawn = count = 0
+    while max_frames is None or drawn < max_frames:
+        limit = Runtime.step_limit(buffers, quantum if max_frames is None else min(quantum, max_frames - drawn))
+        count = run_step(limit) if limit > 0 else 0
+        if count is None:
+            break
+        drawn += count
+        run_splits()
+        if not count and limit > 0:
+            stream.source.wait()
+
+    # once the stream is closed, each split closes as soon as it has drawn all its frames
+    if count is None:
+        while splits:
+            run_splits()
+
+
+def instrument(element, call, batch=False, reporting=None):
+    """Wraps the compiled callable of an element so that it records the element's stats. When given, reporting is
+    checked for a due report after each call, which is what the source callable of a stream does.
+    """
+    if getattr(element, 'stats', None) is None:
+        element.stats = ElementStats(element)
+    record = element.stats.record
+    clock = time.perf_counter_ns
+    is_sink = isinstance(element, Sink)
+
+    if isinstance(element, Source):
+        def instrumented_source(*args):
+            start = clock()
+            result = call(*args)
+            end = clock()
+            if batch:
+                record(end - start, len(result), len(result))
+            else:
+                record(end - start, 1, result is not None)
+            if reporting is not None:
+                reporting.due(end)
+            return result
+        return instrumented_source
+
+    if batch:
+        def instrumented_batch(frames):
+            start = clock()
+            result = call(frames)
+            record(clock() - start, len(frames), len(frames) if is_sink else len(result))
+            return result
+        return instrumented_batch
+
+    def instrumented(frame):
+        start = clock()
+        result = call(frame)
+        record(clock() - start, 1, is_sink or result is not None)
+        return result
+    return instrumented
@@ -1,6 +1,13 @@
 import inspect
 from queue import Queue
 import functools
+import itertools
+import threading
+import time
+import types
+from collections import deque
+
+from strom.records import as_batch
 
 
 class PipelineElement:
@@ -11,19 +18,42 @@ class PipelineElement:
         self._handler = handler
         self._handler_args = args
         self._handler_kwargs = kwargs
+        self._call = None if handler is None else PipelineElement._bind_handler(handler, args, kwargs)
+        self.is_async = inspect.iscoroutinefunction(handler) or inspect.isasyncgenfunction(handler)
+
+    @staticmethod
+    def _bind_handler(handler, args, kwargs):
+        """Works out how the handler expects to be called and returns a callable which only takes the frame arguments.
+        Doing this once at construction time keeps signature inspection out of the per-frame path.
+        """
+        args = tuple(args)
+        try:
+            parameters = inspect.signature(handler, follow_wrapped=False).parameters
+        except (TypeError, ValueError):
+            parameters = {}
 
-    def call_handler(self, *args):
         # if the handler's first argument is called self, then chances are we've decorated a class method which expects
         # the object instance as first parameter. Let's make sure it gets that one.
-        args_for_handler = []
-        handler_signature = inspect.signature(self._handler, follow_wrapped=False)
-        if 'self' in handler_signature.parameters:
-            args_head, *args_tail = self._handler_args
-            args_for_handler = [args_head] + list(args) + args_tail
-        else:
-            args_for_handler = args + self._handler_args
+        if 'self' in parameters and args:
+            instance, args_tail = args[0], args[1:]
+            if not args_tail and not kwargs:
+                return types.MethodType(handler, instance)
+
+            def bound_handler(*frame_args):
+                return handler(instance, *frame_args, *args_tail, **kwargs)
+            return bound_handler
+
+        if not args and not kwargs:
+            return handler
+        if not args:
+            return functools.partial(handler, **kwargs)
 
-        return self._handler(*args_for_handler, **self._handler_kwargs)
+        def bound_handler(*frame_args):
+            return handler(*frame_args, *args, **kwargs)
+        return bound_handler
+
+    def call_handler(self, *args):
+        return self._call(*args)
 
     def __str__(self):
         return super().__str__() if self._handler is None else self._handler.__name__
@@ -40,6 +70,8 @@ class Stream(PipelineElement):
         self.source = source
         self.sink = sink
         self.elements = []
+        self._stats_reporting = None
+        self._checkpointer = None
 
     def __str__(self):
         if self.name is None:
@@ -66,75 +98,468 @@ class Stream(PipelineElement):
         return frame
 
     def is_closed(self):
-        """Checks if the source can deliver any more frames."""
-        return self.source.is_closed()
-
-    def split(self):
-        class SplitSourceContext:
-            def __init__(self, origin):
-                self.frames = Queue()
-                self._origin = origin
-
-            def closer(self):
-                return self._origin.is_closed() and self.frames.empty()
-
-            def source(self):
-                return self.frames.get_nowait()
-
-            @stream_transformer
-            def transformer(self, frame):
-                self.frames.put_nowait(frame)
-                return frame
-
-        my_split = SplitSourceContext(self)
-        split_transformer = my_split.transformer()
-        split_transformer.is_split_stream = True
-        self.add(split_transformer)
-        result = Stream()
-        result.source = stream_source(my_split.source, all_at_once=False, closer=my_split.closer)()
-        split_transformer.split_stream = result
-        return result
+        """Checks if the source can deliver any more frames. Once it can't, the streams split off from this one are told
+        that no more frames are coming, as they are when a compiled stream flushes.
+        """
+        closed = self.source.is_closed()
+        if closed:
+            self._close_splits()
+        return closed
+
+    def _close_splits(self):
+        """Closes the buffers of the splits of this stream, whose streams close once they have read all frames."""
+        for element in self.elements:
+            if getattr(element, 'is_split_stream', False):
+                element.split_buffer.close()
+
+    def split(self, capacity=None, overflow='block', spill_directory=None):
+        """Splits off a new stream which gets every frame reaching this point of the stream. The frames are buffered
+        until the new stream draws them, see strom.runtime.Runtime for running a stream along with its splits.
+
+        Streams split off at the same point share one buffer (see strom.fanout), which each of them reads through its
+        own cursor, so every frame is buffered once no matter how many ways the stream splits.
+
+        :param capacity: the number of frames the buffer holds at most, any number if None
+        :param overflow: what happens when the buffer is full: 'block' the stream until its splits caught up (which
+            requires them to run on other threads or in a Runtime, see strom.fanout), drop the oldest frames
+            ('drop_oldest') or 'spill' frames to a temporary file in spill_directory
+        """
+        from strom.fanout import FanOutBuffer, SplitTransformer
+
+        last = self.elements[-1] if self.elements else None
+        if (not isinstance(last, SplitTransformer) or last.split_buffer.capacity != capacity or
+                capacity is not None and (last.split_buffer.overflow, last.split_buffer.spill_directory) !=
+                (overflow, spill_directory)):
+            last = SplitTransformer(FanOutBuffer(capacity, overflow, spill_directory))
+            self.add(last)
+        return last.add_split(self)
+
+    def optimize(self):
+        """Rewrites this stream and its splits before they run: removes splits nobody consumes and elements which do
+        nothing, and fuses adjacent transformers and gates into a single element (see strom.optimizer). Returns a list
+        of descriptions of what changed.
+        """
+        from strom.optimizer import optimize
+        return optimize(self)
+
+    def parallelize(self, start, stop=None, workers=None):
+        """Moves the elements from start up to (excluding) stop into a pool of worker processes. This is meant for
+        CPU-bound transformers and gates, which would otherwise compete for the GIL. Returns the ProcessStage which took
+        the elements' place.
+        """
+        from strom.parallel import ProcessStage
+
+        stop = len(self.elements) if stop is None else stop
+        stage = ProcessStage(self.elements[start:stop], workers)
+        self.elements[start:stop] = [stage]
+        return stage
+
+    def partition(self, key, workers=None, start=0, stop=None, queue_size=16, chunk_size=64):
+        """Moves the elements from start up to (excluding) stop into worker processes, each running its own copy of
+        them. Frames are routed to a worker by the hash of key(frame), so stateful elements see all frames of a key.
+        Returns the PartitionStage which took the elements' place (see strom.parallel).
+
+        :param queue_size: the number of chunks which may be waiting for each worker
+        :param chunk_size: the number of frames sent to a worker at a time. Frames wait until their chunk is full or the
+            source closes, so streams from live sources may want a smaller chunk_size.
+        """
+        from strom.parallel import PartitionStage
+
+        stop = len(self.elements) if stop is None else stop
+        stage = PartitionStage(self.elements[start:stop], key, workers, queue_size, chunk_size)
+        self.elements[start:stop] = [stage]
+        return stage
+
+    def compile(self, batch_size=None, idle_timeout=None):
+        """Fuses source, elements and sink into a single loop and returns it as a callable which, when called, processes
+        all frames the source is willing to give. The elements are captured when compiling, so elements added to the
+        stream afterwards are not part of the compiled loop.
+
+        Whenever the source has no frame ready, the loop waits for it (see Source.wait) instead of spinning.
+
+        :param batch_size: if set, frames are drawn from the source in batches of up to batch_size frames and moved
+            through the elements as a whole. Elements which work on single frames are adapted automatically.
+        :param idle_timeout: if set, the loop also ends once the source had no frame ready for this many seconds, even
+            though it isn't closed. Frames held back by elements are flushed either way.
+        """
+        self._check_synchronous()
+        if batch_size is not None:
+            return self._compile_batched(batch_size, idle_timeout)
+
+        is_closed = self.source.is_closed
+        get_frame, steps, process = self._compile_elements()
+        emit = self._compile_emit(steps, process)
+        poll, _ = self._compile_poll(emit)
+        wait_until_ready = self._compile_wait(idle_timeout, *self._compile_poll(emit, idle=True))
+        flush = self._compile_flush(emit)
+
+        def run_compiled():
+            idle_since = None
+            while not is_closed():
+                frame = get_frame()
+                if frame is None:
+                    idle_since = wait_until_ready(idle_since)
+                    if idle_since is None: break
+                    continue
+                idle_since = None
+                for step in steps:
+                    frame = step(frame)
+                    if frame is None: break
+                else:
+                    process(frame)
+                if poll is not None:
+                    poll()
+            flush()
+
+        return run_compiled
+
+    def compile_step(self):
+        """Compiles the stream like compile does, but returns a callable which processes at most max_frames frames per
+        call, so that a scheduler can interleave several streams (see strom.runtime). The callable returns the number of
+        frames it drew from the source, which is less than max_frames if the source had no frame ready. Once the source
+        is closed and the stream flushed, it returns None.
+        """
+        self._check_synchronous()
+        is_closed = self.source.is_closed
+        get_frame, steps, process = self._compile_elements()
+        emit = self._compile_emit(steps, process)
+        poll, _ = self._compile_poll(emit)
+        idle_poll, _ = self._compile_poll(emit, idle=True)
+        flush = self._compile_flush(emit)
+        flushed = []
+
+        def run_step(max_frames):
+            if flushed:
+                return None
+
+            count = 0
+            while count < max_frames and not is_closed():
+                frame = get_frame()
+                if frame is None: break
+                count += 1
+                for step in steps:
+                    if frame is None: break
+                    frame = step(frame)
+                if frame is not None:
+                    process(frame)
+                if poll is not None:
+                    poll()
+            if idle_poll is not None:
+                idle_poll()
+
+            # flush right away, so that no other stream sees our source closed before the held back frames are out
+            if is_closed():
+                flush()
+                flushed.append(True)
+            return count
+
+        return run_step
+
+    def _compile_batched(self, batch_size, idle_timeout):
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1')
+
+        is_closed = self.source.is_closed
+        get_batch, steps, process = self._compile_elements(batch=True)
+        emit = self._compile_emit(steps, process, batch=True)
+        poll, _ = self._compile_poll(emit)
+        wait_until_ready = self._compile_wait(idle_timeout, *self._compile_poll(emit, idle=True))
+        flush = self._compile_flush(emit)
+
+        def run_batched():
+            idle_since = None
+            while not is_closed():
+                batch = get_batch(batch_size)
+                if not batch:
+                    idle_since = wait_until_ready(idle_since)
+                    if idle_since is None: break
+                    continue
+                idle_since = None
+                for step in steps:
+                    if not len(batch): break
+                    batch = step(batch)
+                if len(batch):
+                    process(batch)
+                if poll is not None:
+                    poll()
+            flush()
+
+        return run_batched
+
+    def _compile_wait(self, idle_timeout, poll=None, poll_timeout=None):
+        """Returns a callable which waits for the source once it had no frame ready. It takes the time since which the
+        source is idle (None if it just became idle) and returns that time, or None once idle_timeout is exceeded. If
+        elements are polled (see _compile_poll), they are polled before waiting and the wait ends in time for them to
+        be polled again.
+        """
+        wait = self.source.wait
+        clock = time.monotonic
+
+        def wait_until_ready(idle_since):
+            if poll is not None:
+                poll()
+            now = clock()
+            if idle_since is None:
+                idle_since = now
+
+            timeout = None
+            if idle_timeout is not None:
+                timeout = idle_timeout - (now - idle_since)
+                if timeout <= 0:
+                    return None
+            if poll_timeout is not None:
+                next_poll = poll_timeout()
+                if next_poll is not None and (timeout is None or next_poll < timeout):
+                    timeout = next_poll
+            wait(timeout)
+            return idle_since
+
+        return wait_until_ready
+
+    def _compile_elements(self, batch=False):
+        """Compiles source, elements and sink. Returns the callable drawing frames (or batches) from the source, the
+        callables of the elements and the callable of the sink. If stats are enabled, these are instrumented.
+        """
+        if batch:
+            get = self.source.get_batch
+            steps = [element.compile_batch() for element in self.elements]
+            process = self.sink.compile_batch()
+        else:
+            get = self.source.get_frame
+            steps = [element.compile() for element in self.elements]
+            process = self.sink.compile()
+
+        if self._stats_reporting is not None:
+            from strom.metrics import instrument
+            get = instrument(self.source, get, batch, self._stats_reporting)
+            steps = [instrument(element, step, batch) for element, step in zip(self.elements, steps)]
+            process = instrument(self.sink, process, batch)
+        if self._checkpointer is not None:
+            get = self._checkpointer.wrap(get)
+        return get, tuple(steps), process
+
+    def _compile_emit(self, steps, process, batch=False):
+        """Returns a callable which takes the index of an element and frames it handed out on its own (see
+        Transformer.flush and poll), and floats them through the rest of the stream. With stats enabled, the frames
+        count as passed by the element.
+        """
+        elements = self.elements
+        counted = self._stats_reporting is not None
+
+        def emit(idx, frames):
+            frames = list(frames)
+            if counted:
+                elements[idx].stats.passed += len(frames)
+            if batch:
+                frames = [frames]
+            for frame in frames:
+                for step in steps[idx + 1:]:
+                    if frame is None or batch and not len(frame): break
+                    frame = step(frame)
+                if frame is not None and (not batch or len(frame)):
+                    process(frame)
+
+        return emit
+
+    def _compile_poll(self, emit, idle=False):
+        """Returns a callable which polls the elements overriding Transformer.poll and emits the frames they hand out,
+        and a callable returning how long the stream may wait for its source before polling them again (see
+        Transformer.poll_timeout). Both are None if no element polls, so such streams don't pay for polling. Polls
+        while the stream is idle also include the sink (see Sink.poll), which checks on itself with every frame anyway.
+        """
+        polled = [(idx, element) for idx, element in enumerate(self.elements)
+                  if getattr(type(element), 'poll', Transformer.poll) is not Transformer.poll]
+        if idle and type(self.sink).poll is not Sink.poll:
+            polled.append((None, self.sink))
+        if not polled:
+            return None, None
+        polls = tuple((idx, element.poll) for idx, element in polled)
+        timeouts = tuple(element.poll_timeout for _, element in polled)
+
+        def poll():
+            for idx, element_poll in polls:
+                frames = element_poll()
+                if frames:
+                    emit(idx, frames)
+
+        def poll_timeout():
+            result = None
+            for element_timeout in timeouts:
+                timeout = element_timeout()
+                if timeout is not None and (result is None or timeout < result):
+                    result = timeout
+            return result
+
+        return poll, poll_timeout
+
+    def _compile_flush(self, emit):
+        """Returns a callable which floats the frames elements still hold once the source is closed through the rest of
+        the stream.
+        """
+        flushes = tuple(enumerate(element.flush for element in self.elements))
+        sink_flush = self.sink.flush
+        reporting = self._stats_reporting
+        checkpointer = self._checkpointer
+
+        def flush():
+            for idx, element_flush in flushes:
+                emit(idx, element_flush())
+            sink_flush()
+
+            if reporting is not None:
+                reporting.report()
+            if checkpointer is not None:
+                checkpointer.finish()
+
+        return flush
+
+    def _check_synchronous(self):
+        async_elements = [str(e) for e in [self.source] + self.elements + [self.sink] if getattr(e, 'is_async', False)]
+        if async_elements:
+            raise ValueError('Stream %s has async elements (%s), use run_async to run it' %
+                             (str(self), ", ".join(async_elements)))
+
+    def enable_stats(self, reporter=None, interval=1.0):
+        """Instruments the source, elements and sink of this stream the next time it is compiled or run, so that they
+        record call counts, timings and how many frames they pass or drop (see strom.metrics). Streams which don't
+        enable stats are compiled without any instrumentation.
+
+        :param reporter: a callable which is handed the stream's stats every interval seconds while the stream runs, and
+            once more when it is done
+        :param interval: the number of seconds between two reports
+        """
+        from strom.metrics import StatsReporting
+        self._stats_reporting = StatsReporting(self, reporter, interval)
+
+    def disable_stats(self):
+        """Stops instrumenting this stream, starting with the next time it is compiled or run."""
+        self._stats_reporting = None
+
+    def enable_checkpoints(self, path, interval=10.0):
+        """Takes a checkpoint of the stream every interval seconds while it runs, and once more when it's done, and
+        writes it to path (see strom.checkpoint). Pass the same path to run(resume_from=...) to continue an interrupted
+        run.
+        """
+        from strom.checkpoint import Checkpointer
+        self._checkpointer = Checkpointer(self, path, interval)
+
+    def disable_checkpoints(self):
+        """Stops taking checkpoints, starting with the next time the stream is compiled or run."""
+        self._checkpointer = None
+
+    def resume(self, path):
+        """Restores source position and element state from the checkpoint at path. Returns False if there is none."""
+        from strom.checkpoint import load_checkpoint, restore
 
-    def run(self):
+        checkpoint = load_checkpoint(path)
+        if checkpoint is None:
+            return False
+        restore(self, checkpoint)
+        return True
+
+    def stats(self):
+        """Returns the stats recorded by source, elements and sink (see enable_stats) in stream order."""
+        elements = [self.source] + self.elements + [self.sink]
+        return [element.stats for element in elements if getattr(element, 'stats', None) is not None]
+
+    def run(self, batch_size=None, idle_timeout=None, resume_from=None):
         """Processes all frames the source is willing to give, meaning this method calls get_frame and feeds it to the
         sink until the source is closed.
+
+        :param batch_size: if set, the stream runs in batch mode (see compile).
+        :param idle_timeout: if set, the stream also stops once its source had no frame ready for this many seconds.
+        :param resume_from: if set and a checkpoint exists at this path, the stream continues where the checkpoint was
+            taken (see enable_checkpoints).
         """
-        while not self.is_closed():
-            frame = self.get_frame()
-            if frame is not None:
-                self.sink.process(frame)
+        if resume_from is not None:
+            self.resume(resume_from)
+        try:
+            self.compile(batch_size, idle_timeout)()
+        except BaseException:
+            if self._checkpointer is not None:
+                self._checkpointer.close()
+            self.sink.close()
+            self._close_splits()
+            raise
+
+    async def run_async(self, concurrency=1, queue_size=64):
+        """Coroutine which processes all frames the source is willing to give on the running event loop. Sources,
+        transformers, gates and sinks may be coroutine functions, and sources may also be async generators. Synchronous
+        sources are run in the loop's executor as they may block. Many streams can run concurrently on one loop, e.g.
+        using asyncio.gather.
+
+        :param concurrency: the number of frames each async transformer, gate or sink works on at a time. Frames still
+            leave each element in the order they came in.
+        :param queue_size: the number of frames buffered between two elements
+        """
+        from strom.asynchronous import run_stream
+        try:
+            await run_stream(self, concurrency, queue_size)
+        except BaseException:
+            self._close_splits()
+            raise
 
 
 class SourceIsClosedException(Exception):
     """Exception used to denote that a source can no longer deliver frames."""
     pass
 
-def stream_source(method=None, all_at_once=False, closer=None):
+def stream_source(method=None, all_at_once=False, closer=None, waiter=None):
     # If called without method, we've been called with optional arguments.
     # We return a decorator with the optional arguments filled in.
     # Next time round we'll be decorating method.
     if method is None:
-        return functools.partial(stream_source, all_at_once=all_at_once, closer=closer)
+        return functools.partial(stream_source, all_at_once=all_at_once, closer=closer, waiter=waiter)
     @functools.wraps(method)
     def f(*args, **kwargs):
-        return Source(method, args, kwargs, all_at_once, closer)
+        return Source(method, args, kwargs, all_at_once, closer, waiter)
     return f
 
 class Source(PipelineElement):
-    """A source delivers frames into a stream."""
+    """A source delivers frames into a stream.
 
-    def __init__(self, handler, args, kwargs, all_at_once=False, closer=None):
+    Sources come in two flavours. Iterating sources (all_at_once=True, or any generator function) call their handler
+    once and pull frames from the iterable it returns one at a time, in order, until it is exhausted. The handler may
+    return a list, a generator or any other iterable, so the input does not have to fit into memory. Async generators
+    are iterated the same way by Stream.run_async. All other sources call their handler for every frame and rely on the
+    closer to tell when they are done.
+
+    Sources which call their handler for every frame may have no frame ready, in which case the handler returns None and
+    the stream waits for the source (see wait) rather than asking again right away.
+    """
+
+    # How long wait sleeps at most if the source has no waiter and isn't notified.
+    POLL_INTERVAL = 0.001
+
+    def __init__(self, handler, args, kwargs, all_at_once=False, closer=None, waiter=None):
         super().__init__(handler, args, kwargs)
-        self.all_at_once = all_at_once
+        self.all_at_once = all_at_once or inspect.isgeneratorfunction(handler) or inspect.isasyncgenfunction(handler)
         self.closer = closer
-        self._data = None
-        if not all_at_once and closer is None:
-            raise ValueError('Sources which are not all_at_once must have a closer')
+        self.waiter = waiter
+        self._notified = threading.Event()
+        self._frames = None
+        self._next_frame = _NO_FRAME
+        self._exhausted = False
+        self._delivered = 0
+        if not self.all_at_once and closer is None:
+            raise ValueError('Sources which are neither all_at_once nor generators must have a closer')
+
+    def _pull_next_frame(self):
+        """Pulls the next frame from the iterable so that we know whether we're closed before get_frame is called."""
+        if self._frames is None:
+            self._frames = iter(self._call())
+        try:
+            self._next_frame = next(self._frames)
+        except StopIteration:
+            self._exhausted = True
+            self._frames = None
 
     def is_closed(self):
         """Determines if this source can deliver any more frames. Once a source is closed, it must not re-open again."""
         if self.all_at_once:
-            return not(self._data is None or self._data)
+            if self._next_frame is _NO_FRAME and not self._exhausted:
+                self._pull_next_frame()
+            return self._exhausted
         else:
             return self.closer()
 
@@ -146,34 +571,305 @@ class Source(PipelineElement):
             raise SourceIsClosedException()
 
         if self.all_at_once:
-            if self._data is None:
-                self._data = self.call_handler()
-            return self._data.pop()
+            frame, self._next_frame = self._next_frame, _NO_FRAME
+            self._delivered += 1
+            return frame
         else:
-            return self.call_handler()
+            return self._call()
 
+    def position(self):
+        """Returns the position of the source in its input, which seek takes to continue from there (see strom.checkpoint).
+        For iterating sources, this is the number of frames delivered so far. Sources calling their handler for every
+        frame have no position and return None.
+        """
+        return self._delivered if self.all_at_once else None
+
+    def _frame_pending(self):
+        """Returns whether the next frame has already been pulled from the iterable, but not delivered yet."""
+        return self._next_frame is not _NO_FRAME
+
+    def seek(self, position):
+        """Continues the input at a position returned by position, skipping the frames before it. Iterating sources do
+        so by pulling and dropping as many frames, so their iterable must deliver the same frames every time. Seeking is
+        only possible before the first frame has been pulled.
+        """
+        if not self.all_at_once:
+            raise ValueError('Source %s has no position to seek to' % str(self))
+        if self._frames is not None or self._exhausted:
+            raise ValueError('Source %s can only seek before its first frame' % str(self))
+
+        self._frames = iter(self._call())
+        next(itertools.islice(self._frames, position, position), None)
+        self._delivered = position
+
+    def wait(self, timeout=None):
+        """Blocks until the source may have a frame ready or may have closed, for at most timeout seconds (forever if
+        None). Sources created with a waiter hand this over to it; the waiter can use a selector, a condition variable or
+        a blocking get with timeout. Otherwise the source sleeps until another thread calls notify, but for no longer
+        than POLL_INTERVAL, so that sources which never notify still get polled.
+        """
+        if self.waiter is not None:
+            self.waiter(timeout)
+        elif not self.all_at_once:
+            self._notified.wait(self.POLL_INTERVAL if timeout is None else min(timeout, self.POLL_INTERVAL))
+            self._notified.clear()
+
+    def notify(self):
+        """Wakes up a stream waiting for this source, meant to be called by whoever makes new frames available."""
+        self._notified.set()
+
+    def get_batch(self, size):
+        """Returns a list of up to size frames. The batch is cut short when the source closes or has no frame ready,
+        i.e. returns None.
+        """
+        if self.all_at_once:
+            if self.is_closed():
+                return []
+            batch = [self._next_frame]
+            self._next_frame = _NO_FRAME
+            batch.extend(itertools.islice(self._frames, size - 1))
+            self._delivered += len(batch)
+            return [frame for frame in batch if frame is not None]
 
-def stream_sink(method=None):
+        batch = []
+        while len(batch) < size and not self.is_closed():
+            frame = self.get_frame()
+            if frame is None: break
+            batch.append(frame)
+        return batch
+
+
+# Marks the absence of a pulled frame, as None is what sources return when they have no frame ready.
+_NO_FRAME = object()
+
+
+def stream_sink(method=None, batch=False, batch_size=None, flush_interval=None, background=False):
+    """Turns a function into a sink factory.
+
+    :param batch: the function takes a whole batch of frames
+    :param batch_size: if set, frames are buffered and the function is handed batches of this many frames (see
+        BufferedSink)
+    :param flush_interval: if set, buffered frames are handed over once they are this many seconds old, even if there
+        are fewer than batch_size
+    :param background: buffered batches are handed to the function on a writer thread
+    """
     # If called without method, we've been called with optional arguments.
     # We return a decorator with the optional arguments filled in.
     # Next time round we'll be decorating method.
     if method is None:
-        return functools.partial(stream_sink)
+        return functools.partial(stream_sink, batch=batch, batch_size=batch_size, flush_interval=flush_interval,
+                                 background=background)
     @functools.wraps(method)
     def f(*args, **kwargs):
-        return Sink(method, args, kwargs)
+        if batch_size is not None or flush_interval is not None or background:
+            return BufferedSink(method, args, kwargs, batch_size, flush_interval, background)
+        return Sink(method, args, kwargs, batch)
     return f
 
 
 class Sink(PipelineElement):
-    """A sink draws from a stream and stores/displays the frames."""
+    """A sink draws from a stream and stores/displays the frames. Batch sinks get a whole batch (a list or array of
+    frames) per call instead of a single frame.
+    """
 
-    def __init__(self, handler, args, kwargs):
+    def __init__(self, handler, args, kwargs, batch=False):
         super().__init__(handler, args, kwargs)
+        self.batch = batch
 
     def process(self, frame):
         """Each call to this method processes a single frame."""
-        self.call_handler(frame)
+        if self.batch:
+            self._call([frame])
+        else:
+            self._call(frame)
+
+    def compile(self):
+        """Returns a callable processing a single frame, bypassing process() unless a subclass overrides it."""
+        if self.batch or type(self).process is not Sink.process:
+            return self.process
+        return self._call
+
+    def compile_batch(self):
+        """Returns a callable processing a batch of frames. Single-frame sinks are called once per frame, batch sinks get
+        batches of records as a RecordBatch (see strom.records).
+        """
+        if self.batch:
+            return _taking_record_batches(self._call)
+
+        process = self.compile()
+
+        def process_batch(batch):
+            for frame in batch:
+                process(frame)
+        return process_batch
+
+    def flush(self):
+        """Called once the source is closed. Sinks which buffer frames write them out here."""
+        return ()
+
+    def poll(self):
+        """Called while the stream waits for its source, if a subclass overrides it (see Transformer.poll). Sinks which
+        buffer frames write out those which are due here.
+        """
+
+    def poll_timeout(self):
+        """Returns the number of seconds after which poll has something to do, or None if it hasn't."""
+        return None
+
+    def close(self):
+        """Called instead of flush when the stream stops because of an error. Sinks which hold threads or files release
+        them here.
+        """
+
+
+class BufferedSink(Sink):
+    """A sink which buffers frames and hands its handler whole batches of them, so that sinks writing to files or
+    databases pay for a write per batch instead of per frame. A batch is handed over once it holds batch_size frames, or
+    when the oldest buffered frame is flush_interval seconds old (checked as frames arrive and while the stream waits
+    for its source), and when the stream closes. Streams which stop because of an error still write out the buffered
+    frames (see close).
+
+    With background=True, batches are written on a writer thread so that the stream keeps processing frames meanwhile.
+    At most WRITER_DEPTH batches queue up for the writer before the stream waits for it. Errors raised by the handler
+    on the writer thread are raised in the stream with the next batch, or when it closes.
+    """
+
+    # The number of batches which may be waiting for the writer thread.
+    WRITER_DEPTH = 2
+
+    def __init__(self, handler, args, kwargs, batch_size=None, flush_interval=None, background=False):
+        super().__init__(handler, args, kwargs, batch=True)
+        if self.is_async:
+            raise ValueError('Buffered sinks cannot be async')
+        if batch_size is not None and batch_size < 1:
+            raise ValueError('batch_size must be at least 1')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.background = background
+        self._buffer = []
+        self._buffered_since = None
+        self._writer = None
+
+    def process(self, frame):
+        buffer = self._buffer
+        buffer.append(frame)
+        if self.flush_interval is not None and self._buffered_since is None:
+            self._buffered_since = time.monotonic()
+        if self.batch_size is not None and len(buffer) >= self.batch_size or self._interval_passed():
+            self._write()
+
+    def compile(self):
+        return self.process
+
+    def compile_batch(self):
+        return self.process_batch
+
+    def process_batch(self, batch):
+        """Buffers a batch of frames, writing as many full batches of batch_size frames as there are."""
+        buffer = self._buffer
+        buffer.extend(batch)
+        if self.flush_interval is not None and self._buffered_since is None:
+            self._buffered_since = time.monotonic()
+        if self.batch_size is not None:
+            while len(buffer) >= self.batch_size:
+                self._write(self.batch_size)
+                buffer = self._buffer
+        if buffer and self._interval_passed():
+            self._write()
+
+    def _interval_passed(self):
+        return self._buffered_since is not None and time.monotonic() - self._buffered_since >= self.flush_interval
+
+    def _write(self, size=None):
+        if size is None or size >= len(self._buffer):
+            batch, self._buffer = self._buffer, []
+        else:
+            batch, self._buffer = self._buffer[:size], self._buffer[size:]
+        self._buffered_since = time.monotonic() if self._buffer and self.flush_interval is not None else None
+
+        if not self.background:
+            self._call(batch)
+            return
+        if self._writer is None:
+            self._writer = _BackgroundWriter(self._call, self.WRITER_DEPTH)
+        self._writer.put(batch)
+
+    def sync(self):
+        """Writes out all buffered frames and waits until they are written."""
+        if self._buffer:
+            self._write()
+        if self._writer is not None:
+            self._writer.sync()
+
+    def poll(self):
+        if self._buffer and self._interval_passed():
+            self._write()
+
+    def poll_timeout(self):
+        if self._buffered_since is None:
+            return None
+        return max(0.0, self._buffered_since + self.flush_interval - time.monotonic())
+
+    def flush(self):
+        try:
+            self.sync()
+        finally:
+            if self._writer is not None:
+                writer, self._writer = self._writer, None
+                writer.close()
+        return ()
+
+    def close(self):
+        """Writes out the buffered frames as far as possible and stops the writer thread. Errors doing so are dropped,
+        as the error which stopped the stream is the one worth raising.
+        """
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+
+class _BackgroundWriter:
+    """A thread handing batches to a write function, see BufferedSink."""
+
+    def __init__(self, write, depth):
+        self._write = write
+        self._batches = Queue(depth)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='strom-sink-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._batches.get()
+            try:
+                if batch is None:
+                    return
+                if self._error is None:
+                    self._write(batch)
+            except BaseException as error:
+                self._error = error
+            finally:
+                self._batches.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def put(self, batch):
+        self._raise_error()
+        self._batches.put(batch)
+
+    def sync(self):
+        """Waits until all batches put so far are written."""
+        self._batches.join()
+        self._raise_error()
+
+    def close(self):
+        self._batches.put(None)
+        self._thread.join()
+        self._raise_error()
 
 
 
@@ -182,49 +878,152 @@ class TransformerInUseException(Exception):
     pass
 
 
-def stream_transformer(method=None):
+def stream_transformer(method=None, batch=False, workers=None, ordered=True, cache=None, cache_key=None):
+    """Turns a function into a transformer factory.
+
+    :param batch: the function takes and returns a whole batch of frames
+    :param workers: if set, frames are transformed on a pool of that many threads (see strom.parallel)
+    :param ordered: whether a threaded transformer emits frames in input order or as they complete
+    :param cache: memoizes the function, see Transformer.memoize
+    :param cache_key: a function computing the cache key of a frame, the frame itself is the key by default
+    """
     # If called without method, we've been called with optional arguments.
     # We return a decorator with the optional arguments filled in.
     # Next time round we'll be decorating method.
     if method is None:
-        return functools.partial(stream_source)
+        return functools.partial(stream_transformer, batch=batch, workers=workers, ordered=ordered, cache=cache,
+                                 cache_key=cache_key)
+    if workers and batch:
+        raise ValueError('Batch transformers cannot run on worker threads')
     @functools.wraps(method)
     def f(*args, **kwargs):
-        return Transformer(method, args, kwargs)
+        if workers:
+            from strom.parallel import ThreadedTransformer
+            transformer = ThreadedTransformer(method, args, kwargs, workers, ordered)
+        else:
+            transformer = Transformer(method, args, kwargs, batch)
+        if cache is not None:
+            transformer.memoize(cache, cache_key)
+        return transformer
     return f
 
 class Transformer(PipelineElement):
-    """Transformer alter/modify/act on a frame within a stream."""
+    """Transformer alter/modify/act on a frame within a stream. Batch transformers get a whole batch (a list or array of
+    frames) and return the transformed batch, which may be shorter than the one they were given.
+    """
 
-    def __init__(self, handler, args, kwargs):
+    def __init__(self, handler, args, kwargs, batch=False):
         super().__init__(handler, args, kwargs)
+        self.batch = batch
 
     def transform(self, frame):
-        return self.call_handler(frame)
+        if self.batch:
+            result = self._call([frame])
+            return result[0] if len(result) else None
+        return self._call(frame)
+
+    def memoize(self, cache, key=None):
+        """Caches the results of the handler, which is meant for pure but expensive handlers seeing repeated frames.
+        The cache (see strom.cache) is available as the cache attribute of the element, along with its hit and miss
+        counts.
+
+        :param cache: the number of entries of an LRU cache, or a cache such as strom.cache.SizedLRUCache or TTLCache.
+            A cache object passed to a decorator is shared by all elements the decorated function creates. Their entries
+            are told apart by handler and handler arguments, so only elements computing the same thing share results
+            (elements with unhashable arguments keep to their own entries).
+        :param key: a function computing the cache key of a frame, the frame itself is the key by default
+        """
+        from strom.cache import create_cache
+
+        if self.batch or self.is_async:
+            raise ValueError('Batch and async elements cannot be memoized')
+        scope = None
+        if not isinstance(cache, int):
+            scope = (self._handler, self._handler_args, tuple(sorted(self._handler_kwargs.items())))
+            try:
+                hash(scope)
+            except TypeError:
+                scope = (self._handler, object())
+        self.cache = create_cache(cache)
+        self._call = self.cache.wrap(self._call, key, scope)
+
+    def compile(self):
+        """Returns a callable which takes a frame and returns the transformed frame (or None if the frame is dropped).
+        Stream.compile uses this to call the handler directly rather than going through transform().
+        """
+        if self.batch or type(self).transform is not Transformer.transform:
+            return self.transform
+        return self._call
+
+    def compile_batch(self):
+        """Returns a callable which takes a batch of frames and returns the transformed batch. Single-frame transformers
+        are applied to each frame in turn, dropping frames they turn into None, and return a list. Batch transformers get
+        batches of records as a RecordBatch (see strom.records), which is only built once a batch element needs it, as
+        single-frame elements would take it apart again right away.
+        """
+        if self.batch:
+            return _taking_record_batches(self._call)
+
+        transform = self.compile()
 
+        def transform_batch(batch):
+            result = []
+            for frame in batch:
+                frame = transform(frame)
+                if frame is not None:
+                    result.append(frame)
+            return result
+        return transform_batch
 
-def stream_gate(method=None, fatal=False):
+    def flush(self):
+        """Returns the frames this transformer still holds once the source of its stream has closed. Transformers which
+        do not emit a frame for every frame they get (e.g. because they work asynchronously) hand out the rest here.
+        """
+        return ()
+
+    def poll(self):
+        """Returns the frames this transformer has ready without being handed another frame, e.g. results a threaded
+        transformer finished in the meantime. Streams poll transformers which override this after every frame and while
+        they wait for their source, so these frames don't have to wait for the next frame to come in.
+        """
+        return ()
+
+    def poll_timeout(self):
+        """Returns the number of seconds after which poll may have frames ready, or None if there are none to come. A
+        stream waiting for its source polls again after this long at the latest.
+        """
+        return None
+
+
+def stream_gate(method=None, fatal=False, batch=False, cache=None, cache_key=None):
     # If called without method, we've been called with optional arguments.
     # We return a decorator with the optional arguments filled in.
     # Next time round we'll be decorating method.
     if method is None:
-        return functools.partial(stream_gate, fatal=fatal)
+        return functools.partial(stream_gate, fatal=fatal, batch=batch, cache=cache, cache_key=cache_key)
     @functools.wraps(method)
     def f(*args, **kwargs):
-        return Gate(method, args, kwargs, fatal)
+        gate = Gate(method, args, kwargs, fatal, batch)
+        if cache is not None:
+            gate.memoize(cache, cache_key)
+        return gate
     return f
 
 class Gate(Transformer):
     """Gates check frames for certain properties/qualities. A gate can be fatal, meaning that it brings the whole stream
-    down if a single frame fails to pass, or non-fatal meaning that frames which don't pass are dropped.
+    down if a single frame fails to pass, or non-fatal meaning that frames which don't pass are dropped. Batch gates get
+    a whole batch and return a boolean mask saying which frames pass.
     """
 
-    def __init__(self, handler, args, kwargs, fatal=False):
-        super().__init__(handler, args, kwargs)
+    def __init__(self, handler, args, kwargs, fatal=False, batch=False):
+        super().__init__(handler, args, kwargs, batch)
         self._is_fatal = fatal
 
     def transform(self, frame):
-        frame_passes_gate = self.call_handler(frame)
+        if self.batch:
+            frame_passes_gate = self._call([frame])[0]
+        else:
+            frame_passes_gate = self._call(frame)
         if not frame_passes_gate:
             if self._is_fatal:
                 raise GateFailedException("Frame %s did not pass gate %s" % (str(frame), str(self)))
@@ -233,6 +1032,56 @@ class Gate(Transformer):
         else:
             return frame
 
+    def compile(self):
+        if self.batch or self._is_fatal or type(self).transform is not Gate.transform:
+            return self.transform
+
+        check = self._call
+
+        def passes_gate(frame):
+            return frame if check(frame) else None
+        return passes_gate
+
+    def compile_batch(self):
+        check = self._call
+        if not self.batch:
+            if self._is_fatal or type(self).transform is not Gate.transform:
+                return super().compile_batch()
+
+            def passes_gate(batch):
+                return _apply_mask(batch, [check(frame) for frame in batch])
+            return passes_gate
+
+        is_fatal = self._is_fatal
+
+        def passes_gate(batch):
+            batch = as_batch(batch)
+            mask = check(batch)
+            if is_fatal and not all(mask):
+                failed = next(frame for frame, passes in zip(batch, mask) if not passes)
+                raise GateFailedException("Frame %s did not pass gate %s" % (str(failed), str(self)))
+            return _apply_mask(batch, mask)
+        return passes_gate
+
+
+def _taking_record_batches(call):
+    """Wraps the handler of a batch element so that it gets batches of records as a RecordBatch."""
+    def call_with_batch(batch):
+        return call(as_batch(batch))
+    return call_with_batch
+
+
+def _apply_mask(batch, mask):
+    """Selects the frames of a batch for which the mask is true. Arrays (anything with a shape, e.g. numpy or pandas
+    objects) are indexed with the mask directly so they stay arrays, record batches (see strom.records) stay record
+    batches, everything else becomes a list.
+    """
+    if hasattr(batch, 'shape'):
+        return batch[mask]
+    if hasattr(batch, 'record_type'):
+        return batch.compress(mask)
+    return list(itertools.compress(batch, mask))
+
 
 class GateFailedException(Exception):
     """Raised by fatal gates when a check fails."""
@@ -241,16 +1090,16 @@ class GateFailedException(Exception):
         super().__init__(message)
 
 
-def stream_barrier(method=None):
+def stream_barrier(method=None, capacity=1024):
     # If called without method, we've been called with optional arguments.
     # We return a decorator with the optional arguments filled in.
     # Next time round we'll be decorating method.
     if method is None:
-        return functools.partial(stream_barrier)
+        return functools.partial(stream_barrier, capacity=capacity)
 
     @functools.wraps(method)
     def f(*args, **kwargs):
-        return Barrier(method, args, kwargs)
+        return Barrier(method, args, kwargs, capacity=capacity)
 
     return f
 
@@ -259,11 +1108,75 @@ class Barrier(PipelineElement):
     """Barriers are the basic synchronization construct of strom. A barrier function gets a dictionary of queues, one
     queue for each stream which ends at this barrier. The barrier function can then decide when to open/close the barrier
     by returning True or False, or to modify the queues at will (e.g. drop frames from it). When the barrier is open, each
-    framing coming out of it will draw a single frame of each queue and assemble them in a dictionary."""
+    framing coming out of it will draw a single frame of each queue and assemble them in a dictionary.
 
-    def __init__(self, handler, args, kwargs):
+    Instead of a barrier function, a barrier can use a join strategy (see strom.stdlib.joins), which decides which
+    frames are assembled into a dictionary. The barrier becomes the sink of each of its streams, which must not have a
+    sink yet, and the assembled frames come out of its source, which can be used to start a new stream. Each queue holds
+    at most capacity frames, frames beyond that push out the oldest ones, which are counted in dropped. The same goes for
+    the assembled frames waiting to come out of the source, which are counted in dropped_output.
+    """
+
+    def __init__(self, handler, args, kwargs, strategy=None, capacity=1024):
         super().__init__(handler, args, {})
+        if not kwargs:
+            raise ValueError('A barrier needs at least one stream')
+        taken = [str(stream) for stream in kwargs.values() if stream.sink is not None]
+        if taken:
+            raise ValueError('Streams %s already have a sink' % ", ".join(taken))
         self._streams = kwargs
-        # TODO: register sinks with all streams in kwargs
-        # TODO: produce source which can be used to start a new stream
+        self._strategy = strategy or _PredicateJoin(self._call)
+        self._strategy.start(list(kwargs), capacity)
+        self._output = deque()
+        self._capacity = capacity
+        self.dropped_output = 0
+
+        for name, stream in kwargs.items():
+            stream.sink = stream_sink(self._add)(name)
+        self.source = stream_source(self._next_frame, closer=self._is_closed)()
 
+    def __str__(self):
+        return "Barrier(%s)" % ", ".join(self._streams)
+
+    @property
+    def dropped(self):
+        """The number of frames each stream lost because its queue was full."""
+        return dict(self._strategy.dropped)
+
+    def _add(self, frame, name):
+        output = self._output
+        output.extend(self._strategy.add(name, frame))
+        while len(output) > self._capacity:
+            output.popleft()
+            self.dropped_output += 1
+
+    def _next_frame(self):
+        return self._output.popleft() if self._output else None
+
+    def _is_closed(self):
+        return not self._output and all(stream.is_closed() for stream in self._streams.values())
+
+
+class _PredicateJoin:
+    """Join strategy of barriers defined by a barrier function."""
+
+    def __init__(self, is_open):
+        self._is_open = is_open
+
+    def start(self, names, capacity):
+        self.queues = {name: deque() for name in names}
+        self.dropped = {name: 0 for name in names}
+        self._capacity = capacity
+
+    def add(self, name, frame):
+        queue = self.queues[name]
+        if len(queue) >= self._capacity:
+            queue.popleft()
+            self.dropped[name] += 1
+        queue.append(frame)
+
+        result = []
+        # the barrier function may drop frames from the queues, so they are checked again once it opened
+        while all(self.queues.values()) and self._is_open(self.queues) and all(self.queues.values()):
+            result.append({name: queue.popleft() for name, queue in self.queues.items()})
+        return result
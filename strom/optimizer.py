@@ -0,0 +1,127 @@
+"""Static optimization of a stream before it runs, see Stream.optimize.
+
+The optimizer rewrites the elements of a stream and its splits:
+
+- split-off streams which have no sink, and no splits with one, are removed, so frames are no longer buffered for them
+- transformers which return their frame unchanged and gates which let every frame pass are removed
+- runs of adjacent plain transformers and gates are fused into a single transformer, which calls their handlers in
+  straight-line code rather than one element after another
+
+Only elements created by stream_transformer and stream_gate without workers, batch or async handlers are rewritten;
+anything else (windows, barriers, parallel stages, ...) is left where it is and ends a run of fused elements. Identity
+elements are recognized by their code, i.e. handlers like `lambda frame: frame` or `def f(frame): return True`.
+"""
+import inspect
+
+from strom.model import Gate, Transformer
+
+
+def optimize(stream):
+    """Optimizes a stream and its splits in place and returns a list of descriptions of what changed."""
+    changes = []
+    _optimize(stream, changes)
+    return changes
+
+
+def _optimize(stream, changes):
+    elements = []
+    for element in stream.elements:
+        if getattr(element, 'is_split_stream', False):
+            for split in list(element.split_streams):
+                if not _has_sink(split):
+                    element.remove_split(split)
+                    changes.append('%s: removed split to %s, which has no sink' % (stream, split))
+            if element.split_streams:
+                elements.append(element)
+        elif _is_identity(element):
+            changes.append('%s: removed %s, which passes every frame unchanged' % (stream, element))
+        else:
+            elements.append(element)
+
+    fused = []
+    run = []
+    for element in elements + [None]:
+        if element is not None and _is_plain(element):
+            run.append(element)
+            continue
+        if len(run) > 1:
+            fused_element = FusedTransformer(run)
+            changes.append('%s: fused %s into %s' % (stream, ', '.join(str(e) for e in run), fused_element))
+            fused.append(fused_element)
+        else:
+            fused.extend(run)
+        run = []
+        if element is not None:
+            fused.append(element)
+    stream.elements = fused
+
+    for element in stream.elements:
+        if getattr(element, 'is_split_stream', False):
+            for split in element.split_streams:
+                _optimize(split, changes)
+
+
+def _has_sink(stream):
+    if stream.sink is not None:
+        return True
+    return any(_has_sink(split) for element in stream.elements if getattr(element, 'is_split_stream', False)
+               for split in element.split_streams)
+
+
+def _is_plain(element):
+    return (type(element) in (Transformer, Gate) and not element.batch and not element.is_async and
+            not getattr(element, 'is_split_stream', False))
+
+
+def _returns_frame(frame):
+    return frame
+
+
+def _passes(frame):
+    return True
+
+
+def _is_identity(element):
+    if not _is_plain(element) or element._handler_args or element._handler_kwargs or hasattr(element, 'cache'):
+        return False
+    if type(element) is Gate and element._is_fatal:
+        return False
+    reference = _returns_frame if type(element) is Transformer else _passes
+    code = getattr(element._handler, '__code__', None)
+    if code is None:
+        return False
+    expected = reference.__code__
+    return (code.co_code == expected.co_code and code.co_consts == expected.co_consts and
+            code.co_argcount == 1 and code.co_kwonlyargcount == 0 and
+            not code.co_flags & (inspect.CO_VARARGS | inspect.CO_VARKEYWORDS))
+
+
+class FusedTransformer(Transformer):
+    """A transformer standing in for a run of adjacent transformers and gates. Its handler is generated code which calls
+    each of their handlers in turn and stops as soon as a frame is dropped.
+    """
+
+    def __init__(self, elements):
+        self.fused_elements = list(elements)
+        super().__init__(_fuse(self.fused_elements), (), {})
+
+
+def _fuse(elements):
+    namespace = {}
+    lines = ['def fused(frame):']
+    for idx, element in enumerate(elements):
+        name = '_step%d' % idx
+        if type(element) is Gate and not element._is_fatal:
+            namespace[name] = element._call
+            lines.append('    if not %s(frame): return None' % name)
+        else:
+            namespace[name] = element.compile()
+            lines.append('    frame = %s(frame)' % name)
+            if idx < len(elements) - 1:
+                lines.append('    if frame is None: return None')
+    lines.append('    return frame')
+
+    exec('\n'.join(lines), namespace)
+    fused = namespace['fused']
+    fused.__name__ = 'fused(%s)' % ', '.join(str(element) for element in elements)
+    return fused
@@ -1,11 +1,33 @@
 import itertools
-import svgwrite
-from svgwrite.container import Style
+from collections import deque
 
 from strom.model import Transformer, Gate, Stream
 
 PADDING_Y = 10
 
+
+def profile_color(share):
+    """Returns the color of a symbol whose element took share (0 to 1) of the time, from white for none to red for all
+    of it.
+    """
+    level = int(round(255 * (1 - min(max(share, 0.0), 1.0))))
+    return 'rgb(255,%d,%d)' % (level, level)
+
+
+def profile_label(element_stats, share):
+    """Returns the label of a profiled symbol: its share of the time, frames/sec and, for gates, selectivity."""
+    label = '%.0f%% %s f/s' % (share * 100, _si_format(element_stats.frames_per_second))
+    if element_stats.kind == 'gate':
+        label += ' %.0f%% pass' % (element_stats.selectivity * 100)
+    return label
+
+
+def _si_format(value):
+    for factor, suffix in ((1e9, 'G'), (1e6, 'M'), (1e3, 'k')):
+        if value >= factor:
+            return '%.1f%s' % (value / factor, suffix)
+    return '%.0f' % value
+
 class Symbol:
     """Represents a symbol in the diagram"""
 
@@ -50,17 +72,26 @@ class Symbol:
 class RailroadDiagram:
     """Draws railroad diagrams of stream configurations."""
 
-    def __init__(self, stream: Stream):
+    def __init__(self, stream: Stream, profile=False):
+        """
+        :param stream: the stream to draw, along with the streams split off from it
+        :param profile: annotate each symbol with the stats of its element (see strom.metrics.profile_stream). Symbols
+            are shaded by their share of the time spent in all elements and labeled with frames/sec and, for gates,
+            the share of frames which passed.
+        """
         self._stream = stream
+        self._profile = profile
 
     def draw(self, filename=None):
         """Draws the railroad diagram returns it as SVG."""
+        import svgwrite
+
         dwg = svgwrite.Drawing('diagram.svg', profile='tiny', debug=False)
 
         symbols = RailroadDiagram._create_symbols(self._stream, dwg, True)
         # linked_symbols = RailroadDiagram._link_symbols(symbols, dwg)
 
-        symbols_group = RailroadDiagram._layout_symbols(symbols, dwg)
+        symbols_group = RailroadDiagram._layout_symbols(symbols, dwg, self._profile)
         symbols_group.translate(PADDING_Y, PADDING_Y)
         dwg.add(symbols_group)
 
@@ -78,68 +109,98 @@ class RailroadDiagram:
         return dwg.g()
 
     @staticmethod
-    def _layout_symbols(linked_symbols, dwg):
+    def _layout_symbols(linked_symbols, dwg, profile=False):
         result = dwg.g()
-
-        # walk DAG looking for sinks and sources
-        def find_sinks(symbol):
-            if not symbol.successors:
-                return [symbol]
-            else:
-                all_successor_sinks = [find_sinks(s) for s in symbol.successors]
-                return set(itertools.chain.from_iterable(all_successor_sinks))
-
-        def find_sources(symbol):
-            if not symbol.predecessors:
-                return [symbol]
-            else:
-                all_predecessor_sources = [find_sources(s) for s in symbol.predecessors]
-                return set(itertools.chain.from_iterable(all_predecessor_sources))
-
-        # it's sufficient to start from any symbol to find all sinks as this is a DAG
-        sinks = find_sinks(linked_symbols[0])
-        # go back from all sinks to find all DAG sources
-        sources = set(itertools.chain.from_iterable([find_sources(s) for s in sinks]))
-
-        # sort sources by their dag_height
-        # TODO: not sure this actually works ... there might well be a bug in this one, particullarly when it comes to barriers
-        def find_dag_height(source, height=0):
-            new_height = height + source.bounding_box[1]
-            if source.successors:
-                return max([find_dag_height(successor, new_height) for successor in source.successors])
-            else:
-                return new_height
-        sorted(sources, key=find_dag_height)
-
-        # add symbols to drawing starting with the sources
-        def add_symbol_and_successors(symbol, offset=None):
-            if symbol.was_added(): return
-
-            # compute initial offset (if offset = None)
-            if offset is None:
-                offset = (0, 0.5 * symbol.bounding_box[1])
-
-            # add symbol itself
-            symbol_position = (offset[0] - symbol.take_up[0], offset[1] - symbol.take_up[1])
-            symbol.absolute_position = symbol_position
+        symbols = RailroadDiagram._place_symbols(linked_symbols)
+        if profile:
+            result.add(RailroadDiagram._draw_profile(symbols, dwg))
+        for symbol in symbols:
             symbol_svg = symbol.svg
-            symbol_svg.translate(tx=symbol_position[0], ty=symbol_position[1])
+            symbol_svg.translate(tx=symbol.absolute_position[0], ty=symbol.absolute_position[1])
             result.add(symbol_svg)
+        return result
 
-            # add successors
-            leave_off_position = (symbol_position[0] + symbol.leave_off[0], symbol_position[1] + symbol.leave_off[1])
-            print("%s Offset=(%f, %f) LO=(%f, %f)" % (type(symbol.origin).__name__, symbol_position[0], symbol_position[1], leave_off_position[0], leave_off_position[1]))
-            max_height = 0
-            for successor in symbol.successors:
-                yspace_used = add_symbol_and_successors(successor, offset=leave_off_position)
-                if yspace_used > max_height: max_height = yspace_used
-            return max_height
+    @staticmethod
+    def _draw_profile(symbols, dwg):
+        """Draws the shading and labels of profiled symbols, behind the symbols themselves."""
+        result = dwg.g(font_size=6, font_family='sans-serif')
+        stats = [getattr(symbol.origin, 'stats', None) for symbol in symbols]
+        total_seconds = sum(element_stats.seconds for element_stats in stats if element_stats is not None)
+        for symbol, element_stats in zip(symbols, stats):
+            if element_stats is None:
+                continue
+            share = element_stats.seconds / total_seconds if total_seconds else 0.0
+            (x, y), (width, height) = symbol.absolute_position, symbol.bounding_box
+            result.add(dwg.rect((x, y), (width, max(height, 5)), fill=profile_color(share), stroke='none'))
+            result.add(dwg.text(profile_label(element_stats, share), insert=(x, y + max(height, 5) + 7)))
+        return result
 
-        # add all symbols starting with the sources
+    @staticmethod
+    def _place_symbols(linked_symbols):
+        """Computes the absolute position of all symbols connected to linked_symbols and returns them in topological
+        order. Each symbol is aligned with the leave-off point of its predecessor; the branches leaving a symbol are
+        stacked downwards, each one taking up as much space as its symbols need, and so are the sources.
+
+        All passes are iterative and visit every symbol once, so this takes linear time regardless of how long the
+        chains are and how many splits there are.
+        """
+        symbols = RailroadDiagram._sort_symbols(linked_symbols)
+
+        # the vertical space a symbol and everything after it take up, from the sinks backwards
+        extent = {}
+        for symbol in reversed(symbols):
+            branches = sum(extent[successor] for successor in symbol.successors)
+            branches += PADDING_Y * max(len(symbol.successors) - 1, 0)
+            extent[symbol] = max(symbol.bounding_box[1], branches)
+
+        # the point each symbol's take-up point is aligned with, from the sources forwards
+        anchors = {}
         y_position = 0
-        for source in sources:
-            y_position += add_symbol_and_successors(source) + PADDING_Y
+        for source in sorted((symbol for symbol in symbols if not symbol.predecessors), key=extent.get):
+            anchors[source] = (0, y_position + 0.5 * source.bounding_box[1])
+            y_position += extent[source] + PADDING_Y
+
+        for symbol in symbols:
+            anchor = anchors[symbol]
+            symbol.absolute_position = (anchor[0] - symbol.take_up[0], anchor[1] - symbol.take_up[1])
+            leave_off_x = symbol.absolute_position[0] + symbol.leave_off[0]
+            branch_y = symbol.absolute_position[1] + symbol.leave_off[1]
+            for successor in symbol.successors:
+                if successor in anchors:
+                    # symbols with several predecessors (e.g. barriers) stay on the first branch, behind all of them
+                    anchors[successor] = (max(anchors[successor][0], leave_off_x), anchors[successor][1])
+                else:
+                    anchors[successor] = (leave_off_x, branch_y)
+                branch_y += extent[successor] + PADDING_Y
 
+        return symbols
+
+    @staticmethod
+    def _sort_symbols(linked_symbols):
+        """Returns all symbols connected to linked_symbols such that every symbol comes after its predecessors."""
+        connected = list(linked_symbols)
+        seen = set(connected)
+        pending = deque(connected)
+        while pending:
+            symbol = pending.popleft()
+            for neighbour in itertools.chain(symbol.predecessors, symbol.successors):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    connected.append(neighbour)
+                    pending.append(neighbour)
+
+        waiting_for = {symbol: len(symbol.predecessors) for symbol in connected}
+        ready = deque(symbol for symbol in connected if not symbol.predecessors)
+        result = []
+        while ready:
+            symbol = ready.popleft()
+            result.append(symbol)
+            for successor in symbol.successors:
+                waiting_for[successor] -= 1
+                if not waiting_for[successor]:
+                    ready.append(successor)
+        if len(result) != len(connected):
+            raise ValueError('The symbols of a railroad diagram must not form a cycle')
         return result
 
     @staticmethod
@@ -155,34 +216,46 @@ class RailroadDiagram:
 
     @staticmethod
     def _create_symbols(stream, dwg, draw_source=True):
-        """Transforms the stream to a set of symbols."""
-
-        # start with source
-        symbols = []
-        if draw_source and stream.source is not None:
-            symbols.append(RailroadDiagram._draw_source(dwg, stream.source))
-
-        # add elements
-        for element in stream.elements:
-            symbol = None
-            if isinstance(element, Gate):
-                symbol = RailroadDiagram._draw_gate(dwg, element)
-            elif isinstance(element, Transformer) and 'is_split_stream' in dir(element) and element.is_split_stream:
-                symbol = RailroadDiagram._draw_split_stream(dwg, element)
-                stream_symbols = RailroadDiagram._create_symbols(element.split_stream, dwg, False)
-                if stream_symbols:
-                    stream_symbols[0].succeeds(symbol)
-            elif isinstance(element, Transformer):
-                symbol = RailroadDiagram._draw_transformer(dwg, element)
-
-            if symbol is not None:
-                if symbols: symbol.succeeds(symbols[-1])
-                symbols.append(symbol)
-
-        # add sink
-        symbols.append(RailroadDiagram._draw_sink(dwg, stream.sink))
+        """Transforms the stream to a set of symbols. Returns the symbols of the stream itself, the symbols of streams
+        split off from it are linked to the symbol of their split.
+        """
+        result = None
+        # streams still to draw along with the symbol of the split they come from
+        pending = deque([(stream, draw_source, None)])
+        while pending:
+            current, with_source, split_symbol = pending.popleft()
+
+            # start with source
+            symbols = []
+            if with_source and current.source is not None:
+                symbols.append(RailroadDiagram._draw_source(dwg, current.source))
+
+            # add elements
+            for element in current.elements:
+                symbol = None
+                if isinstance(element, Gate):
+                    symbol = RailroadDiagram._draw_gate(dwg, element)
+                elif isinstance(element, Transformer) and getattr(element, 'is_split_stream', False):
+                    symbol = RailroadDiagram._draw_split_stream(dwg, element)
+                    pending.extend((split, False, symbol) for split in element.split_streams)
+                elif isinstance(element, Transformer):
+                    symbol = RailroadDiagram._draw_transformer(dwg, element)
+
+                if symbol is not None:
+                    if symbols: symbol.succeeds(symbols[-1])
+                    symbols.append(symbol)
+
+            # add sink
+            sink_symbol = RailroadDiagram._draw_sink(dwg, current.sink)
+            if symbols: sink_symbol.succeeds(symbols[-1])
+            symbols.append(sink_symbol)
+
+            if split_symbol is not None:
+                symbols[0].succeeds(split_symbol)
+            if result is None:
+                result = symbols
 
-        return symbols
+        return result
 
 
     @staticmethod
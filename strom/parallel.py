@@ -0,0 +1,438 @@
+"""Parallel execution of pipeline elements.
+
+Transformers created with stream_transformer(workers=N) run their handler on a pool of threads, which pays off for
+transformers which spend their time waiting on I/O rather than computing. CPU-bound elements are held back by the GIL
+instead; a run of them can be moved to a pool of worker processes with Stream.parallelize, which replaces them by a
+ProcessStage. Stateful elements which need to see all frames with the same key are scaled out with Stream.partition
+instead, which replaces them by a PartitionStage.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from multiprocessing.shared_memory import SharedMemory
+from queue import SimpleQueue, Empty, Full
+import os
+import pickle
+
+from strom.model import Transformer
+
+
+class ThreadedTransformer(Transformer):
+    """A transformer which fans frames out to a thread pool.
+
+    At most window frames are in flight at any time; once the window is full, transform blocks until a frame is done.
+    Each call to transform hands out at most one transformed frame, so the stream sees None for frames which are still
+    in flight. The other completed frames are handed out by poll, which streams call after every frame and while they
+    wait for their source, and whatever is left when the source closes is handed out by flush. Ordered transformers
+    emit frames in the order they came in, unordered ones emit them as they complete.
+    """
+
+    # frames in flight would be lost when resuming from a checkpoint
+    checkpointable = False
+
+    # How often a stream waiting for its source polls for completed frames while frames are in flight.
+    POLL_INTERVAL = 0.001
+
+    def __init__(self, handler, args, kwargs, workers, ordered=True, window=None):
+        super().__init__(handler, args, kwargs)
+        if workers < 1:
+            raise ValueError('A threaded transformer needs at least one worker')
+        self.workers = workers
+        self.ordered = ordered
+        self.window = window or 2 * workers
+        self._executor = None
+        # ordered: futures in submission order; unordered: futures in completion order plus a count of those in flight
+        self._pending = deque()
+        self._completed = SimpleQueue()
+        self._in_flight = 0
+
+    def _create_executor(self):
+        return ThreadPoolExecutor(self.workers, thread_name_prefix=str(self))
+
+    def _submit_frame(self, frame):
+        """Hands a frame to the executor and returns the future of its transformed counterpart."""
+        if self._executor is None:
+            self._executor = self._create_executor()
+        return self._executor.submit(self._call, frame)
+
+    def _result(self, future):
+        return future.result()
+
+    def _submit(self, frame):
+        future = self._submit_frame(frame)
+        if self.ordered:
+            self._pending.append(future)
+        else:
+            self._in_flight += 1
+            future.add_done_callback(self._completed.put)
+
+    def transform(self, frame):
+        self._submit(frame)
+
+        if self.ordered:
+            head = self._pending[0]
+            if head.done() or len(self._pending) >= self.window:
+                return self._result(self._pending.popleft())
+            return None
+
+        try:
+            future = self._completed.get_nowait()
+        except Empty:
+            if self._in_flight < self.window:
+                return None
+            future = self._completed.get()
+        self._in_flight -= 1
+        return self._result(future)
+
+    def compile_batch(self):
+        def transform_batch(batch):
+            futures = [self._submit_frame(frame) for frame in batch]
+            if not self.ordered:
+                completed = SimpleQueue()
+                for future in futures:
+                    future.add_done_callback(completed.put)
+                futures = (completed.get() for _ in futures)
+            results = [self._result(future) for future in futures]
+            return [frame for frame in results if frame is not None]
+        return transform_batch
+
+    def poll(self):
+        result = []
+        if self.ordered:
+            pending = self._pending
+            while pending and pending[0].done():
+                result.append(self._result(pending.popleft()))
+        else:
+            while self._in_flight:
+                try:
+                    future = self._completed.get_nowait()
+                except Empty:
+                    break
+                self._in_flight -= 1
+                result.append(self._result(future))
+        return [frame for frame in result if frame is not None]
+
+    def poll_timeout(self):
+        return self.POLL_INTERVAL if self._pending or self._in_flight else None
+
+    def flush(self):
+        result = []
+        if self.ordered:
+            while self._pending:
+                result.append(self._result(self._pending.popleft()))
+        else:
+            while self._in_flight:
+                result.append(self._result(self._completed.get()))
+                self._in_flight -= 1
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        return [frame for frame in result if frame is not None]
+
+
+class ProcessStage(ThreadedTransformer):
+    """Runs a contiguous run of stream elements in a pool of worker processes.
+
+    Each frame floats through all elements of the stage inside one worker and the result is handed back in input order,
+    with the same bounded in-flight window as a ThreadedTransformer. Frames are pickled with protocol 5; large
+    out-of-band buffers (numpy arrays, or frames which are bytes or bytearrays) travel through shared memory instead of
+    the pipe to the worker.
+    Exceptions raised in a worker, e.g. the GateFailedException of a fatal gate, are re-raised in the stream's process.
+
+    Where available, workers are forked so that the elements don't have to be pickled. Elements of a stage must not hold
+    frames back (see Transformer.flush) as each worker only sees a share of the frames.
+    """
+
+    def __init__(self, elements, workers=None, window=None):
+        elements = tuple(elements)
+        if not elements:
+            raise ValueError('A process stage needs at least one element')
+        if any(getattr(element, 'is_split_stream', False) for element in elements):
+            raise ValueError('Split streams cannot run in a process stage')
+        super().__init__(None, (), {}, workers or os.cpu_count() or 1, ordered=True, window=window)
+        self.elements = elements
+
+    def __str__(self):
+        return "ProcessStage(%s)" % ", ".join(str(element) for element in self.elements)
+
+    def _create_executor(self):
+        context = get_context('fork') if 'fork' in get_all_start_methods() else None
+        return ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_stage_worker,
+                                   initargs=(self.elements,))
+
+    def _submit_frame(self, frame):
+        if self._executor is None:
+            self._executor = self._create_executor()
+        return self._executor.submit(_run_stage, _encode_frame(frame))
+
+    def _result(self, future):
+        return _decode_frame(future.result())
+
+
+# Out-of-band buffers smaller than this are pickled in-band, shared memory only pays off for larger payloads.
+SHARED_MEMORY_THRESHOLD = 1 << 16
+
+# The element chain of the stage a worker process serves.
+_stage_steps = ()
+
+
+def _init_stage_worker(elements):
+    global _stage_steps
+    _stage_steps = tuple(element.compile() for element in elements)
+
+
+def _run_stage(message):
+    frame = _decode_frame(message)
+    for step in _stage_steps:
+        if frame is None: break
+        frame = step(frame)
+    return _encode_frame(frame)
+
+
+class _RawFrame:
+    """Wraps bytes and bytearray frames so that pickle ships them out-of-band, which it otherwise only does for types
+    like numpy arrays.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def __reduce_ex__(self, protocol):
+        return _rebuild_raw_frame, (pickle.PickleBuffer(self.data), type(self.data) is bytes)
+
+
+def _rebuild_raw_frame(buffer, as_bytes):
+    return bytes(buffer) if as_bytes else buffer
+
+
+def _encode_frame(frame):
+    """Pickles a frame and moves its large out-of-band buffers to shared memory. Returns the pickle along with the name
+    and size of each shared memory block, which the receiving side unlinks once it has read them.
+    """
+    buffers = []
+
+    def keep_out_of_band(buffer):
+        with buffer.raw() as raw:
+            if raw.nbytes < SHARED_MEMORY_THRESHOLD:
+                return True
+        buffers.append(buffer)
+        return False
+
+    if type(frame) in (bytes, bytearray):
+        frame = _RawFrame(frame)
+    payload = pickle.dumps(frame, protocol=5, buffer_callback=keep_out_of_band)
+    blocks = []
+    for buffer in buffers:
+        with buffer.raw() as raw:
+            block = SharedMemory(create=True, size=raw.nbytes)
+            block.buf[:raw.nbytes] = raw
+            blocks.append((block.name, raw.nbytes))
+            block.close()
+    return payload, blocks
+
+
+def _decode_frame(message):
+    payload, blocks = message
+    buffers = []
+    for name, size in blocks:
+        block = SharedMemory(name=name)
+        with block.buf[:size] as view:
+            buffers.append(bytearray(view))
+        block.close()
+        block.unlink()
+    return pickle.loads(payload, buffers=buffers)
+
+
+class PartitionStage(Transformer):
+    """Runs a contiguous run of stream elements in worker processes, routing each frame to a worker by the hash of its
+    key. Every worker runs its own copy of the elements, and all frames with the same key go to the same worker, so
+    stateful elements (e.g. windows) see all frames of a key, in order. Frames of different keys may leave the stage in
+    a different order than they came in.
+
+    Frames travel to the workers in chunks of up to chunk_size frames per worker, through a bounded queue of queue_size
+    chunks each; once a worker's queue is full the stream waits for it, collecting results meanwhile. Results are handed
+    out as they arrive, also while the stream waits for its source (see poll), and once the source closes the stage sends the remaining chunks, lets each worker flush its
+    elements and waits for the workers to exit. Errors raised in a worker are re-raised in the stream's process.
+
+    As with a ProcessStage, workers are forked where available so that the elements don't have to be pickled.
+    """
+
+    # frames in flight would be lost when resuming from a checkpoint
+    checkpointable = False
+
+    # How long the stage waits for results at a time while it cannot go on, before checking on the workers.
+    POLL_INTERVAL = 0.05
+
+    # How often a stream waiting for its source checks for results while chunks are being worked on.
+    RESULT_POLL_INTERVAL = 0.001
+
+    def __init__(self, elements, key, workers=None, queue_size=16, chunk_size=64):
+        elements = tuple(elements)
+        if not elements:
+            raise ValueError('A partition stage needs at least one element')
+        if any(getattr(element, 'is_split_stream', False) for element in elements):
+            raise ValueError('Split streams cannot run in a partition stage')
+        super().__init__(None, (), {})
+        self.elements = elements
+        self.key = key
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self._processes = None
+        self._inboxes = None
+        self._outbox = None
+        self._chunks = None
+        self._running = 0
+        self._in_flight = 0
+        self._results = deque()
+
+    def __str__(self):
+        return "PartitionStage(%s)" % ", ".join(str(element) for element in self.elements)
+
+    def _start(self):
+        context = get_context('fork') if 'fork' in get_all_start_methods() else get_context()
+        self._inboxes = [context.Queue(self.queue_size) for _ in range(self.workers)]
+        self._outbox = context.Queue(self.queue_size * self.workers)
+        self._processes = [
+            context.Process(target=_run_partition, args=(self.elements, inbox, self._outbox), daemon=True,
+                            name='%s-%d' % (self, idx))
+            for idx, inbox in enumerate(self._inboxes)]
+        for process in self._processes:
+            process.start()
+        self._chunks = [[] for _ in range(self.workers)]
+        self._running = self.workers
+
+    def _route(self, frame):
+        if self._processes is None:
+            self._start()
+        worker = hash(self.key(frame)) % self.workers
+        chunk = self._chunks[worker]
+        chunk.append(frame)
+        if len(chunk) >= self.chunk_size:
+            self._chunks[worker] = []
+            self._send(worker, chunk)
+            self._in_flight += 1
+
+    def _send(self, worker, message):
+        inbox = self._inboxes[worker]
+        while True:
+            try:
+                inbox.put_nowait(message)
+                return
+            except Full:
+                # the worker may itself wait for us to take its results
+                self._wait_for_results()
+
+    def _receive(self, timeout=None):
+        """Moves whatever the workers have sent back into the stage's results, waiting at most timeout seconds for it."""
+        try:
+            if timeout is None:
+                message = self._outbox.get_nowait()
+            else:
+                message = self._outbox.get(timeout=timeout)
+        except Empty:
+            return False
+
+        while True:
+            kind, payload = message
+            if kind == 'error':
+                raise payload
+            if kind == 'done':
+                self._running -= 1
+            else:
+                self._in_flight -= 1
+            self._results.extend(payload)
+            try:
+                message = self._outbox.get_nowait()
+            except Empty:
+                return True
+
+    def _wait_for_results(self):
+        if not self._receive(self.POLL_INTERVAL):
+            for process in self._processes:
+                if process.exitcode:
+                    raise RuntimeError('Worker %s of %s exited with code %d' % (process.name, self, process.exitcode))
+
+    def transform(self, frame):
+        self._route(frame)
+        if not self._results:
+            self._receive()
+        return self._results.popleft() if self._results else None
+
+    def poll(self):
+        if self._processes is None:
+            return ()
+        self._receive()
+        results = list(self._results)
+        self._results.clear()
+        return results
+
+    def poll_timeout(self):
+        return self.RESULT_POLL_INTERVAL if self._in_flight else None
+
+    def compile_batch(self):
+        def transform_batch(batch):
+            for frame in batch:
+                self._route(frame)
+            self._receive()
+            results = list(self._results)
+            self._results.clear()
+            return results
+        return transform_batch
+
+    def flush(self):
+        if self._processes is None:
+            return ()
+        try:
+            for worker, chunk in enumerate(self._chunks):
+                if chunk:
+                    self._send(worker, chunk)
+                self._send(worker, None)
+            while self._running:
+                self._wait_for_results()
+            for process in self._processes:
+                process.join()
+        finally:
+            for process in self._processes:
+                if process.is_alive():
+                    process.terminate()
+            self._processes = self._inboxes = self._outbox = self._chunks = None
+            self._in_flight = 0
+
+        results = list(self._results)
+        self._results.clear()
+        return results
+
+
+def _run_partition(elements, inbox, outbox):
+    try:
+        steps = tuple(element.compile() for element in elements)
+        while True:
+            chunk = inbox.get()
+            if chunk is None:
+                break
+            results = []
+            for frame in chunk:
+                for step in steps:
+                    if frame is None: break
+                    frame = step(frame)
+                if frame is not None:
+                    results.append(frame)
+            # sent even if empty, the stage counts the chunks it is waiting for
+            outbox.put(('frames', results))
+
+        results = []
+        for idx, element in enumerate(elements):
+            for frame in element.flush():
+                for step in steps[idx + 1:]:
+                    if frame is None: break
+                    frame = step(frame)
+                if frame is not None:
+                    results.append(frame)
+        outbox.put(('done', results))
+    except BaseException as error:
+        outbox.put(('error', error))
+        outbox.close()
+        outbox.join_thread()
+        os._exit(1)
@@ -0,0 +1,157 @@
+"""Compact frames with a declared schema.
+
+record_type creates a tuple subclass whose instances are a fraction of the size of a dict with the same fields, and
+cheaper to create. Fields can be read like those of a dict (record['price'], record.get('price'), keys, values, items,
+dict(record)) as well as by attribute (record.price), so handlers which only read fields of dict frames work with
+records as they are. Records are still tuples though: iterating them and `in` go over their values, and they are
+immutable (record._replace(price=...) returns a changed copy).
+
+A RecordBatch holds many records of one type column by column. Columns with a declared array typecode are stored in
+an array.array, so a batch of numbers costs a few bytes per value and hands over to NumPy without a copy (to_numpy).
+Streams running in batch mode hand batch elements (and sinks) a record batch whenever a batch consists of records of a
+single type (see as_batch), while single-frame elements in between pass plain lists of records on to each other. Gates
+select from record batches without turning them into lists.
+"""
+import array
+import itertools
+import sys
+from collections import namedtuple
+
+
+class Record(tuple):
+    """Base class of the record types created by record_type."""
+
+    __slots__ = ()
+    _fields = ()
+    _indices = {}
+    _typecodes = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._indices[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        index = self._indices.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return tuple(zip(self._fields, self))
+
+    def as_dict(self):
+        return dict(zip(self._fields, self))
+
+    @classmethod
+    def from_dict(cls, mapping):
+        return tuple.__new__(cls, [mapping[name] for name in cls._fields])
+
+
+def record_type(name, fields, module=None):
+    """Creates a record type. Like classes, record types must be defined at module level for their records to be
+    pickled, e.g. when they are sent to worker processes.
+
+    :param name: the name of the type
+    :param fields: the field names, or (name, typecode) pairs where typecode is an array module typecode (e.g. 'q' or
+        'd') used to store the field's column in record batches. Fields without typecode are stored in lists.
+    :param module: the module the type is defined in, the calling module by default
+    """
+    names = []
+    typecodes = []
+    for field in fields:
+        if isinstance(field, str):
+            field = (field, None)
+        names.append(field[0])
+        typecodes.append(field[1])
+
+    if module is None:
+        module = sys._getframe(1).f_globals.get('__name__', '__main__')
+
+    return type(name, (namedtuple(name, names), Record), {
+        '__slots__': (),
+        '__module__': module,
+        '_indices': {field: idx for idx, field in enumerate(names)},
+        '_typecodes': tuple(typecodes),
+    })
+
+
+class RecordBatch:
+    """A batch of records of one type, stored column by column. Iterating a batch yields its records, indexing it with
+    a field name returns the column.
+    """
+
+    __slots__ = ('record_type', 'columns')
+
+    def __init__(self, record_type, columns):
+        """
+        :param record_type: the type created by record_type
+        :param columns: a sequence (list, array or NumPy array) per field, all of the same length
+        """
+        if len(columns) != len(record_type._fields):
+            raise ValueError('%s has %d fields, got %d columns' %
+                             (record_type.__name__, len(record_type._fields), len(columns)))
+        self.record_type = record_type
+        self.columns = list(columns)
+
+    @classmethod
+    def from_records(cls, record_type, records):
+        """Creates a batch from records, or anything else providing the fields in order, e.g. tuples."""
+        values = list(zip(*records)) or [()] * len(record_type._fields)
+        return cls(record_type, [_column(typecode, column) for typecode, column in zip(record_type._typecodes, values)])
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def __iter__(self):
+        make = self.record_type._make
+        return map(make, zip(*self.columns))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[self.record_type._indices[key]]
+        if isinstance(key, slice):
+            return RecordBatch(self.record_type, [column[key] for column in self.columns])
+        return self.record_type._make(column[key] for column in self.columns)
+
+    def __repr__(self):
+        return 'RecordBatch(%s, %d records)' % (self.record_type.__name__, len(self))
+
+    def compress(self, mask):
+        """Returns the batch of the records for which the mask is true."""
+        mask = list(mask)
+        return RecordBatch(self.record_type, [_compress(column, mask) for column in self.columns])
+
+    def to_numpy(self):
+        """Returns a dict mapping field names to NumPy arrays. Array-backed columns are shared rather than copied."""
+        import numpy
+        return {name: numpy.asarray(column) for name, column in zip(self.record_type._fields, self.columns)}
+
+
+def as_batch(frames):
+    """Returns a list of frames as a RecordBatch if they are all records of the same type, and as is otherwise."""
+    if not frames or not isinstance(frames, list):
+        return frames
+    frame_type = type(frames[0])
+    if not issubclass(frame_type, Record) or any(type(frame) is not frame_type for frame in frames):
+        return frames
+    return RecordBatch.from_records(frame_type, frames)
+
+
+def _column(typecode, values):
+    return list(values) if typecode is None else array.array(typecode, values)
+
+
+def _compress(column, mask):
+    if hasattr(column, 'shape'):
+        return column[mask]
+    if isinstance(column, array.array):
+        return array.array(column.typecode, itertools.compress(column, mask))
+    return list(itertools.compress(column, mask))
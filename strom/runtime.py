@@ -0,0 +1,94 @@
+"""Cooperative scheduling of several streams, including the streams split off from them."""
+import time
+
+
+class Runtime:
+    """Runs a set of streams along with every stream reachable from them through splits, interleaving them on the
+    calling thread.
+
+    Streams are visited round-robin and each visit processes up to quantum frames, so parent and split streams progress
+    together and a stream with a slow source or expensive elements doesn't keep the others from running. A stream is
+    only visited if it is ready: a stream whose split buffers hold max_buffered frames or more waits for its split
+    streams to catch up, which keeps memory bounded. Elements which hand out frames on their own (see Transformer.poll
+    and flush) may take a blocking split buffer beyond its capacity, rather than blocking the runtime; the stream is
+    then not visited until its split streams have caught up. If no stream gets anything done in a round, e.g. because
+    all sources are live and have no frame ready, the runtime sleeps for idle_sleep seconds.
+    """
+
+    def __init__(self, streams, quantum=64, max_buffered=1024, idle_sleep=0.001):
+        self.streams = Runtime.find_streams(streams)
+        self.quantum = quantum
+        self.max_buffered = max_buffered
+        self.idle_sleep = idle_sleep
+
+    @staticmethod
+    def find_streams(streams):
+        """Returns the given streams followed by all streams split off from them, without duplicates."""
+        result = []
+        seen = set()
+        pending = list(streams)
+        while pending:
+            stream = pending.pop(0)
+            if id(stream) in seen:
+                continue
+            seen.add(id(stream))
+            result.append(stream)
+            for element in stream.elements:
+                if getattr(element, 'is_split_stream', False):
+                    pending.extend(element.split_streams)
+        return result
+
+    def run(self):
+        """Runs all streams until every one of them is closed."""
+        for stream in self.streams:
+            if stream.sink is None:
+                raise ValueError('Stream %s has no sink' % str(stream))
+
+        for stream in self.streams:
+            for buffer in Runtime._split_buffers(stream):
+                buffer.scheduled = True
+        try:
+            self._run([(stream.compile_step(), Runtime._split_buffers(stream)) for stream in self.streams])
+        except BaseException:
+            for stream in self.streams:
+                stream.sink.close()
+                stream._close_splits()
+            raise
+
+    def _run(self, active):
+        while active:
+            progressed = False
+            for entry in list(active):
+                run_step, buffers = entry
+                max_frames = Runtime.step_limit(buffers, self.quantum, self.max_buffered)
+                if max_frames <= 0:
+                    continue
+
+                frames = run_step(max_frames)
+                if frames is None:
+                    active.remove(entry)
+                    progressed = True
+                elif frames:
+                    progressed = True
+
+            if active and not progressed:
+                time.sleep(self.idle_sleep)
+
+    @staticmethod
+    def step_limit(buffers, max_frames, max_buffered=None):
+        """Returns how many frames a stream writing into the given split buffers may process next, at most max_frames.
+        Blocking buffers are not filled by the stream's source frames, as their readers would not get to run, and if
+        max_buffered is given, the buffers hold no more than that many frames. Buffers are expected to be scheduled
+        (see FanOutBuffer), as elements may hand out more frames than they are given.
+        """
+        for buffer in buffers:
+            buffered = buffer.qsize()
+            if max_buffered is not None:
+                max_frames = min(max_frames, max_buffered - buffered)
+            if buffer.capacity is not None and buffer.overflow == 'block':
+                max_frames = min(max_frames, buffer.capacity - buffered)
+        return max_frames
+
+    @staticmethod
+    def _split_buffers(stream):
+        return [element.split_buffer for element in stream.elements if getattr(element, 'is_split_stream', False)]
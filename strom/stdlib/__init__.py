@@ -1 +1,5 @@
-from .sources import CsvSource
\ No newline at end of file
+from .sources import CsvSource, QueueSource, RecordSource, SelectorSource
+from .sinks import CsvSink, JsonLinesSink
+from .joins import zip_join, key_join, window_join
+from .windows import SlidingWindow, TumblingWindow, SessionWindow
+from .shedding import RateLimit, Sample, AdaptiveSample, LatencyShedder
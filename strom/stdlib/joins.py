@@ -0,0 +1,167 @@
+"""Join strategies for barriers, see strom.model.Barrier.
+
+A join strategy keeps one buffer per stream ending at the barrier. Whenever a stream delivers a frame, the strategy
+returns the joined frames this makes possible, each a dictionary mapping stream names to frames. Buffers are indexed so
+that a new frame never causes a scan of what has been buffered before.
+"""
+import itertools
+from collections import deque, OrderedDict
+
+from strom.model import Barrier
+
+
+def zip_join(capacity=1024, **streams):
+    """Creates a barrier which joins the n-th frame of each stream."""
+    return Barrier(None, (), streams, ZipJoin(), capacity)
+
+
+def key_join(key, capacity=1024, **streams):
+    """Creates a barrier which joins frames with equal keys. key is a function computing the key of a frame, or a
+    dictionary of such functions, one per stream.
+    """
+    return Barrier(None, (), streams, KeyJoin(key), capacity)
+
+
+def window_join(time, window, capacity=1024, **streams):
+    """Creates a barrier which joins frames whose timestamps are at most window apart. time is a function returning the
+    timestamp of a frame, or a dictionary of such functions, one per stream.
+    """
+    return Barrier(None, (), streams, WindowJoin(time, window), capacity)
+
+
+def _per_stream(function, names):
+    return dict(function) if isinstance(function, dict) else {name: function for name in names}
+
+
+class ZipJoin:
+    """Joins frames by position: the first frames of all streams, then the second ones and so on."""
+
+    def start(self, names, capacity):
+        self.dropped = {name: 0 for name in names}
+        self._queues = {name: deque() for name in names}
+        self._capacity = capacity
+        self._non_empty = 0
+
+    def add(self, name, frame):
+        queue = self._queues[name]
+        if not queue:
+            self._non_empty += 1
+        elif len(queue) >= self._capacity:
+            queue.popleft()
+            self.dropped[name] += 1
+        queue.append(frame)
+
+        if self._non_empty < len(self._queues):
+            return ()
+
+        result = {}
+        for queue_name, queue in self._queues.items():
+            result[queue_name] = queue.popleft()
+            if not queue:
+                self._non_empty -= 1
+        return [result]
+
+
+class KeyJoin:
+    """Joins frames of all streams which have the same key. Each frame is joined at most once, frames with equal keys
+    from the same stream are matched first come, first served.
+
+    Each stream's buffer is a hash index from key to frames, so matching a frame costs one lookup per stream. When a
+    buffer is full, the oldest frame of the key which was added to least recently is dropped.
+    """
+
+    def __init__(self, key):
+        self._key = key
+
+    def start(self, names, capacity):
+        self.dropped = {name: 0 for name in names}
+        self._keys = _per_stream(self._key, names)
+        self._indices = {name: OrderedDict() for name in names}
+        self._sizes = {name: 0 for name in names}
+        self._capacity = capacity
+
+    def add(self, name, frame):
+        key = self._keys[name](frame)
+        others = [(other, index) for other, index in self._indices.items() if other != name]
+        if all(key in index for _, index in others):
+            result = {name: frame}
+            for other, index in others:
+                frames = index[key]
+                result[other] = frames.popleft()
+                if not frames:
+                    del index[key]
+                self._sizes[other] -= 1
+            return [result]
+
+        index = self._indices[name]
+        if key in index:
+            index[key].append(frame)
+            index.move_to_end(key)
+        else:
+            index[key] = deque([frame])
+        self._sizes[name] += 1
+
+        if self._sizes[name] > self._capacity:
+            oldest_key, frames = next(iter(index.items()))
+            frames.popleft()
+            if not frames:
+                del index[oldest_key]
+            self._sizes[name] -= 1
+            self.dropped[name] += 1
+        return ()
+
+
+class WindowJoin:
+    """Joins frames of all streams whose timestamps are at most window apart. A new frame is joined with every
+    combination of matching frames buffered for the other streams, and stays buffered itself to match frames which
+    arrive later.
+
+    Frames are expected to arrive in timestamp order per stream. Frames older than the newest timestamp seen on any
+    stream minus window can no longer match and are evicted, so buffers only hold the current window.
+    """
+
+    def __init__(self, time, window):
+        self._time = time
+        self._window = window
+
+    def start(self, names, capacity):
+        self.dropped = {name: 0 for name in names}
+        self._times = _per_stream(self._time, names)
+        self._buffers = {name: deque() for name in names}
+        self._capacity = capacity
+        self._watermark = None
+
+    def add(self, name, frame):
+        timestamp = self._times[name](frame)
+        if self._watermark is None or timestamp > self._watermark:
+            self._watermark = timestamp
+        horizon = self._watermark - self._window
+        for buffer in self._buffers.values():
+            while buffer and buffer[0][0] < horizon:
+                buffer.popleft()
+
+        matches = []
+        for other, buffer in self._buffers.items():
+            if other == name:
+                continue
+            # buffers are in timestamp order, so the matches are at the end
+            other_matches = []
+            for other_timestamp, other_frame in reversed(buffer):
+                if other_timestamp < timestamp - self._window:
+                    break
+                if other_timestamp <= timestamp + self._window:
+                    other_matches.append((other, other_frame))
+            if not other_matches:
+                matches = None
+                break
+            matches.append(reversed(other_matches))
+
+        buffer = self._buffers[name]
+        if len(buffer) >= self._capacity:
+            buffer.popleft()
+            self.dropped[name] += 1
+        buffer.append((timestamp, frame))
+
+        if matches is None:
+            return ()
+        return [dict(combination, **{name: frame}) for combination in itertools.product(*matches)]
@@ -0,0 +1,218 @@
+"""Gates which shed load, keeping a stream responsive when frames arrive faster than it can process them.
+
+    stream.add(RateLimit(rate=1000, burst=100))
+    stream.add(Sample(0.1))
+    shedder = LatencyShedder(target=0.005)
+    stream.add(shedder)
+    stream.add(expensive_transformer())
+    stream.add(shedder.probe())
+
+RateLimit lets frames pass at a fixed rate, Sample and AdaptiveSample let a random share of them pass, and
+LatencyShedder drops a growing share of frames while the latency it measures exceeds its target. All of them count the
+frames they let pass (admitted) and drop (dropped).
+"""
+import random as _random
+import time as _time
+
+from strom.model import Gate, Transformer
+
+
+class SheddingGate(Gate):
+    """Base class of load shedding gates, counting the frames which pass and which are dropped."""
+
+    def __init__(self):
+        super().__init__(self._check, (), {})
+        self.admitted = 0
+        self.dropped = 0
+
+    def __str__(self):
+        return type(self).__name__
+
+    def _check(self, frame):
+        if self._admit(frame):
+            self.admitted += 1
+            return True
+        self.dropped += 1
+        return False
+
+    @property
+    def drop_rate(self):
+        """The share of frames dropped so far."""
+        total = self.admitted + self.dropped
+        return self.dropped / total if total else 0.0
+
+
+class RateLimit(SheddingGate):
+    """A token bucket: lets at most rate frames per second pass on average, and bursts of up to burst frames. Frames
+    arriving while the bucket is empty are dropped.
+    """
+
+    def __init__(self, rate, burst=None, cost=None, clock=_time.monotonic):
+        """
+        :param rate: the number of tokens added to the bucket per second
+        :param burst: the number of tokens the bucket holds at most, rate (but at least one) by default
+        :param cost: a function returning the number of tokens a frame takes, one per frame by default
+        :param clock: the clock measuring the time between frames
+        """
+        super().__init__()
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self._cost = cost
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = None
+
+    def _admit(self, frame):
+        now = self._clock()
+        if self._updated is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        cost = 1 if self._cost is None else self._cost(frame)
+        if self._tokens < cost:
+            return False
+        self._tokens -= cost
+        return True
+
+
+class Sample(SheddingGate):
+    """Lets each frame pass with a fixed probability. Given a key function, the decision is made by the hash of the key
+    instead, so frames with equal keys are either all kept or all dropped (e.g. all events of a session).
+    """
+
+    def __init__(self, probability, key=None, seed=None):
+        super().__init__()
+        if not 0 <= probability <= 1:
+            raise ValueError('probability must be between 0 and 1')
+        self.probability = probability
+        self._key = key
+        self._random = _random.Random(seed).random
+        # keys pass if their (scrambled, as hashes of small ints are the ints themselves) hash falls into the lowest
+        # probability share of the hash range
+        self._hash_limit = int(probability * 2 ** 32)
+
+    def _admit(self, frame):
+        if self._key is not None:
+            return hash(self._key(frame)) * 0x9e3779b1 & 0xffffffff < self._hash_limit
+        return self._random() < self.probability
+
+
+class AdaptiveSample(SheddingGate):
+    """Lets about size frames per interval seconds pass, however many arrive, picking them at random. All frames of an
+    interval pass with the same probability, size divided by the number of frames of the previous interval, and no more
+    than size frames pass per interval.
+
+    This is the streaming counterpart of a reservoir sample: a gate has to decide on each frame as it arrives, so
+    rather than replacing frames in a reservoir it estimates the share to keep from the rate frames arrive at.
+    """
+
+    def __init__(self, size, interval=1.0, seed=None, clock=_time.monotonic):
+        super().__init__()
+        if size < 1:
+            raise ValueError('size must be at least 1')
+        self.size = size
+        self.interval = interval
+        self._random = _random.Random(seed).random
+        self._clock = clock
+        self._interval_end = None
+        self._seen = 0
+        self._kept = 0
+        self._probability = 1.0
+
+    def _admit(self, frame):
+        now = self._clock()
+        if self._interval_end is None or now >= self._interval_end:
+            if self._interval_end is not None:
+                self._probability = min(1.0, self.size / self._seen) if self._seen else 1.0
+            self._interval_end = now + self.interval
+            self._seen = self._kept = 0
+
+        self._seen += 1
+        if self._kept >= self.size or self._random() >= self._probability:
+            return False
+        self._kept += 1
+        return True
+
+
+class LatencyShedder(SheddingGate):
+    """Drops frames while the measured latency exceeds a target. The latency is either the age of a frame when it
+    reaches the gate (given a time function returning its timestamp, as time.time() would), or the time admitted
+    frames take from the gate to a probe placed further down the stream (see probe), or both.
+
+    The latency is smoothed exponentially. Each measurement above the target raises the share of frames dropped by step,
+    each one below lowers it again, up to max_drop. Frames are dropped at random, so some of them still get through and
+    keep the measurements coming.
+    """
+
+    def __init__(self, target, time=None, step=0.01, smoothing=0.1, max_drop=0.99, seed=None,
+                 clock=_time.monotonic, wall_clock=_time.time):
+        """
+        :param target: the latency in seconds which the shedder aims to stay below
+        :param time: a function returning the timestamp of a frame, in seconds since the epoch
+        :param step: how much the drop probability changes with each measurement
+        :param smoothing: the weight of a new measurement in the smoothed latency
+        :param max_drop: the highest drop probability
+        """
+        super().__init__()
+        self.target = target
+        self.step = step
+        self.smoothing = smoothing
+        self.max_drop = max_drop
+        self.latency = None
+        self.drop_probability = 0.0
+        self._time = time
+        self._random = _random.Random(seed).random
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._admitted_at = None
+
+    def measure(self, latency):
+        """Feeds a latency measurement into the shedder."""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+        if self.latency > self.target:
+            self.drop_probability = min(self.max_drop, self.drop_probability + self.step)
+        else:
+            self.drop_probability = max(0.0, self.drop_probability - self.step)
+
+    def _admit(self, frame):
+        if self._time is not None:
+            self.measure(self._wall_clock() - self._time(frame))
+        if self.drop_probability and self._random() < self.drop_probability:
+            return False
+        self._admitted_at = self._clock()
+        return True
+
+    def probe(self):
+        """Returns a transformer which measures the time since the shedder admitted the frame it gets, i.e. how long
+        the elements between the two take. It passes frames on unchanged.
+        """
+        return _LatencyProbe(self)
+
+
+class _LatencyProbe(Transformer):
+
+    def __init__(self, shedder):
+        super().__init__(self._measure, (), {})
+        self._shedder = shedder
+
+    def __str__(self):
+        return 'LatencyProbe'
+
+    def _measure(self, frame):
+        shedder = self._shedder
+        if shedder._admitted_at is not None:
+            shedder.measure(shedder._clock() - shedder._admitted_at)
+        return frame
+
+    def compile_batch(self):
+        measure = self._measure
+
+        def measure_batch(batch):
+            measure(None)
+            return batch
+        return measure_batch
@@ -0,0 +1,102 @@
+import csv
+import json
+
+from strom.model import BufferedSink
+
+
+class _FileSink(BufferedSink):
+    """Base class of sinks writing batches of frames to a file, which is opened with the first batch and closed when
+    the stream closes.
+    """
+
+    def __init__(self, filename, encoding, append, batch_size, flush_interval, background):
+        super().__init__(self._write_batch, (), {}, batch_size, flush_interval, background)
+        self._filename = filename
+        self._encoding = encoding
+        self._append = append
+        self._file = None
+
+    def _open(self):
+        # a stream which runs again continues the file rather than overwriting it
+        mode = 'a' if self._append else 'w'
+        self._append = True
+        return open(self._filename, mode, encoding=self._encoding, newline='')
+
+    def _write_batch(self, batch):
+        if self._file is None:
+            self._file = self._open()
+        self._write_frames(self._file, batch)
+        self._file.flush()
+
+    def flush(self):
+        try:
+            return super().flush()
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class CsvSink(_FileSink):
+    """Writes frames to a CSV file, one row per frame, a batch of rows at a time.
+
+    Frames are either dicts, written in the order of columns (by default the keys of the first frame), or sequences of
+    values. A header line is written if columns are known and the file is empty.
+    """
+
+    def __init__(self, filename, columns=None, separator=';', encoding='utf-8', append=False, batch_size=1024,
+                 flush_interval=None, background=False):
+        """
+        :param filename: the CSV file to write
+        :param columns: the column names, taken from the first frame if it is a dict
+        :param separator: the field delimiter
+        :param encoding: the encoding of the file
+        :param append: append to the file rather than overwriting it, e.g. when resuming from a checkpoint
+        :param batch_size: the number of rows written at a time
+        :param flush_interval: if set, rows are written at least every that many seconds
+        :param background: write on a background thread
+        """
+        super().__init__(filename, encoding, append, batch_size, flush_interval, background)
+        self._separator = separator
+        self._columns = list(columns) if columns is not None else None
+        self._row_writer = None
+
+    def _write_frames(self, csv_file, batch):
+        if self._row_writer is None:
+            if self._columns is None and isinstance(batch[0], dict):
+                self._columns = list(batch[0])
+            if self._columns is not None and csv_file.tell() == 0:
+                csv.writer(csv_file, delimiter=self._separator).writerow(self._columns)
+            if isinstance(batch[0], dict):
+                self._row_writer = csv.DictWriter(csv_file, self._columns, delimiter=self._separator)
+            else:
+                self._row_writer = csv.writer(csv_file, delimiter=self._separator)
+        self._row_writer.writerows(batch)
+
+    def flush(self):
+        try:
+            return super().flush()
+        finally:
+            self._row_writer = None
+
+
+class JsonLinesSink(_FileSink):
+    """Writes frames to a JSON lines file, one JSON document per frame, a batch of lines at a time."""
+
+    def __init__(self, filename, encoding='utf-8', append=False, default=None, batch_size=1024, flush_interval=None,
+                 background=False):
+        """
+        :param filename: the file to write
+        :param encoding: the encoding of the file
+        :param append: append to the file rather than overwriting it, e.g. when resuming from a checkpoint
+        :param default: called for values json cannot serialize, see json.dumps
+        :param batch_size: the number of lines written at a time
+        :param flush_interval: if set, lines are written at least every that many seconds
+        :param background: write on a background thread
+        """
+        super().__init__(filename, encoding, append, batch_size, flush_interval, background)
+        self._encode = json.JSONEncoder(default=default).encode
+
+    def _write_frames(self, json_file, batch):
+        encode = self._encode
+        json_file.write(''.join([encode(frame) + '\n' for frame in batch]))
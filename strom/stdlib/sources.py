@@ -1,30 +1,275 @@
+import csv
+import mmap
+import operator
+import os
+import selectors
+from queue import Queue, Empty
+
 from strom.model import Source
-from strom.model import blockly
 
 
 class CsvSource(Source):
-    """Uses pandas.read_csv to load a CSV file and return it as frames."""
+    """Streams a CSV file in bounded chunks, so files much larger than memory can be processed.
+
+    By default each frame is a row, given as a dict mapping column names to values. Rows are read with the csv module of
+    the standard library, which buffers the file but never loads it as a whole. With chunks=True each frame is instead a
+    pandas DataFrame of up to chunksize rows, read via pandas.read_csv(chunksize=...).
+
+    In row mode, the position of the source (see Source.position) is the byte offset of the next row, so resuming from
+    a checkpoint seeks right to it.
+    """
+
+    def __init__(self, filename, separator=';', chunks=False, chunksize=10000, usecols=None, dtype=None,
+                 encoding='utf-8'):
+        """
+        :param filename: the CSV file to read
+        :param separator: the field delimiter
+        :param chunks: emit DataFrame chunks (requires pandas) rather than row dicts
+        :param chunksize: the number of rows per DataFrame chunk
+        :param usecols: the columns to keep, all columns are kept if None. Dropping columns early saves both memory and
+            conversion time.
+        :param dtype: a dict mapping column names to types. In row mode the type is called with the field text (e.g. int
+            or float), in chunk mode the dict is handed to pandas as is.
+        :param encoding: the encoding of the file
+        """
+        super().__init__(self._read_chunks if chunks else self._read_rows, (), {}, all_at_once=True)
+        self._filename = filename
+        self._separator = separator
+        self._chunksize = chunksize
+        self._usecols = usecols
+        self._dtype = dtype or {}
+        self._encoding = encoding
+        self._chunks = chunks
+        # byte offsets of the file: where to start reading, how far we've read and where the last row pulled begins/ends
+        self._start_offset = None
+        self._read_offset = 0
+        self._row_start = None
+        self._row_end = None
+
+    def _read_rows(self):
+        with open(self._filename, 'rb') as csv_file:
+            reader = csv.reader(self._decode_lines(csv_file), delimiter=self._separator)
+            header = next(reader, None)
+            if header is None:
+                return
+            if self._start_offset is not None:
+                csv_file.seek(self._start_offset)
+                self._read_offset = self._start_offset
+            self._row_end = self._read_offset
+
+            names = header if self._usecols is None else list(self._usecols)
+            missing = [name for name in names if name not in header]
+            if missing:
+                raise ValueError('Columns %s are not in %s' % (missing, self._filename))
+            converters = [self._dtype.get(name) for name in names]
+            # blank lines come out as empty rows, skip them as csv.DictReader and pandas do
+            reader = (row for row in reader if row)
+
+            # pick the cheapest way of turning a row into a dict for the configuration at hand
+            if self._usecols is not None:
+                pick = operator.itemgetter(*[header.index(name) for name in names])
+                if len(names) == 1:
+                    rows = ((pick(row),) for row in reader)
+                else:
+                    rows = (pick(row) for row in reader)
+            else:
+                rows = reader
+
+            if not any(converters):
+                for row in rows:
+                    self._row_start, self._row_end = self._row_end, self._read_offset
+                    yield dict(zip(names, row))
+            else:
+                columns = [(name, converter or str) for name, converter in zip(names, converters)]
+                for row in rows:
+                    self._row_start, self._row_end = self._row_end, self._read_offset
+                    yield {name: converter(value) for (name, converter), value in zip(columns, row)}
 
-    @blockly(type='String')
-    def set_filename(self, value):
-        self._filename = None
+    def _decode_lines(self, csv_file):
+        """Decodes the lines of the binary file for the csv reader, keeping track of the byte offset read up to."""
+        encoding = self._encoding
+        for line in csv_file:
+            self._read_offset += len(line)
+            yield line.decode(encoding)
 
-    @blockly(type='String')
-    def set_separator(self, value):
-        self._separator = value
+    def position(self):
+        """Returns the byte offset of the next row in the file, or the number of chunks delivered in chunk mode."""
+        if self._chunks:
+            return super().position()
+        return self._row_start if self._frame_pending() else self._row_end
 
-    def __init__(self):
-        self._filename = None
-        self._separator = None
-        self._frames = None
+    def seek(self, position):
+        if self._chunks:
+            return super().seek(position)
+        if self._row_end is not None:
+            raise ValueError('Source %s can only seek before its first frame' % str(self))
+        self._start_offset = position
 
-    def get_frame(self):
+    def _read_chunks(self):
         import pandas
-        super().get_frame()
 
-        if self._frames is None:
-            sep = self._separator or ';'
-            self._frames = pandas.read_csv(self._filename, sep=sep)
+        reader = pandas.read_csv(self._filename, sep=self._separator, chunksize=self._chunksize,
+                                 usecols=self._usecols, dtype=self._dtype or None, encoding=self._encoding)
+        with reader:
+            yield from reader
+
+
+class QueueSource(Source):
+    """Delivers the frames other threads put into a queue. Streams reading from it sleep in a blocking get until a frame
+    arrives. Putting QueueSource.END into the queue (or calling close) closes the source.
+    """
+
+    END = object()
+
+    def __init__(self, queue=None):
+        super().__init__(self._take, (), {}, closer=self._is_closed, waiter=self._fetch)
+        self.queue = Queue() if queue is None else queue
+        self._frame = None
+        self._closed = False
+
+    def put(self, frame):
+        self.queue.put(frame)
+
+    def close(self):
+        self.queue.put(QueueSource.END)
+
+    def _fetch(self, timeout=None, block=True):
+        if self._frame is not None or self._closed:
+            return
+        try:
+            frame = self.queue.get(block, timeout)
+        except Empty:
+            return
+        if frame is QueueSource.END:
+            self._closed = True
+        else:
+            self._frame = frame
+
+    def _take(self):
+        self._fetch(block=False)
+        frame, self._frame = self._frame, None
+        return frame
+
+    def _is_closed(self):
+        self._fetch(block=False)
+        return self._closed and self._frame is None
+
+
+class SelectorSource(Source):
+    """Delivers the data which can be read from a file descriptor, e.g. a pipe or a socket, as frames. Streams reading
+    from it sleep in a selector until the descriptor becomes readable. The source closes once a read returns no data.
+
+    By default each frame is the bytes a single os.read returns. A custom read function gets the file object and must
+    not buffer beyond what it returns, as buffered data doesn't wake up the selector.
+    """
+
+    def __init__(self, fileobj, read=None, size=65536):
+        super().__init__(self._read, (), {}, closer=self._is_closed, waiter=self._wait)
+        self._fileobj = fileobj
+        if read is None:
+            fd = fileobj if isinstance(fileobj, int) else fileobj.fileno()
+            read = lambda _: os.read(fd, size)
+        self._read_function = read
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(fileobj, selectors.EVENT_READ)
+        self._closed = False
+
+    def _read(self):
+        if self._closed or not self._selector.select(0):
+            return None
+        data = self._read_function(self._fileobj)
+        if not data:
+            self._closed = True
+            self._selector.close()
+            return None
+        return data
+
+    def _is_closed(self):
+        return self._closed
+
+    def _wait(self, timeout=None):
+        if not self._closed:
+            self._selector.select(timeout)
+
+
+class RecordSource(Source):
+    """Delivers the fixed-size binary records of a file without copying them. The file is memory-mapped and each frame
+    is a memoryview of records_per_frame records (struct.unpack_from reads fields straight from it). Given a NumPy dtype
+    instead of a record size, each frame is a read-only structured array viewing the records.
+
+    The position of the source (see Source.position) is the index of the next record, so streams can start mid-file
+    (start or seek) and resume from checkpoints. A partial record at the end of the file is ignored. Frames stay valid
+    after the source is closed, the mapping goes away along with the last of them.
+    """
+
+    def __init__(self, filename, record_size=None, dtype=None, records_per_frame=1, start=0):
+        """
+        :param filename: the file to read
+        :param record_size: the size of a record in bytes
+        :param dtype: a NumPy (structured) dtype of the records, instead of record_size
+        :param records_per_frame: the number of records in each frame
+        :param start: the index of the first record to deliver
+        """
+        super().__init__(self._read, (), {}, closer=self._is_closed)
+        if (record_size is None) == (dtype is None):
+            raise ValueError('Either record_size or dtype must be given')
+        if dtype is not None:
+            import numpy
+            self._frombuffer = numpy.frombuffer
+            self._dtype = numpy.dtype(dtype)
+            record_size = self._dtype.itemsize
+        else:
+            self._dtype = None
+        if record_size < 1 or records_per_frame < 1:
+            raise ValueError('record_size and records_per_frame must be at least 1')
+        self._filename = filename
+        self._record_size = record_size
+        self._records_per_frame = records_per_frame
+        self._index = start
+        self._count = None
+        self._mmap = None
+        self._view = None
+        self._closed = False
+
+    def _open(self):
+        with open(self._filename, 'rb') as record_file:
+            size = os.fstat(record_file.fileno()).st_size
+            self._count = size // self._record_size
+            # empty files cannot be mapped, but then there's nothing to read either
+            if self._count:
+                self._mmap = mmap.mmap(record_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap)
+
+    def _is_closed(self):
+        if self._count is None:
+            self._open()
+        if self._index < self._count:
+            return False
+        # outstanding frames keep the mapping alive
+        self._mmap = self._view = None
+        self._closed = True
+        return True
+
+    def _read(self):
+        start = self._index
+        stop = min(start + self._records_per_frame, self._count)
+        self._index = stop
+        if self._dtype is not None:
+            return self._frombuffer(self._mmap, self._dtype, stop - start, start * self._record_size)
+        return self._view[start * self._record_size:stop * self._record_size]
+
+    def get_batch(self, size):
+        batch = []
+        read = self._read
+        while len(batch) < size and not self._is_closed():
+            batch.append(read())
+        return batch
 
-        return self._frames.pop(self._frames.index[0])
+    def position(self):
+        return self._index
 
+    def seek(self, position):
+        # closed sources stay closed, they have given up their mapping
+        if self._closed:
+            raise ValueError('Source %s is closed' % str(self))
+        self._index = position
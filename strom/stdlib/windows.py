@@ -0,0 +1,353 @@
+"""Windowed aggregation transformers.
+
+Windows collect the values of consecutive frames, either a number of frames (size) or a span of time (duration), and
+emit a dictionary with one result per aggregate. Aggregates are updated incrementally as values enter and leave a
+window, so each frame costs O(1) amortized no matter how large the window is:
+
+    stream.add(SlidingWindow({'mean': Mean, 'max': Max}, size=100, value=lambda frame: frame['price']))
+
+SlidingWindow emits for every frame, TumblingWindow once per window and SessionWindow once per burst of frames. Time
+windows also put the start and end of the window into their results. Timestamps come from the time function, which
+defaults to the wall clock time at which a frame arrives.
+"""
+import math
+import time as _time
+from collections import deque
+
+from strom.model import Transformer
+
+
+class Count:
+    """Counts the values in the window."""
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+
+    def remove(self, value):
+        self.count -= 1
+
+    def reset(self):
+        self.count = 0
+
+    def result(self):
+        return self.count
+
+
+class Sum:
+    """Running sum of the values in the window."""
+
+    def __init__(self):
+        self.total = 0
+
+    def add(self, value):
+        self.total += value
+
+    def remove(self, value):
+        self.total -= value
+
+    def reset(self):
+        self.total = 0
+
+    def result(self):
+        return self.total
+
+
+class Mean:
+    """Mean of the values in the window, NaN for an empty window."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+
+    def remove(self, value):
+        self.count -= 1
+        self.total -= value
+
+    def reset(self):
+        self.count = 0
+        self.total = 0
+
+    def result(self):
+        return self.total / self.count if self.count else math.nan
+
+
+class Variance:
+    """Sample variance of the values in the window, maintained with Welford's algorithm which stays numerically stable
+    as values come and go. NaN for windows with fewer than two values.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.squares += delta * (value - self.mean)
+
+    def remove(self, value):
+        if self.count == 1:
+            self.reset()
+            return
+        self.count -= 1
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.squares -= delta * (value - self.mean)
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.squares = 0.0
+
+    def result(self):
+        return max(self.squares, 0.0) / (self.count - 1) if self.count > 1 else math.nan
+
+
+class StdDev(Variance):
+    """Sample standard deviation of the values in the window."""
+
+    def result(self):
+        return math.sqrt(super().result())
+
+
+class _Extremum:
+    """Monotonic deque of the values which can still become the extremum of the window. Values leave the window in the
+    order they entered, so each value is pushed and popped at most once.
+    """
+
+    def __init__(self):
+        self.candidates = deque()
+        self.added = 0
+        self.removed = 0
+
+    def add(self, value):
+        candidates = self.candidates
+        while candidates and not self._precedes(candidates[-1][1], value):
+            candidates.pop()
+        candidates.append((self.added, value))
+        self.added += 1
+
+    def remove(self, value):
+        if self.candidates and self.candidates[0][0] == self.removed:
+            self.candidates.popleft()
+        self.removed += 1
+
+    def reset(self):
+        self.candidates.clear()
+        self.added = 0
+        self.removed = 0
+
+    def result(self):
+        return self.candidates[0][1] if self.candidates else None
+
+
+class Min(_Extremum):
+    """Smallest value in the window."""
+
+    @staticmethod
+    def _precedes(candidate, value):
+        return candidate < value
+
+
+class Max(_Extremum):
+    """Largest value in the window."""
+
+    @staticmethod
+    def _precedes(candidate, value):
+        return candidate > value
+
+
+def _identity(frame):
+    return frame
+
+
+def _arrival_time(frame):
+    return _time.time()
+
+
+class Window(Transformer):
+    """Base class of windows, keeping the aggregates up to date. Windows are stateful and take part in checkpoints (see
+    strom.checkpoint).
+    """
+
+    # the attributes making up the state of the window, besides its aggregates
+    _state_attributes = ()
+
+    def __init__(self, aggregates, value=None, time=None):
+        """
+        :param aggregates: a dictionary mapping result names to aggregate classes, e.g. {'mean': Mean}
+        :param value: a function returning the value of a frame which is aggregated, the frame itself by default
+        :param time: a function returning the timestamp of a frame in seconds, for time windows
+        """
+        super().__init__(None, (), {})
+        if not aggregates:
+            raise ValueError('A window needs at least one aggregate')
+        self._aggregates = [(name, aggregate()) for name, aggregate in aggregates.items()]
+        self._value = value or _identity
+        self._time = time or _arrival_time
+
+    def __str__(self):
+        return type(self).__name__
+
+    def get_state(self):
+        state = {name: getattr(self, name) for name in self._state_attributes}
+        state['_aggregates'] = self._aggregates
+        return state
+
+    def set_state(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _add(self, value):
+        for _, aggregate in self._aggregates:
+            aggregate.add(value)
+
+    def _remove(self, value):
+        for _, aggregate in self._aggregates:
+            aggregate.remove(value)
+
+    def _reset(self):
+        for _, aggregate in self._aggregates:
+            aggregate.reset()
+
+    def _result(self, **extra):
+        result = {name: aggregate.result() for name, aggregate in self._aggregates}
+        result.update(extra)
+        return result
+
+
+def _check_extent(size, duration):
+    if (size is None) == (duration is None):
+        raise ValueError('A window needs either a size or a duration')
+    if size is not None and size < 1 or duration is not None and duration <= 0:
+        raise ValueError('The size or duration of a window must be positive')
+
+
+class SlidingWindow(Window):
+    """Emits the aggregates over the last size frames, or the frames of the last duration seconds, for every frame."""
+
+    _state_attributes = ('_values', '_times')
+
+    def __init__(self, aggregates, size=None, duration=None, value=None, time=None):
+        super().__init__(aggregates, value, time)
+        _check_extent(size, duration)
+        self._size = size
+        self._duration = duration
+        self._values = deque()
+        self._times = deque()
+
+    def transform(self, frame):
+        value = self._value(frame)
+        self._add(value)
+        self._values.append(value)
+
+        if self._size is not None:
+            if len(self._values) > self._size:
+                self._remove(self._values.popleft())
+            return self._result()
+
+        timestamp = self._time(frame)
+        self._times.append(timestamp)
+        horizon = timestamp - self._duration
+        while self._times[0] <= horizon:
+            self._times.popleft()
+            self._remove(self._values.popleft())
+        return self._result(start=horizon, end=timestamp)
+
+
+class TumblingWindow(Window):
+    """Emits the aggregates over consecutive, non-overlapping windows of size frames or duration seconds. Time windows
+    are aligned to multiples of duration. A window's result is emitted once it is complete, which for time windows is
+    when the first frame of a later window arrives; the last window is emitted when the stream's source closes.
+    """
+
+    _state_attributes = ('_count', '_start')
+
+    def __init__(self, aggregates, size=None, duration=None, value=None, time=None):
+        super().__init__(aggregates, value, time)
+        _check_extent(size, duration)
+        self._size = size
+        self._duration = duration
+        self._count = 0
+        self._start = None
+
+    def transform(self, frame):
+        value = self._value(frame)
+        if self._size is not None:
+            self._add(value)
+            self._count += 1
+            if self._count < self._size:
+                return None
+            self._count = 0
+            result = self._result()
+            self._reset()
+            return result
+
+        start = math.floor(self._time(frame) / self._duration) * self._duration
+        result = None
+        if self._start is None:
+            self._start = start
+        elif start > self._start:
+            result = self._close_window()
+            self._start = start
+        self._add(value)
+        self._count += 1
+        return result
+
+    def _close_window(self):
+        if self._size is not None:
+            result = self._result()
+        else:
+            result = self._result(start=self._start, end=self._start + self._duration)
+        self._count = 0
+        self._reset()
+        return result
+
+    def flush(self):
+        return [self._close_window()] if self._count else []
+
+
+class SessionWindow(Window):
+    """Emits the aggregates over sessions, i.e. runs of frames in which no two consecutive frames are more than gap
+    seconds apart. A session's result is emitted when the first frame of the next session arrives, the last session is
+    emitted when the stream's source closes. Sessions are defined by time only, there is no count-based variant.
+    """
+
+    _state_attributes = ('_start', '_last')
+
+    def __init__(self, aggregates, gap, value=None, time=None):
+        super().__init__(aggregates, value, time)
+        if gap <= 0:
+            raise ValueError('The gap of a session window must be positive')
+        self._gap = gap
+        self._start = None
+        self._last = None
+
+    def transform(self, frame):
+        value = self._value(frame)
+        timestamp = self._time(frame)
+        result = None
+        if self._last is not None and timestamp - self._last > self._gap:
+            result = self._close_session()
+        if self._start is None:
+            self._start = timestamp
+        self._add(value)
+        self._last = timestamp
+        return result
+
+    def _close_session(self):
+        result = self._result(start=self._start, end=self._last)
+        self._reset()
+        self._start = None
+        self._last = None
+        return result
+
+    def flush(self):
+        return [self._close_session()] if self._last is not None else []
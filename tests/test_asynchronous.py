@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from strom import *
+from strom.model import GateFailedException
+from strom.stdlib import QueueSource
+
+
+@stream_source
+async def async_up_to(count):
+    for frame in range(count):
+        await asyncio.sleep(0)
+        yield frame
+
+
+@stream_source
+def up_to(count):
+    yield from range(count)
+
+
+@stream_transformer
+async def slow_double(frame):
+    await asyncio.sleep(0.001 * (frame % 3))
+    return frame * 2
+
+
+@stream_gate
+def is_even(frame):
+    return frame % 4 == 0
+
+
+@stream_gate(fatal=True)
+async def below(frame, limit):
+    return frame < limit
+
+
+class TestRunAsync(TestCase):
+
+    def create_stream(self, source, *elements):
+        sink_result = []
+        @stream_sink
+        async def add_to_list(frame):
+            await asyncio.sleep(0)
+            sink_result.append(frame)
+
+        stream = Stream(source=source, sink=add_to_list())
+        for element in elements:
+            stream.add(element)
+        return stream, sink_result
+
+    def test_async_elements(self):
+        stream, sink_result = self.create_stream(async_up_to(20), slow_double(), is_even())
+        asyncio.run(stream.run_async())
+        self.assertListEqual(sink_result, list(range(0, 40, 4)))
+
+    def test_concurrency_keeps_order(self):
+        stream, sink_result = self.create_stream(up_to(30), slow_double())
+        asyncio.run(stream.run_async(concurrency=8))
+        self.assertListEqual(sink_result, list(range(0, 60, 2)))
+
+    def test_streams_share_loop(self):
+        first, first_result = self.create_stream(async_up_to(10), slow_double())
+        second, second_result = self.create_stream(up_to(5))
+
+        async def run_both():
+            await asyncio.gather(first.run_async(concurrency=4), second.run_async())
+
+        asyncio.run(run_both())
+        self.assertListEqual(first_result, list(range(0, 20, 2)))
+        self.assertListEqual(second_result, list(range(5)))
+
+    def test_idle_sync_source_does_not_spin(self):
+        source = QueueSource()
+        stream, sink_result = self.create_stream(source)
+        calls = []
+        get_batch = source.get_batch
+        source.get_batch = lambda size: calls.append(size) or get_batch(size)
+
+        def feed():
+            source.put(1)
+            time.sleep(0.5)
+            source.put(2)
+            source.close()
+        feeder = threading.Thread(target=feed)
+        feeder.start()
+        cpu_start = time.process_time()
+        asyncio.run(stream.run_async())
+        cpu_time = time.process_time() - cpu_start
+        feeder.join()
+
+        self.assertListEqual(sink_result, [1, 2])
+        self.assertLess(len(calls), 20)
+        self.assertLess(cpu_time, 0.2)
+
+    def test_fatal_async_gate(self):
+        stream, _ = self.create_stream(up_to(10), below(5))
+        self.assertRaises(GateFailedException, asyncio.run, stream.run_async())
+
+    def test_run_rejects_async_elements(self):
+        stream, _ = self.create_stream(up_to(10), slow_double())
+        self.assertRaises(ValueError, stream.run)
@@ -28,4 +28,4 @@ class TestBasicStream(TestCase):
         stream.sink = add_to_result()
         stream.run()
 
-        self.assertListEqual(sink_result, [28, 26, 24, 22, 20, 18, 16, 14, 12, 10])
\ No newline at end of file
+        self.assertListEqual(sink_result, [10, 12, 14, 16, 18, 20, 22, 24, 26, 28])
\ No newline at end of file
@@ -0,0 +1,18 @@
+from unittest import TestCase
+
+from strom import bench
+
+
+class TestBench(TestCase):
+
+    def test_run_suite(self):
+        report = bench.run_suite(frames=200, repeat=1)
+        self.assertListEqual([result['name'] for result in report['results']], list(bench.BENCHMARKS))
+        for result in report['results']:
+            self.assertEqual(result['frames'], 200)
+            self.assertGreater(result['frames_per_second'], 0)
+
+    def test_compare(self):
+        report = bench.run_suite(['empty'], frames=200, repeat=1)
+        baseline = {'results': [dict(report['results'][0], ns_per_frame=report['results'][0]['ns_per_frame'] / 2)]}
+        self.assertIn('+100.0%', bench.format_report(report, baseline))
@@ -0,0 +1,134 @@
+from unittest import TestCase
+
+from strom import *
+from strom.cache import MISSING, LRUCache, SizedLRUCache, TTLCache
+
+
+@stream_source
+def repeating(values):
+    yield from values
+
+
+@stream_sink
+def add_to_list(frame, result):
+    result.append(frame)
+
+
+class TestMemoizedElements(TestCase):
+
+    def test_transformer_is_called_once_per_frame(self):
+        calls = []
+
+        @stream_transformer(cache=16)
+        def square(frame):
+            calls.append(frame)
+            return frame * frame
+
+        result = []
+        transformer = square()
+        stream = Stream(source=repeating([1, 2, 1, 3, 2, 1]), sink=add_to_list(result))
+        stream.add(transformer)
+        stream.run()
+        self.assertEqual([1, 4, 1, 9, 4, 1], result)
+        self.assertEqual([1, 2, 3], calls)
+        self.assertEqual((3, 3), (transformer.cache.hits, transformer.cache.misses))
+
+    def test_dropped_frames_are_cached(self):
+        calls = []
+
+        @stream_gate(cache=16, cache_key=lambda frame: frame['id'])
+        def is_known(frame):
+            calls.append(frame['id'])
+            return frame['id'] != 2
+
+        result = []
+        frames = [{'id': 1}, {'id': 2}, {'id': 2}, {'id': 1}]
+        stream = Stream(source=repeating(frames), sink=add_to_list(result))
+        stream.add(is_known())
+        stream.run()
+        self.assertEqual([{'id': 1}, {'id': 1}], result)
+        self.assertEqual([1, 2], calls)
+
+    def test_threaded_transformer(self):
+        @stream_transformer(workers=4, cache=LRUCache(8))
+        def double(frame):
+            return frame * 2
+
+        result = []
+        transformer = double()
+        stream = Stream(source=repeating([i % 10 for i in range(200)]), sink=add_to_list(result))
+        stream.add(transformer)
+        stream.run()
+        self.assertEqual([(i % 10) * 2 for i in range(200)], result)
+        self.assertEqual(200, transformer.cache.hits + transformer.cache.misses)
+
+    def test_shared_cache_tells_elements_apart(self):
+        cache = LRUCache(16)
+
+        @stream_transformer(cache=cache)
+        def add(frame, amount):
+            return frame + amount
+
+        @stream_transformer(cache=cache)
+        def subtract(frame, amount):
+            return frame - amount
+
+        @stream_transformer(cache=cache)
+        def add_all(frame, amounts):
+            return frame + sum(amounts)
+
+        self.assertEqual(add(1).transform(5), 6)
+        self.assertEqual(add(100).transform(5), 105)
+        self.assertEqual(subtract(1).transform(5), 4)
+        self.assertEqual(add_all([1, 2]).transform(5), 8)
+        self.assertEqual(add_all([3]).transform(5), 8)
+        self.assertEqual(add(1).transform(5), 6)
+        self.assertEqual(cache.hits, 1)
+
+    def test_batch_transformers_cannot_be_memoized(self):
+        @stream_transformer(batch=True, cache=16)
+        def identity(batch):
+            return batch
+
+        with self.assertRaises(ValueError):
+            identity()
+
+
+class TestCaches(TestCase):
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIs(MISSING, cache.get('b'))
+        self.assertEqual(2, len(cache))
+
+    def test_sized_lru_keeps_within_bytes(self):
+        cache = SizedLRUCache(100, sizeof=lambda key, value: len(value))
+        cache.put(1, 'x' * 40)
+        cache.put(2, 'x' * 40)
+        cache.put(3, 'x' * 40)
+        self.assertEqual(80, cache.bytes)
+        self.assertEqual([2, 3], list(cache._entries))
+
+        cache.put(4, 'x' * 200)
+        self.assertEqual([2, 3], list(cache._entries))
+
+    def test_ttl_expires_entries(self):
+        now = [0.0]
+        cache = TTLCache(10, maxsize=2, clock=lambda: now[0])
+        cache.put('a', 1)
+        now[0] = 5
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+
+        now[0] = 12
+        cache.put('c', 3)
+        self.assertEqual(['b', 'c'], list(cache._entries))
+        self.assertEqual(2, cache.get('b'))
+        now[0] = 15
+        self.assertIs(MISSING, cache.get('b'))
+        self.assertEqual(1, cache.misses)
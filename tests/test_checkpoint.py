@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from strom import *
+from strom.checkpoint import load_checkpoint, write_atomically
+from strom.stdlib import CsvSource, TumblingWindow
+from strom.stdlib.windows import Sum
+
+
+@stream_source
+def up_to(count):
+    yield from range(count)
+
+
+class Crash(Exception):
+    pass
+
+
+@stream_sink
+def add_to_list(frame, result, crash_at=None):
+    if frame == crash_at:
+        raise Crash()
+    result.append(frame)
+
+
+class TestCheckpoints(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_with_crash(self, create_source, crash_at, *elements):
+        first_run = []
+        stream = Stream(source=create_source(), sink=add_to_list(first_run, crash_at))
+        for element in elements:
+            stream.add(element)
+        stream.enable_checkpoints(self.path, interval=0)
+        self.assertRaises(Crash, stream.run)
+        return stream, first_run
+
+    def test_resume_iterable(self):
+        _, first_run = self.run_with_crash(lambda: up_to(1000), 700)
+        position = load_checkpoint(self.path)['position']
+        self.assertGreater(position, 600)
+        self.assertLessEqual(position, 700)
+
+        second_run = []
+        stream = Stream(source=up_to(1000), sink=add_to_list(second_run))
+        stream.run(resume_from=self.path)
+
+        self.assertEqual(second_run[0], position)
+        self.assertListEqual(sorted(set(first_run + second_run)), list(range(1000)))
+
+    def test_final_checkpoint(self):
+        stream = Stream(source=up_to(100), sink=add_to_list([]))
+        stream.enable_checkpoints(self.path)
+        stream.run()
+        self.assertEqual(load_checkpoint(self.path)['position'], 100)
+
+        resumed = []
+        Stream(source=up_to(100), sink=add_to_list(resumed)).run(resume_from=self.path)
+        self.assertListEqual(resumed, [])
+
+    def test_missing_checkpoint_starts_over(self):
+        result = []
+        Stream(source=up_to(10), sink=add_to_list(result)).run(resume_from=self.path)
+        self.assertListEqual(result, list(range(10)))
+
+    def test_resume_csv_by_offset(self):
+        filename = os.path.join(self.directory, 'input.csv')
+        with open(filename, 'w') as csv_file:
+            csv_file.write('id;text\n')
+            for idx in range(500):
+                csv_file.write('%d;"row\nnumber %d"\n' % (idx, idx))
+
+        @stream_transformer
+        def row_id(frame):
+            return int(frame['id'])
+
+        _, first_run = self.run_with_crash(lambda: CsvSource(filename), 400, row_id())
+        second_run = []
+        stream = Stream(source=CsvSource(filename), sink=add_to_list(second_run))
+        stream.add(row_id())
+        stream.run(resume_from=self.path)
+
+        self.assertGreater(second_run[0], 300)
+        self.assertListEqual(sorted(set(first_run + second_run)), list(range(500)))
+
+    def test_element_state(self):
+        @stream_transformer
+        def window_sum(frame):
+            return frame['sum']
+
+        _, first_run = self.run_with_crash(lambda: up_to(1000), 5045, TumblingWindow({'sum': Sum}, size=10),
+                                           window_sum())
+        self.assertGreater(load_checkpoint(self.path)['states'][0]['_count'], 0)
+
+        second_run = []
+        stream = Stream(source=up_to(1000), sink=add_to_list(second_run))
+        stream.add(TumblingWindow({'sum': Sum}, size=10))
+        stream.add(window_sum())
+        stream.run(resume_from=self.path)
+
+        expected = [sum(range(start, start + 10)) for start in range(0, 1000, 10)]
+        self.assertListEqual(sorted(set(first_run + second_run)), expected)
+
+    def test_threaded_transformers_are_rejected(self):
+        @stream_transformer(workers=2)
+        def identity(frame):
+            return frame
+
+        stream = Stream(source=up_to(10), sink=add_to_list([]))
+        stream.add(identity())
+        stream.enable_checkpoints(self.path)
+        self.assertRaises(ValueError, stream.run)
+
+    def test_splits_are_rejected(self):
+        stream = Stream(source=up_to(10), sink=add_to_list([]))
+        split = stream.split()
+        split.sink = add_to_list([])
+        stream.enable_checkpoints(self.path, interval=0)
+        self.assertRaises(ValueError, stream.run)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_write_atomically(self):
+        write_atomically(self.path, b'first')
+        write_atomically(self.path, b'second')
+        with open(self.path, 'rb') as checkpoint_file:
+            self.assertEqual(checkpoint_file.read(), b'second')
+        self.assertListEqual(os.listdir(self.directory), ['checkpoint'])
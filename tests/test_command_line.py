@@ -0,0 +1,73 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PIPELINE = '''
+from strom import *
+
+@stream_source
+def numbers():
+    yield from range(6)
+
+@stream_transformer
+def add_number(frame, number):
+    return frame + number
+
+@stream_sink
+def print_sink(frame, prefix):
+    print(prefix, frame)
+
+stream = Stream(name='main', source=numbers(), sink=print_sink('main'))
+stream.add(add_number(10))
+doubled = stream.split()
+doubled.add(add_number(100))
+doubled.sink = print_sink('split')
+
+other = Stream(source=numbers(), sink=print_sink('other'))
+'''
+
+
+class TestRunCommand(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, 'pipeline.py'), 'w') as module_file:
+            module_file.write(PIPELINE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def strom(self, *args):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, self.directory]))
+        return subprocess.run([sys.executable, '-m', 'strom.command_line'] + list(args), env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    def test_runs_all_streams(self):
+        result = self.strom('run', '--module', 'pipeline')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        lines = result.stdout.splitlines()
+        printed = lambda prefix: [line for line in lines if line.startswith(prefix)]
+        self.assertListEqual(printed('main'), ['main %d' % (i + 10) for i in range(6)])
+        self.assertListEqual(printed('split'), ['split %d' % (i + 110) for i in range(6)])
+        self.assertEqual(len(printed('other')), 6)
+
+    def test_runs_one_stream(self):
+        result = self.strom('run', '--module', 'pipeline', '--stream', 'other')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertListEqual(result.stdout.splitlines(), ['other %d' % i for i in range(6)])
+
+        result = self.strom('run', '--module', 'pipeline', '--stream', 'missing')
+        self.assertNotEqual(result.returncode, 0)
+
+    def test_optional_dependencies_are_imported_lazily(self):
+        code = 'import sys, strom, strom.stdlib, strom.command_line; print(" ".join(sys.modules))'
+        output = subprocess.run([sys.executable, '-c', code], env=dict(os.environ, PYTHONPATH=ROOT),
+                                stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+        modules = output.split()
+        for module in ['pandas', 'numpy', 'svgwrite', 'strom.painter', 'strom.parallel', 'asyncio']:
+            self.assertNotIn(module, modules)
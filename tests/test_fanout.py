@@ -0,0 +1,201 @@
+import threading
+from unittest import TestCase
+
+from strom import *
+from strom.fanout import FanOutBuffer, SplitBufferBlocked
+from strom.metrics import profile_stream
+
+
+@stream_source
+def up_to(count):
+    yield from range(count)
+
+
+@stream_sink
+def add_to_list(frame, result):
+    result.append(frame)
+
+
+class TestSplitBuffer(TestCase):
+
+    def test_splits_at_one_point_share_a_buffer(self):
+        stream = Stream(source=up_to(100), sink=add_to_list([]))
+        results = [[], [], []]
+        splits = [stream.split() for _ in results]
+        for split, result in zip(splits, results):
+            split.sink = add_to_list(result)
+
+        self.assertEqual(len(stream.elements), 1)
+        self.assertListEqual(stream.elements[0].split_streams, splits)
+        Runtime([stream], quantum=7, max_buffered=20).run()
+        for result in results:
+            self.assertListEqual(result, list(range(100)))
+
+    def test_batches(self):
+        result = []
+        stream = Stream(source=up_to(100), sink=add_to_list([]))
+        split = stream.split()
+        split.sink = add_to_list(result)
+        stream.run(batch_size=16)
+        split.run(batch_size=16)
+        self.assertListEqual(result, list(range(100)))
+        self.assertEqual(stream.elements[0].split_buffer.qsize(), 0)
+
+    def test_frames_are_forgotten_once_read(self):
+        buffer = FanOutBuffer()
+        fast, slow = buffer.add_reader(), buffer.add_reader()
+        for frame in range(1000):
+            buffer.put(frame)
+            self.assertEqual(fast.get(), frame)
+            if frame % 2:
+                self.assertEqual(slow.get(), frame // 2)
+        self.assertEqual(buffer.qsize(), 500)
+        self.assertLessEqual(len(buffer._frames), 1000)
+
+        buffer.remove_reader(slow)
+        buffer.put(1000)
+        self.assertEqual(buffer.qsize(), 1)
+        self.assertEqual(len(buffer._frames), 1)
+
+    def test_drop_oldest(self):
+        result = []
+        stream = Stream(source=up_to(1000), sink=add_to_list([]))
+        split = stream.split(capacity=100, overflow='drop_oldest')
+        split.sink = add_to_list(result)
+        stream.run()
+        buffer = stream.elements[0].split_buffer
+        self.assertLessEqual(len(buffer._frames), 100)
+
+        split.run()
+        self.assertEqual(result[-1], 999)
+        self.assertListEqual(result, list(range(1000 - len(result), 1000)))
+        self.assertEqual(buffer.dropped, 1000 - len(result))
+
+    def test_spill(self):
+        result = []
+        stream = Stream(source=up_to(1000), sink=add_to_list([]))
+        split = stream.split(capacity=50, overflow='spill')
+        split.sink = add_to_list(result)
+        stream.run()
+        buffer = stream.elements[0].split_buffer
+        self.assertLessEqual(len(buffer._frames), 50)
+
+        split.run()
+        self.assertListEqual(result, list(range(1000)))
+        self.assertEqual(buffer.qsize(), 0)
+
+        # once drained, frames are kept in memory again
+        buffer._trim()
+        self.assertIsNone(buffer._spill_base)
+
+    def test_block(self):
+        result = []
+        stream = Stream(source=up_to(1000), sink=add_to_list([]))
+        split = stream.split(capacity=10)
+        split.sink = add_to_list(result)
+        buffer = stream.elements[0].split_buffer
+        sizes = []
+        stream.add(stream_transformer(lambda frame: sizes.append(buffer.qsize()) or frame)())
+
+        consumer = threading.Thread(target=split.run)
+        consumer.start()
+        stream.run()
+        consumer.join()
+        self.assertListEqual(result, list(range(1000)))
+        self.assertLessEqual(max(sizes), 10)
+
+    def test_threaded_split_does_not_touch_origin_source(self):
+        result = []
+        stream = Stream(source=up_to(1000), sink=add_to_list([]))
+        split = stream.split(capacity=10)
+        split.sink = add_to_list(result)
+
+        callers = set()
+        is_closed = stream.source.is_closed
+        def tracking_is_closed():
+            callers.add(threading.get_ident())
+            return is_closed()
+        stream.source.is_closed = tracking_is_closed
+
+        consumer = threading.Thread(target=split.run)
+        consumer.start()
+        stream.run()
+        consumer.join()
+        self.assertListEqual(result, list(range(1000)))
+        self.assertSetEqual(callers, {threading.get_ident()})
+
+    def test_block_without_running_split_raises(self):
+        stream = Stream(source=up_to(100), sink=add_to_list([]))
+        split = stream.split(capacity=10)
+        split.sink = add_to_list([])
+        buffer = stream.elements[0].split_buffer
+        buffer.START_TIMEOUT = 0.05
+        self.assertRaises(SplitBufferBlocked, stream.run)
+
+    def test_block_with_reader_on_writer_thread_raises(self):
+        stream = Stream(source=up_to(100), sink=add_to_list([]))
+        split = stream.split(capacity=10)
+        split.sink = add_to_list([])
+        # the split has read on this thread, so it cannot catch up while the stream waits for it
+        split.source.get_frame()
+        self.assertRaises(SplitBufferBlocked, stream.run)
+
+    def test_block_in_profile(self):
+        result = []
+        stream = Stream(source=up_to(1000), sink=add_to_list([]))
+        split = stream.split(capacity=5)
+        split.sink = add_to_list(result)
+        profile_stream(stream, quantum=64)
+        self.assertListEqual(result, list(range(1000)))
+        self.assertEqual(split.elements, [])
+        self.assertEqual(split.sink.stats.frames, 1000)
+
+    def test_splits_close_when_origin_is_driven_frame_by_frame(self):
+        stream = Stream(source=up_to(10), sink=add_to_list([]))
+        split = stream.split()
+        result = []
+        split.sink = add_to_list(result)
+
+        while not stream.is_closed():
+            stream.get_frame()
+        self.assertFalse(split.is_closed())
+        split.run()
+        self.assertListEqual(result, list(range(10)))
+        self.assertTrue(split.is_closed())
+
+    def test_splits_close_when_origin_fails(self):
+        @stream_transformer
+        def fail_at_five(frame):
+            if frame == 5:
+                raise KeyError(frame)
+            return frame
+
+        stream = Stream(source=up_to(10), sink=add_to_list([]))
+        split = stream.split()
+        stream.add(fail_at_five())
+        result = []
+        split.sink = add_to_list(result)
+
+        consumer = threading.Thread(target=split.run)
+        consumer.start()
+        self.assertRaises(KeyError, stream.run)
+        consumer.join(5)
+        self.assertFalse(consumer.is_alive())
+        self.assertListEqual(result, list(range(6)))
+
+    def test_block_in_runtime_with_elements_emitting_on_their_own(self):
+        result = []
+        stream = Stream(source=up_to(200), sink=add_to_list([]))
+        stream.add(stream_transformer(lambda frame: frame, workers=8)())
+        split = stream.split(capacity=4)
+        split.sink = add_to_list(result)
+        Runtime([stream], quantum=64).run()
+        self.assertListEqual(result, list(range(200)))
+
+    def test_block_in_runtime(self):
+        result = []
+        stream = Stream(source=up_to(1000), sink=add_to_list([]))
+        split = stream.split(capacity=5)
+        split.sink = add_to_list(result)
+        Runtime([stream], quantum=64).run()
+        self.assertListEqual(result, list(range(1000)))
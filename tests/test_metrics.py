@@ -0,0 +1,97 @@
+from unittest import TestCase
+
+from strom import *
+from strom.metrics import LatencyHistogram, format_stats, profile_stream
+
+
+@stream_source
+def up_to(count):
+    yield from range(count)
+
+
+@stream_transformer
+def add_number(frame, number):
+    return frame + number
+
+
+@stream_gate
+def is_even(frame):
+    return frame % 2 == 0
+
+
+@stream_sink
+def add_to_list(frame, result):
+    result.append(frame)
+
+
+class TestStats(TestCase):
+
+    def create_stream(self):
+        stream = Stream(source=up_to(100), sink=add_to_list([]))
+        stream.add(add_number(1))
+        stream.add(is_even())
+        return stream
+
+    def test_disabled_by_default(self):
+        stream = self.create_stream()
+        stream.run()
+        self.assertListEqual(stream.stats(), [])
+        self.assertFalse(hasattr(stream.elements[0], 'stats'))
+
+    def test_counts(self):
+        stream = self.create_stream()
+        stream.enable_stats()
+        stream.run()
+
+        source, transformer, gate, sink = stream.stats()
+        self.assertEqual((source.kind, source.frames, source.passed), ('source', 100, 100))
+        self.assertEqual((transformer.kind, transformer.calls, transformer.passed), ('transformer', 100, 100))
+        self.assertEqual((gate.name, gate.frames, gate.passed, gate.dropped), ('is_even', 100, 50, 50))
+        self.assertEqual(gate.selectivity, 0.5)
+        self.assertEqual((sink.kind, sink.frames), ('sink', 50))
+        self.assertEqual(sum(gate.histogram.buckets), 100)
+        self.assertGreater(gate.frames_per_second, 0)
+        self.assertIn('is_even', format_stats(stream.stats()))
+
+    def test_batch_counts(self):
+        stream = self.create_stream()
+        stream.enable_stats()
+        stream.run(batch_size=10)
+
+        source, transformer, gate, sink = stream.stats()
+        self.assertEqual((source.calls, source.frames), (10, 100))
+        self.assertEqual((gate.calls, gate.frames, gate.passed), (10, 100, 50))
+        self.assertEqual(sink.frames, 50)
+
+    def test_reporter(self):
+        reports = []
+        stream = self.create_stream()
+        stream.enable_stats(reporter=reports.append, interval=0)
+        stream.run()
+
+        self.assertGreater(len(reports), 1)
+        self.assertEqual(reports[-1][-1].frames, 50)
+
+    def test_profile_stream(self):
+        stream = self.create_stream()
+        split_result = []
+        split = stream.split()
+        split.add(is_even())
+        split.sink = add_to_list(split_result)
+
+        profile_stream(stream, max_frames=40, quantum=16)
+        self.assertEqual(stream.stats()[0].frames, 40)
+        self.assertEqual(stream.stats()[2].passed, 20)
+        self.assertEqual(len(split_result), 20)
+        self.assertEqual(split.elements[0].stats.frames, 20)
+
+        profile_stream(stream)
+        self.assertEqual(stream.stats()[0].frames, 100)
+        self.assertEqual(len(split_result), 50)
+
+    def test_histogram_quantile(self):
+        histogram = LatencyHistogram()
+        for nanoseconds in [100] * 99 + [10 ** 6]:
+            histogram.add(nanoseconds)
+        self.assertEqual(histogram.quantile(0.5), 128 / 1e9)
+        self.assertEqual(histogram.quantile(1.0), 2 ** 20 / 1e9)
@@ -1,7 +1,9 @@
+import threading
+import time
 from unittest import TestCase
 
 from strom import stream_source
-from strom.model import Source
+from strom.model import Source, SourceIsClosedException
 from strom import stream_transformer
 from strom.model import Transformer
 from strom import stream_gate
@@ -30,8 +32,41 @@ class TestSource(TestCase):
             return content
 
         my_source_instance = my_source()
-        self.assertEqual(my_source_instance.get_frame(), 9)
-        self.assertEqual(my_source_instance.get_frame(), 8)
+        self.assertEqual(my_source_instance.get_frame(), 0)
+        self.assertEqual(my_source_instance.get_frame(), 1)
+
+    def test_generator_is_lazy(self):
+        frames_pulled = []
+
+        @stream_source
+        def my_source(up_until):
+            for frame in range(up_until):
+                frames_pulled.append(frame)
+                yield frame
+
+        my_source_instance = my_source(1000000)
+        self.assertListEqual(frames_pulled, [])
+        self.assertEqual(my_source_instance.get_frame(), 0)
+        self.assertEqual(my_source_instance.get_frame(), 1)
+        self.assertLessEqual(len(frames_pulled), 3)
+
+    def test_generator_closes_when_exhausted(self):
+        @stream_source
+        def my_source():
+            yield 'a'
+            yield 'b'
+
+        my_source_instance = my_source()
+        self.assertFalse(my_source_instance.is_closed())
+        self.assertListEqual(my_source_instance.get_batch(5), ['a', 'b'])
+        self.assertTrue(my_source_instance.is_closed())
+        self.assertRaises(SourceIsClosedException, my_source_instance.get_frame)
+
+    def test_non_iterating_source_needs_closer(self):
+        def my_source():
+            return 42
+
+        self.assertRaises(ValueError, stream_source(my_source))
 
 
 class TestTransformer(TestCase):
@@ -54,6 +89,18 @@ class TestTransformer(TestCase):
         self.assertTrue(isinstance(my_transformer, Transformer))
         self.assertEqual(my_transformer.transform(10), 52)
 
+    def test_creation_method_with_args(self):
+        class Adder:
+            offset = 1
+
+            @stream_transformer
+            def add_number(self, frame, number, factor=1):
+                return (frame + number + self.offset) * factor
+
+        my_transformer = Adder().add_number(41, factor=2)
+        self.assertEqual(my_transformer.transform(10), 104)
+        self.assertEqual(my_transformer.compile()(10), 104)
+
 
 class TestGate(TestCase):
 
@@ -173,4 +220,205 @@ class TestStream(TestCase):
         stream.run()
         split_stream.run()
 
-        self.assertListEqual(original_sink_result, sink_result)
\ No newline at end of file
+        self.assertListEqual(original_sink_result, sink_result)
+
+    def test_stream_compile(self):
+        @stream_source(all_at_once=True)
+        def up_to_ten():
+            return list(range(11))
+
+        @stream_gate
+        def is_odd(frame):
+            return frame % 2 == 1
+
+        sink_result = []
+        @stream_sink
+        def add_to_list(frame):
+            sink_result.append(frame)
+
+        stream = Stream()
+        stream.source = up_to_ten()
+        stream.add(is_odd())
+        stream.sink = add_to_list()
+        run = stream.compile()
+
+        self.assertListEqual(sink_result, [])
+        run()
+        self.assertListEqual(sink_result, [1, 3, 5, 7, 9])
+
+
+class TestBatchStream(TestCase):
+
+    def test_batch_elements(self):
+        @stream_source(all_at_once=True)
+        def up_to_ten():
+            return list(range(11))
+
+        @stream_transformer(batch=True)
+        def double(frames):
+            return [frame * 2 for frame in frames]
+
+        @stream_gate(batch=True)
+        def divisible_by_four(frames):
+            return [frame % 4 == 0 for frame in frames]
+
+        batches = []
+        @stream_sink(batch=True)
+        def add_batch(frames):
+            batches.append(list(frames))
+
+        stream = Stream()
+        stream.source = up_to_ten()
+        stream.add(double())
+        stream.add(divisible_by_four())
+        stream.sink = add_batch()
+        stream.run(batch_size=4)
+
+        self.assertListEqual(batches, [[0, 4], [8, 12], [16, 20]])
+
+    def test_frame_elements_are_adapted(self):
+        @stream_source(all_at_once=True)
+        def up_to_ten():
+            return list(range(11))
+
+        @stream_transformer
+        def add_number(frame, number):
+            return frame + number
+
+        @stream_gate
+        def is_even(frame):
+            return frame % 2 == 0
+
+        sink_result = []
+        @stream_sink
+        def add_to_list(frame):
+            sink_result.append(frame)
+
+        stream = Stream()
+        stream.source = up_to_ten()
+        stream.add(add_number(1))
+        stream.add(is_even())
+        stream.sink = add_to_list()
+        stream.run(batch_size=3)
+
+        self.assertListEqual(sink_result, [2, 4, 6, 8, 10])
+
+    def test_batch_elements_in_frame_stream(self):
+        @stream_transformer(batch=True)
+        def double(frames):
+            return [frame * 2 for frame in frames]
+
+        @stream_gate(batch=True, fatal=True)
+        def is_positive(frames):
+            return [frame > 0 for frame in frames]
+
+        self.assertEqual(double().transform(21), 42)
+        self.assertEqual(is_positive().transform(1), 1)
+        self.assertRaises(GateFailedException, is_positive().transform, 0)
+        self.assertRaises(GateFailedException, is_positive().compile_batch(), [1, 0])
+
+
+class TestBufferedSink(TestCase):
+
+    def create_stream(self, count):
+        @stream_source
+        def numbers():
+            yield from range(count)
+
+        stream = Stream()
+        stream.source = numbers()
+        return stream
+
+    def test_batches_and_final_flush(self):
+        batches = []
+        @stream_sink(batch_size=4)
+        def collect(frames):
+            batches.append(list(frames))
+
+        stream = self.create_stream(10)
+        stream.sink = collect()
+        stream.run()
+        self.assertListEqual(batches, [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+
+        batches.clear()
+        stream = self.create_stream(10)
+        stream.sink = collect()
+        stream.run(batch_size=3)
+        self.assertListEqual(batches, [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+
+    def test_flush_interval(self):
+        batches = []
+        @stream_sink(flush_interval=0)
+        def collect(frames):
+            batches.append(list(frames))
+
+        stream = self.create_stream(3)
+        stream.sink = collect()
+        stream.run()
+        self.assertListEqual(batches, [[0], [1], [2]])
+
+    def test_background_writer(self):
+        batches = []
+        @stream_sink(batch_size=16, background=True)
+        def collect(frames):
+            batches.append((threading.current_thread(), list(frames)))
+
+        stream = self.create_stream(100)
+        stream.sink = collect()
+        stream.run()
+        self.assertListEqual([frame for _, frames in batches for frame in frames], list(range(100)))
+        self.assertNotIn(threading.current_thread(), [thread for thread, _ in batches])
+
+    def test_flush_interval_while_source_idles(self):
+        from strom.stdlib import QueueSource
+
+        written = []
+        @stream_sink(batch_size=100, flush_interval=0.05)
+        def collect(frames):
+            written.append((time.monotonic(), list(frames)))
+
+        source = QueueSource()
+        stream = Stream(source=source, sink=collect())
+
+        def feed():
+            for frame in range(3):
+                source.put(frame)
+            started.append(time.monotonic())
+            time.sleep(0.5)
+            source.close()
+        started = []
+        feeder = threading.Thread(target=feed)
+        feeder.start()
+        stream.run()
+        feeder.join()
+
+        self.assertEqual(written[0][1], [0, 1, 2])
+        self.assertLess(written[0][0] - started[0], 0.3)
+
+    def test_writer_stops_when_stream_fails(self):
+        batches = []
+        @stream_sink(batch_size=4, background=True)
+        def collect(frames):
+            batches.append(list(frames))
+
+        @stream_transformer
+        def fail_at_ten(frame):
+            if frame == 10:
+                raise KeyError(frame)
+            return frame
+
+        stream = self.create_stream(20)
+        stream.add(fail_at_ten())
+        stream.sink = collect()
+        self.assertRaises(KeyError, stream.run)
+        self.assertEqual([frame for batch in batches for frame in batch], list(range(10)))
+        self.assertNotIn('strom-sink-writer', [thread.name for thread in threading.enumerate()])
+
+    def test_background_errors_are_raised(self):
+        @stream_sink(batch_size=16, background=True)
+        def fail(frames):
+            raise IOError('disk full')
+
+        stream = self.create_stream(100)
+        stream.sink = fail()
+        self.assertRaises(IOError, stream.run)
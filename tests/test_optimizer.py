@@ -0,0 +1,110 @@
+from unittest import TestCase
+
+from strom import *
+from strom.model import GateFailedException
+from strom.optimizer import FusedTransformer
+from strom.stdlib import SlidingWindow
+from strom.stdlib.windows import Count
+
+
+@stream_source
+def up_to(count):
+    yield from range(count)
+
+
+@stream_transformer
+def add_number(frame, number):
+    return frame + number
+
+
+@stream_transformer
+def unchanged(frame):
+    return frame
+
+
+@stream_gate
+def is_even(frame):
+    return frame % 2 == 0
+
+
+@stream_gate
+def passes(frame):
+    return True
+
+
+@stream_gate(fatal=True)
+def is_small(frame):
+    return frame < 1000
+
+
+@stream_sink
+def add_to_list(frame, result):
+    result.append(frame)
+
+
+class TestOptimizer(TestCase):
+
+    def test_fusion_keeps_results(self):
+        result = []
+        stream = Stream(source=up_to(20), sink=add_to_list(result))
+        stream.add(add_number(1))
+        stream.add(is_even())
+        stream.add(is_small())
+        stream.add(add_number(10))
+
+        changes = stream.optimize()
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(len(stream.elements), 1)
+        self.assertIsInstance(stream.elements[0], FusedTransformer)
+        self.assertIn('fused(add_number, is_even, is_small, add_number)', changes[0])
+
+        stream.run()
+        self.assertListEqual(result, [frame + 11 for frame in range(20) if (frame + 1) % 2 == 0])
+
+    def test_fused_fatal_gate_raises(self):
+        stream = Stream(source=up_to(2000), sink=add_to_list([]))
+        stream.add(add_number(1))
+        stream.add(is_small())
+        stream.optimize()
+        self.assertRaises(GateFailedException, stream.run)
+
+    def test_identity_elements_are_removed(self):
+        stream = Stream(source=up_to(5), sink=add_to_list([]))
+        stream.add(unchanged())
+        stream.add(passes())
+        stream.add(stream_transformer(lambda frame: frame)())
+        stream.add(add_number(1))
+        self.assertEqual(len(stream.optimize()), 3)
+        self.assertEqual([str(element) for element in stream.elements], ['add_number'])
+
+    def test_other_elements_end_fusion(self):
+        stream = Stream(source=up_to(50), sink=add_to_list([]))
+        stream.add(add_number(1))
+        stream.add(is_even())
+        window = SlidingWindow({'count': Count}, size=4)
+        stream.add(window)
+        stream.add(add_number(1))
+        stream.optimize()
+        self.assertIs(stream.elements[1], window)
+        self.assertIsInstance(stream.elements[0], FusedTransformer)
+        self.assertEqual(str(stream.elements[2]), 'add_number')
+
+    def test_splits_without_sink_are_removed(self):
+        stream = Stream(source=up_to(10), sink=add_to_list([]))
+        stream.split()
+        dead = stream.split()
+        dead.add(add_number(1))
+        dead.split()
+        live_result = []
+        live = stream.split()
+        live.add(add_number(1))
+        live.add(add_number(2))
+        live.sink = add_to_list(live_result)
+
+        changes = stream.optimize()
+        self.assertEqual(len([change for change in changes if 'removed split' in change]), 2)
+        self.assertListEqual([split for element in stream.elements for split in element.split_streams], [live])
+        self.assertIsInstance(live.elements[0], FusedTransformer)
+
+        Runtime([stream]).run()
+        self.assertListEqual(live_result, [frame + 3 for frame in range(10)])
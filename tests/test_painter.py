@@ -0,0 +1,108 @@
+from unittest import TestCase, skipUnless
+
+from strom import *
+from strom.metrics import profile_stream
+from strom.painter import RailroadDiagram, Symbol, PADDING_Y, profile_color, profile_label
+
+try:
+    import svgwrite
+except ImportError:
+    svgwrite = None
+
+
+def chain(length, height=10):
+    symbols = [Symbol(idx, None, (30, height), (0, height / 2), (30, height / 2)) for idx in range(length)]
+    for previous, symbol in zip(symbols, symbols[1:]):
+        symbol.succeeds(previous)
+    return symbols
+
+
+class TestLayout(TestCase):
+
+    def test_long_chain(self):
+        symbols = chain(20000)
+        placed = RailroadDiagram._place_symbols(symbols[:1])
+        self.assertEqual(len(placed), 20000)
+        self.assertEqual(symbols[-1].absolute_position, (30 * 19999, 0))
+
+    def test_branches_are_stacked(self):
+        main = chain(3)
+        upper = chain(2)
+        lower = chain(4, height=20)
+        upper[0].succeeds(main[1])
+        lower[0].succeeds(main[1])
+
+        RailroadDiagram._place_symbols([main[-1]])
+        self.assertEqual(main[2].absolute_position, (60, 0))
+        self.assertEqual(upper[0].absolute_position, (60, 10 + PADDING_Y))
+        self.assertEqual(lower[0].absolute_position, (60, 20 + 2 * PADDING_Y - 5))
+
+    def test_barrier_comes_after_all_predecessors(self):
+        left = chain(2)
+        right = chain(5)
+        barrier = Symbol('barrier', None, (30, 10), (0, 5), (30, 5))
+        barrier.succeeds(left[-1])
+        barrier.succeeds(right[-1])
+
+        placed = RailroadDiagram._place_symbols([barrier])
+        self.assertIs(placed[-1], barrier)
+        self.assertEqual(barrier.absolute_position[0], 150)
+
+    def test_cycles_are_rejected(self):
+        symbols = chain(3)
+        symbols[0].succeeds(symbols[-1])
+        self.assertRaises(ValueError, RailroadDiagram._place_symbols, symbols)
+
+
+class TestProfile(TestCase):
+
+    def test_color_and_label(self):
+        @stream_gate
+        def is_even(frame):
+            return frame % 2 == 0
+
+        stream = Stream(source=up_to(1000), sink=discard())
+        stream.add(is_even())
+        profile_stream(stream)
+        gate_stats = stream.elements[0].stats
+
+        self.assertEqual(profile_color(0), 'rgb(255,255,255)')
+        self.assertEqual(profile_color(1), 'rgb(255,0,0)')
+        self.assertEqual(profile_color(0.5), 'rgb(255,128,128)')
+        self.assertRegex(profile_label(gate_stats, 0.25), r'^25% [0-9.]+[kMG]? f/s 50% pass$')
+
+
+@stream_source
+def up_to(count):
+    yield from range(count)
+
+
+@stream_sink
+def discard(frame):
+    pass
+
+
+@skipUnless(svgwrite, 'requires svgwrite')
+class TestRailroadDiagram(TestCase):
+
+    def test_draw_profile(self):
+        stream = Stream(source=up_to(100), sink=discard())
+        stream.add(stream_transformer(lambda frame: frame + 1)())
+        profile_stream(stream)
+        self.assertIn('f/s', RailroadDiagram(stream, profile=True).draw())
+
+    def test_draw_wide_and_deep_stream(self):
+        @stream_source
+        def numbers():
+            yield from range(10)
+
+        @stream_transformer
+        def identity(frame):
+            return frame
+
+        stream = Stream(source=numbers())
+        current = stream
+        for _ in range(300):
+            current.add(identity())
+            current = current.split()
+        self.assertIn('<svg', RailroadDiagram(stream).draw())
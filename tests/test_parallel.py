@@ -0,0 +1,279 @@
+import threading
+import time
+from unittest import TestCase
+
+from strom import *
+from strom.model import GateFailedException
+from strom.parallel import ThreadedTransformer
+from strom.stdlib import QueueSource
+
+
+@stream_source
+def up_to(count):
+    yield from range(count)
+
+
+def live_latencies(stream, frames=3, idle=0.5):
+    """Puts frames into the stream's queue source one at a time, each once the previous one came out, and closes the
+    source only after idling for a while. Returns how long each frame took to reach the sink."""
+    latencies = []
+    arrived = threading.Event()
+    @stream_sink
+    def record(frame):
+        latencies.append(time.monotonic() - frame)
+        arrived.set()
+
+    source = QueueSource()
+    stream.source = source
+    stream.sink = record()
+
+    def feed():
+        for _ in range(frames):
+            arrived.clear()
+            source.put(time.monotonic())
+            arrived.wait(idle)
+        source.close()
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    stream.run()
+    feeder.join()
+    return latencies
+
+
+class TestThreadedTransformer(TestCase):
+
+    def run_stream(self, transformer, count=50, batch_size=None):
+        sink_result = []
+        @stream_sink
+        def add_to_list(frame):
+            sink_result.append(frame)
+
+        @stream_gate
+        def is_even(frame):
+            return frame % 2 == 0
+
+        stream = Stream()
+        stream.source = up_to(count)
+        stream.add(transformer)
+        stream.add(is_even())
+        stream.sink = add_to_list()
+        stream.run(batch_size=batch_size)
+        return sink_result
+
+    def test_ordered(self):
+        @stream_transformer(workers=4)
+        def slow_double(frame):
+            time.sleep(0.001 * (frame % 3))
+            return frame * 2
+
+        self.assertIsInstance(slow_double(), ThreadedTransformer)
+        self.assertListEqual(self.run_stream(slow_double()), list(range(0, 100, 2)))
+        self.assertListEqual(self.run_stream(slow_double(), batch_size=8), list(range(0, 100, 2)))
+
+    def test_unordered(self):
+        @stream_transformer(workers=4, ordered=False)
+        def slow_double(frame):
+            time.sleep(0.001 * (frame % 3))
+            return frame * 2
+
+        self.assertListEqual(sorted(self.run_stream(slow_double())), list(range(0, 100, 2)))
+        self.assertListEqual(sorted(self.run_stream(slow_double(), batch_size=8)), list(range(0, 100, 2)))
+
+    def test_window_bounds_frames_in_flight(self):
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        @stream_transformer(workers=8)
+        def track(frame):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.001)
+            with lock:
+                in_flight[0] -= 1
+            return frame
+
+        transformer = track()
+        transformer.window = 3
+        self.assertEqual(len(self.run_stream(transformer)), 25)
+        self.assertLessEqual(in_flight[1], 3)
+
+    def test_errors_propagate(self):
+        @stream_transformer(workers=2)
+        def fails(frame):
+            raise KeyError(frame)
+
+        self.assertRaises(KeyError, self.run_stream, fails())
+
+    def test_results_leave_while_source_idles(self):
+        @stream_transformer(workers=2)
+        def slow(frame):
+            time.sleep(0.01)
+            return frame
+
+        stream = Stream()
+        stream.add(slow())
+        stream.enable_stats()
+        latencies = live_latencies(stream)
+        self.assertEqual(len(latencies), 3)
+        self.assertLess(max(latencies), 0.25)
+        self.assertEqual(stream.elements[0].stats.passed, 3)
+        self.assertEqual(stream.elements[0].stats.dropped, 0)
+
+    def test_batch_and_workers(self):
+        self.assertRaises(ValueError, stream_transformer, lambda frames: frames, batch=True, workers=2)
+
+
+@stream_transformer
+def square(frame):
+    return frame * frame
+
+
+@stream_transformer
+def pause(frame):
+    time.sleep(0.01)
+    return frame
+
+
+@stream_gate
+def is_odd(frame):
+    return frame % 2 == 1
+
+
+@stream_gate(fatal=True)
+def below_hundred(frame):
+    return frame < 100
+
+
+@stream_transformer
+def reverse_payload(frame):
+    return bytearray(reversed(frame))
+
+
+class TestProcessStage(TestCase):
+
+    def run_stream(self, count, *elements, stage=(0, None)):
+        sink_result = []
+        @stream_sink
+        def add_to_list(frame):
+            sink_result.append(frame)
+
+        stream = Stream()
+        stream.source = up_to(count)
+        for element in elements:
+            stream.add(element)
+        stream.parallelize(*stage, workers=2)
+        stream.sink = add_to_list()
+        stream.run()
+        return stream, sink_result
+
+    def test_stage_keeps_order(self):
+        stream, sink_result = self.run_stream(30, square(), is_odd(), stage=(0, 2))
+        self.assertEqual(len(stream.elements), 1)
+        self.assertEqual(str(stream.elements[0]), 'ProcessStage(square, is_odd)')
+        self.assertListEqual(sink_result, [frame * frame for frame in range(1, 30, 2)])
+
+    def test_fatal_gate_in_worker(self):
+        self.assertRaises(GateFailedException, self.run_stream, 30, square(), below_hundred())
+
+    def test_large_payloads(self):
+        @stream_source
+        def payloads():
+            for idx in range(4):
+                yield bytearray([idx]) * 200000 + bytearray(b'end')
+
+        sink_result = []
+        @stream_sink
+        def add_to_list(frame):
+            sink_result.append(frame)
+
+        stream = Stream(source=payloads(), sink=add_to_list())
+        stream.add(reverse_payload())
+        stream.parallelize(0, workers=2)
+        stream.run()
+
+        self.assertEqual(len(sink_result), 4)
+        for idx, frame in enumerate(sink_result):
+            self.assertEqual(frame[:3], bytearray(b'dne'))
+            self.assertEqual(frame[3:], bytearray([idx]) * 200000)
+
+
+class TestProcessStageLatency(TestCase):
+
+    def test_results_leave_while_source_idles(self):
+        stream = Stream()
+        stream.add(pause())
+        stream.parallelize(0, workers=1)
+        latencies = live_latencies(stream)
+        self.assertEqual(len(latencies), 3)
+        self.assertLess(max(latencies), 0.25)
+
+
+class RunningTotal:
+    """Adds up the values per key, which only works if it sees all frames of a key."""
+
+    def __init__(self):
+        self.totals = {}
+
+    @stream_transformer
+    def add(self, frame):
+        key, value = frame
+        self.totals[key] = self.totals.get(key, 0) + value
+        return key, self.totals[key]
+
+
+class TestPartitionStage(TestCase):
+
+    def run_stream(self, count, *elements, batch_size=None, **partition):
+        sink_result = []
+        @stream_sink
+        def add_to_list(frame):
+            sink_result.append(frame)
+
+        @stream_source
+        def keyed():
+            for idx in range(count):
+                yield idx % 7, idx
+
+        stream = Stream(source=keyed(), sink=add_to_list())
+        for element in elements:
+            stream.add(element)
+        stream.partition(lambda frame: frame[0], workers=3, **partition)
+        stream.run(batch_size=batch_size)
+        return stream, sink_result
+
+    def test_results_leave_while_source_idles(self):
+        stream = Stream()
+        stream.add(pause())
+        stream.partition(lambda frame: 0, workers=2, chunk_size=1)
+        latencies = live_latencies(stream)
+        self.assertEqual(len(latencies), 3)
+        self.assertLess(max(latencies), 0.25)
+
+    def expected(self, count):
+        totals = {}
+        result = []
+        for idx in range(count):
+            totals[idx % 7] = totals.get(idx % 7, 0) + idx
+            result.append((idx % 7, totals[idx % 7]))
+        return result
+
+    def per_key(self, frames):
+        return {key: [frame for frame in frames if frame[0] == key] for key in range(7)}
+
+    def test_keys_stay_on_one_worker(self):
+        stream, sink_result = self.run_stream(500, RunningTotal().add(), queue_size=2, chunk_size=8)
+        self.assertEqual(str(stream.elements[0]), 'PartitionStage(add)')
+        self.assertEqual(len(sink_result), 500)
+        self.assertDictEqual(self.per_key(sink_result), self.per_key(self.expected(500)))
+
+    def test_batches(self):
+        stream, sink_result = self.run_stream(300, RunningTotal().add(), batch_size=32)
+        self.assertDictEqual(self.per_key(sink_result), self.per_key(self.expected(300)))
+
+    def test_errors_propagate(self):
+        @stream_gate(fatal=True)
+        def small_values(frame):
+            return frame[1] < 100
+
+        self.assertRaises(GateFailedException, self.run_stream, 500, small_values(), chunk_size=4)
@@ -0,0 +1,140 @@
+import array
+import pickle
+import sys
+from unittest import TestCase
+
+from strom import *
+
+Trade = record_type('Trade', [('id', 'q'), ('price', 'd'), 'symbol'])
+
+
+@stream_sink
+def add_to_list(frame, result):
+    result.append(frame)
+
+
+class TestRecord(TestCase):
+
+    def test_access(self):
+        trade = Trade(1, 9.5, 'ABC')
+        self.assertEqual(trade.price, 9.5)
+        self.assertEqual(trade['price'], 9.5)
+        self.assertEqual(trade[1], 9.5)
+        self.assertEqual(trade.get('volume', 0), 0)
+        self.assertRaises(KeyError, lambda: trade['volume'])
+        self.assertDictEqual(dict(trade), {'id': 1, 'price': 9.5, 'symbol': 'ABC'})
+        self.assertEqual(trade.keys(), ('id', 'price', 'symbol'))
+        self.assertEqual(trade.values(), (1, 9.5, 'ABC'))
+        self.assertEqual(dict(trade.items()), trade.as_dict())
+        self.assertEqual(Trade.from_dict(trade.as_dict()), trade)
+
+    def test_compact_and_picklable(self):
+        trade = Trade(1, 9.5, 'ABC')
+        self.assertLess(sys.getsizeof(trade), sys.getsizeof(trade.as_dict()))
+        self.assertFalse(hasattr(trade, '__dict__'))
+        self.assertEqual(pickle.loads(pickle.dumps(trade)), trade)
+
+
+class TestRecordBatch(TestCase):
+
+    def setUp(self):
+        self.trades = [Trade(idx, idx * 1.5, 'S%d' % idx) for idx in range(6)]
+        self.batch = RecordBatch.from_records(Trade, self.trades)
+
+    def test_columns(self):
+        self.assertEqual(len(self.batch), 6)
+        self.assertEqual(self.batch['price'], array.array('d', [idx * 1.5 for idx in range(6)]))
+        self.assertEqual(self.batch['symbol'][2], 'S2')
+        self.assertListEqual(list(self.batch), self.trades)
+        self.assertEqual(self.batch[3], self.trades[3])
+        self.assertListEqual(list(self.batch[4:]), self.trades[4:])
+
+    def test_batched_streams_hand_out_record_batches(self):
+        @stream_source
+        def trades():
+            yield from self.trades
+
+        @stream_gate(batch=True)
+        def is_even(batch):
+            return [trade_id % 2 == 0 for trade_id in batch['id']]
+
+        @stream_gate
+        def is_cheap(trade):
+            return trade['price'] < 7
+
+        batches = []
+        @stream_sink(batch=True)
+        def collect(batch):
+            batches.append(batch)
+
+        stream = Stream(source=trades(), sink=collect())
+        stream.add(is_even())
+        stream.add(is_cheap())
+        stream.run(batch_size=4)
+
+        self.assertTrue(all(isinstance(batch, RecordBatch) for batch in batches))
+        self.assertListEqual([list(batch['id']) for batch in batches], [[0, 2], [4]])
+        self.assertIsInstance(batches[0]['id'], array.array)
+
+    def test_single_frame_elements_pass_lists(self):
+        @stream_source
+        def trades():
+            yield from self.trades
+
+        @stream_transformer
+        def identity(trade):
+            return trade
+
+        batches = []
+        @stream_sink(batch=True)
+        def collect(batch):
+            batches.append(batch)
+
+        stream = Stream(source=trades(), sink=collect())
+        stream.add(identity())
+        stream.add(identity())
+        stream.run(batch_size=4)
+
+        self.assertIsInstance(identity().compile_batch()(self.trades), list)
+        self.assertTrue(all(isinstance(batch, RecordBatch) for batch in batches))
+        self.assertListEqual([trade for batch in batches for trade in batch], self.trades)
+
+    def test_split_streams_hand_out_record_batches(self):
+        @stream_source
+        def trades():
+            yield from self.trades
+
+        @stream_transformer(batch=True)
+        def total(batch):
+            return [sum(batch['price'])]
+
+        totals = []
+        stream = Stream(source=trades(), sink=add_to_list([]))
+        split = stream.split()
+        split.add(total())
+        split.sink = add_to_list(totals)
+        stream.run(batch_size=4)
+        split.run(batch_size=4)
+        self.assertListEqual(totals, [9.0, 13.5])
+
+    def test_records_in_batched_stream(self):
+        @stream_source
+        def trades():
+            yield from self.trades
+
+        @stream_gate
+        def is_cheap(trade):
+            return trade['price'] < 5
+
+        @stream_transformer
+        def raise_price(trade):
+            return trade._replace(price=trade.price + 1)
+
+        result = []
+        stream = Stream()
+        stream.source = trades()
+        stream.add(is_cheap())
+        stream.add(raise_price())
+        stream.sink = add_to_list(result)
+        stream.run(batch_size=4)
+        self.assertListEqual([trade.price for trade in result], [1.0, 2.5, 4.0, 5.5])
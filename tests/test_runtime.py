@@ -0,0 +1,57 @@
+from unittest import TestCase
+
+from strom import *
+
+
+@stream_source
+def up_to(count):
+    yield from range(count)
+
+
+@stream_gate
+def is_even(frame):
+    return frame % 2 == 0
+
+
+@stream_sink
+def add_to_list(frame, name, result):
+    result.append((name, frame))
+
+
+class TestRuntime(TestCase):
+
+    def test_finds_split_streams(self):
+        stream = Stream(source=up_to(10))
+        first = stream.split()
+        second = first.split()
+        third = stream.split()
+
+        self.assertListEqual(Runtime([stream, second]).streams, [stream, second, first, third])
+
+    def test_interleaves_splits_with_bounded_buffers(self):
+        events = []
+        buffer_sizes = []
+
+        @stream_transformer
+        def record_buffer(frame, stream):
+            buffer_sizes.append(stream.elements[0].split_buffer.qsize())
+            return frame
+
+        stream = Stream(source=up_to(1000), sink=add_to_list('parent', events))
+        even_stream = stream.split()
+        even_stream.add(is_even())
+        even_stream.sink = add_to_list('even', events)
+        stream.add(record_buffer(stream))
+
+        Runtime([stream], quantum=10, max_buffered=20).run()
+
+        self.assertListEqual([frame for name, frame in events if name == 'parent'], list(range(1000)))
+        self.assertListEqual([frame for name, frame in events if name == 'even'], list(range(0, 1000, 2)))
+        self.assertLessEqual(max(buffer_sizes), 30)
+        # the split stream must not wait for the parent to finish
+        self.assertLess(events.index(('even', 0)), events.index(('parent', 999)))
+
+    def test_requires_sinks(self):
+        stream = Stream(source=up_to(10), sink=add_to_list('parent', []))
+        stream.split()
+        self.assertRaises(ValueError, Runtime([stream]).run)
@@ -0,0 +1,103 @@
+from unittest import TestCase
+
+from strom import *
+from strom.stdlib import zip_join, key_join, window_join
+
+
+@stream_source
+def frames_of(frames):
+    yield from frames
+
+
+@stream_sink
+def add_to_list(frame, result):
+    result.append(frame)
+
+
+def run_join(barrier, *streams):
+    result = []
+    joined = Stream(source=barrier.source, sink=add_to_list(result))
+    Runtime(list(streams) + [joined], quantum=1).run()
+    return result
+
+
+class TestBarrier(TestCase):
+
+    def test_barrier_function(self):
+        @stream_barrier
+        def when_both_even(queues):
+            return queues['left'][0] % 2 == 0 and queues['right'][0] % 2 == 0
+
+        left = Stream(source=frames_of([2, 4, 6]))
+        right = Stream(source=frames_of([8, 10, 12]))
+        result = run_join(when_both_even(left=left, right=right), left, right)
+        self.assertListEqual(result, [{'left': 2, 'right': 8}, {'left': 4, 'right': 10}, {'left': 6, 'right': 12}])
+
+    def test_barrier_function_may_empty_queues(self):
+        @stream_barrier
+        def skip_odd(queues):
+            for queue in queues.values():
+                while queue and queue[0] % 2:
+                    queue.popleft()
+            return True
+
+        left = Stream(source=frames_of([1, 2, 3, 5, 4]))
+        right = Stream(source=frames_of([6, 7, 8]))
+        result = run_join(skip_odd(left=left, right=right), left, right)
+        self.assertListEqual(result, [{'left': 2, 'right': 6}, {'left': 4, 'right': 8}])
+
+    def test_output_is_bounded(self):
+        left = Stream(source=frames_of(range(10)))
+        right = Stream(source=frames_of(range(10)))
+        barrier = zip_join(capacity=4, left=left, right=right)
+        Runtime([left, right], quantum=1).run()
+        self.assertEqual(len(barrier._output), 4)
+        self.assertEqual(barrier.dropped_output, 6)
+        self.assertEqual(barrier.source.get_frame(), {'left': 6, 'right': 6})
+
+    def test_streams_must_not_have_a_sink(self):
+        left = Stream(source=frames_of([1]), sink=add_to_list([]))
+        right = Stream(source=frames_of([1]))
+        self.assertRaises(ValueError, zip_join, left=left, right=right)
+        self.assertIsNone(right.sink)
+
+    def test_zip_join(self):
+        left = Stream(source=frames_of('abc'))
+        right = Stream(source=frames_of([1, 2, 3, 4]))
+        result = run_join(zip_join(left=left, right=right), left, right)
+        self.assertListEqual(result, [{'left': 'a', 'right': 1}, {'left': 'b', 'right': 2}, {'left': 'c', 'right': 3}])
+
+    def test_zip_join_is_bounded(self):
+        left = Stream(source=frames_of(range(10)))
+        right = Stream(source=frames_of([]))
+        barrier = zip_join(capacity=3, left=left, right=right)
+        left.run()
+        self.assertDictEqual(barrier.dropped, {'left': 7, 'right': 0})
+
+    def test_key_join(self):
+        orders = Stream(source=frames_of([('o1', 'u1'), ('o2', 'u2'), ('o3', 'u1'), ('o4', 'u3')]))
+        users = Stream(source=frames_of([('u1', 'ann'), ('u2', 'bob'), ('u1', 'ann again')]))
+        barrier = key_join({'orders': lambda order: order[1], 'users': lambda user: user[0]}, orders=orders,
+                           users=users)
+        result = run_join(barrier, orders, users)
+
+        self.assertCountEqual([(join['orders'][0], join['users'][1]) for join in result],
+                              [('o1', 'ann'), ('o2', 'bob'), ('o3', 'ann again')])
+
+    def test_key_join_evicts_oldest_key(self):
+        left = Stream(source=frames_of([1, 2, 3, 1]))
+        right = Stream(source=frames_of([1, 2, 3]))
+        barrier = key_join(lambda frame: frame, capacity=2, left=left, right=right)
+        left.run()
+        self.assertDictEqual(barrier.dropped, {'left': 2, 'right': 0})
+        right.run()
+        self.assertListEqual(list(barrier._output), [{'right': 1, 'left': 1}, {'right': 3, 'left': 3}])
+
+    def test_window_join(self):
+        clicks = Stream(source=frames_of([1.0, 2.0, 5.0, 9.0]))
+        views = Stream(source=frames_of([1.5, 4.5, 8.0]))
+        barrier = window_join(lambda timestamp: timestamp, 1.0, clicks=clicks, views=views)
+        result = run_join(barrier, clicks, views)
+
+        self.assertCountEqual([(join['clicks'], join['views']) for join in result],
+                              [(1.0, 1.5), (2.0, 1.5), (5.0, 4.5), (9.0, 8.0)])
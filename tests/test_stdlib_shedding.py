@@ -0,0 +1,115 @@
+from unittest import TestCase
+
+from strom import *
+from strom.stdlib.shedding import RateLimit, Sample, AdaptiveSample, LatencyShedder
+
+
+@stream_source
+def frames_of(frames):
+    yield from frames
+
+
+def run_elements(elements, frames, batch_size=None):
+    result = []
+    @stream_sink
+    def add_to_list(frame):
+        result.append(frame)
+
+    stream = Stream(source=frames_of(frames), sink=add_to_list())
+    for element in elements:
+        stream.add(element)
+    stream.run(batch_size=batch_size) if batch_size else stream.run()
+    return result
+
+
+class FakeClock:
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestShedding(TestCase):
+
+    def test_rate_limit_passes_burst_then_refills(self):
+        clock = FakeClock()
+        gate = RateLimit(rate=10, burst=3, clock=clock)
+
+        self.assertEqual([gate.transform(i) for i in range(5)], [0, 1, 2, None, None])
+        clock.now = 0.25
+        self.assertEqual([gate.transform(i) for i in range(3)], [0, 1, None])
+        self.assertEqual(gate.admitted, 5)
+        self.assertEqual(gate.dropped, 3)
+        self.assertAlmostEqual(gate.drop_rate, 3 / 8)
+
+    def test_rate_limit_costs(self):
+        gate = RateLimit(rate=1, burst=10, cost=len, clock=FakeClock())
+        self.assertEqual(run_elements([gate], ['abcd', 'efgh', 'ijkl', 'm']), ['abcd', 'efgh', 'm'])
+
+    def test_sample_keeps_share_of_frames(self):
+        gate = Sample(0.25, seed=1)
+        result = run_elements([gate], range(10000), batch_size=100)
+        self.assertAlmostEqual(len(result) / 10000, 0.25, delta=0.02)
+        self.assertEqual(gate.admitted, len(result))
+        self.assertEqual(gate.dropped, 10000 - len(result))
+
+    def test_sample_by_key_keeps_whole_keys(self):
+        frames = [(key, idx) for idx in range(20) for key in range(100)]
+        result = run_elements([Sample(0.5, key=lambda frame: frame[0])], frames)
+        counts = {}
+        for key, _ in result:
+            counts[key] = counts.get(key, 0) + 1
+        self.assertTrue(all(count == 20 for count in counts.values()))
+        self.assertTrue(20 < len(counts) < 80)
+
+    def test_adaptive_sample_bounds_frames_per_interval(self):
+        clock = FakeClock()
+        gate = AdaptiveSample(size=10, interval=1.0, seed=3, clock=clock)
+
+        first = [frame for frame in range(100) if gate.transform(frame) is not None]
+        self.assertEqual(first, list(range(10)))
+
+        clock.now = 1.0
+        second = [frame for frame in range(100) if gate.transform(frame) is not None]
+        self.assertLessEqual(len(second), 10)
+        self.assertGreater(len(second), 0)
+        self.assertNotEqual(second, list(range(len(second))))
+        self.assertEqual(gate.admitted + gate.dropped, 200)
+
+    def test_latency_shedder_drops_while_over_target(self):
+        clock = FakeClock(100.0)
+        shedder = LatencyShedder(target=1.0, time=lambda frame: frame, step=0.1, seed=0, wall_clock=clock)
+
+        stale = [shedder.transform(50.0) for _ in range(100)]
+        self.assertAlmostEqual(shedder.drop_probability, 0.99)
+        self.assertGreater(shedder.dropped, 50)
+        self.assertEqual(shedder.admitted, sum(1 for frame in stale if frame is not None))
+
+        for _ in range(200):
+            shedder.transform(100.0)
+        self.assertEqual(shedder.drop_probability, 0.0)
+        self.assertEqual(shedder.transform(100.0), 100.0)
+
+    def test_latency_probe_measures_downstream_time(self):
+        clock = FakeClock()
+        shedder = LatencyShedder(target=0.5, step=0.5, clock=clock)
+
+        @stream_transformer
+        def slow(frame):
+            clock.now += 1.0
+            return frame
+
+        result = run_elements([shedder, slow(), shedder.probe()], range(20))
+        self.assertAlmostEqual(shedder.latency, 1.0)
+        self.assertGreater(shedder.dropped, 0)
+        self.assertEqual(len(result), shedder.admitted)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            RateLimit(rate=0)
+        with self.assertRaises(ValueError):
+            Sample(1.5)
+        with self.assertRaises(ValueError):
+            AdaptiveSample(size=0)
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from strom import *
+from strom.stdlib import CsvSink, CsvSource, JsonLinesSink
+
+
+@stream_source
+def records(count):
+    for idx in range(count):
+        yield {'id': idx, 'name': 'name%d' % idx}
+
+
+class TestFileSinks(TestCase):
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def run_stream(self, sink, count=25):
+        stream = Stream()
+        stream.source = records(count)
+        stream.sink = sink
+        stream.run()
+
+    def test_csv_round_trip(self):
+        self.run_stream(CsvSink(self.filename, batch_size=10))
+
+        result = []
+        stream = Stream()
+        stream.source = CsvSource(self.filename, dtype={'id': int})
+        stream.sink = stream_sink(result.append)()
+        stream.run()
+        self.assertListEqual(result, [{'id': idx, 'name': 'name%d' % idx} for idx in range(25)])
+
+    def test_csv_sequences_and_append(self):
+        self.run_stream(CsvSink(self.filename, columns=['id', 'name'], batch_size=4))
+        stream = Stream()
+        stream.source = stream_source(lambda: [(25, 'name25')], all_at_once=True)()
+        stream.sink = CsvSink(self.filename, columns=['id', 'name'], append=True)
+        stream.run()
+
+        with open(self.filename) as csv_file:
+            lines = csv_file.read().splitlines()
+        self.assertEqual(lines[0], 'id;name')
+        self.assertEqual(len(lines), 27)
+        self.assertEqual(lines[-1], '25;name25')
+
+    def test_json_lines(self):
+        self.run_stream(JsonLinesSink(self.filename, batch_size=7, background=True))
+
+        with open(self.filename) as json_file:
+            result = [json.loads(line) for line in json_file]
+        self.assertListEqual(result, [{'id': idx, 'name': 'name%d' % idx} for idx in range(25)])
@@ -0,0 +1,204 @@
+import os
+import struct
+import tempfile
+import threading
+import time
+from unittest import TestCase, skipUnless
+
+from strom import *
+from strom.stdlib import CsvSource, QueueSource, RecordSource, SelectorSource
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _frames(source):
+    while not source.is_closed():
+        yield source.get_frame()
+
+
+class TestCsvSource(TestCase):
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as csv_file:
+            csv_file.write('id;name;score\n')
+            for idx in range(25):
+                csv_file.write('%d;name%d;%f\n' % (idx, idx, idx / 2))
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_rows_in_order(self):
+        source = CsvSource(self.filename)
+        self.assertDictEqual(source.get_frame(), {'id': '0', 'name': 'name0', 'score': '0.000000'})
+        self.assertDictEqual(source.get_frame(), {'id': '1', 'name': 'name1', 'score': '0.500000'})
+
+    def test_usecols_and_dtype(self):
+        sink_result = []
+        @stream_sink
+        def add_to_list(frame):
+            sink_result.append(frame)
+
+        stream = Stream()
+        stream.source = CsvSource(self.filename, usecols=['score', 'id'], dtype={'id': int, 'score': float})
+        stream.sink = add_to_list()
+        stream.run()
+
+        self.assertEqual(len(sink_result), 25)
+        self.assertDictEqual(sink_result[-1], {'score': 12.0, 'id': 24})
+
+    def test_blank_lines_are_skipped(self):
+        with open(self.filename, 'w') as csv_file:
+            csv_file.write('a;b\n1;2\n\n3;4\n\n')
+
+        rows = [frame for frame in _frames(CsvSource(self.filename))]
+        self.assertEqual(rows, [{'a': '1', 'b': '2'}, {'a': '3', 'b': '4'}])
+        rows = [frame for frame in _frames(CsvSource(self.filename, usecols=['b'], dtype={'b': int}))]
+        self.assertEqual(rows, [{'b': 2}, {'b': 4}])
+
+    def test_unknown_column(self):
+        source = CsvSource(self.filename, usecols=['foo'])
+        self.assertRaises(ValueError, source.get_frame)
+
+    @skipUnless(pandas, 'requires pandas')
+    def test_chunks(self):
+        source = CsvSource(self.filename, chunks=True, chunksize=10, usecols=['id'])
+        chunks = []
+        while not source.is_closed():
+            chunks.append(source.get_frame())
+
+        self.assertListEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertListEqual(list(chunks[0].columns), ['id'])
+
+
+class TestRecordSource(TestCase):
+
+    RECORD = struct.Struct('<id')
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp(suffix='.bin')
+        with os.fdopen(handle, 'wb') as record_file:
+            for idx in range(10):
+                record_file.write(self.RECORD.pack(idx, idx / 2))
+            record_file.write(b'partial')
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def read_all(self, source, batch_size=None):
+        result = []
+        @stream_sink
+        def unpack(frame):
+            result.extend(self.RECORD.iter_unpack(frame))
+
+        stream = Stream()
+        stream.source = source
+        stream.sink = unpack()
+        stream.run(batch_size=batch_size)
+        return result
+
+    def test_records(self):
+        source = RecordSource(self.filename, record_size=self.RECORD.size)
+        frame = source.get_frame()
+        self.assertIsInstance(frame, memoryview)
+        self.assertEqual(self.RECORD.unpack_from(frame), (0, 0.0))
+        self.assertListEqual(self.read_all(source), [(idx, idx / 2) for idx in range(1, 10)])
+
+    def test_frames_of_many_records_and_seek(self):
+        source = RecordSource(self.filename, record_size=self.RECORD.size, records_per_frame=4, start=2)
+        self.assertEqual(len(source.get_frame()), 4 * self.RECORD.size)
+        self.assertEqual(source.position(), 6)
+
+        source.seek(5)
+        self.assertListEqual(self.read_all(source, batch_size=2), [(idx, idx / 2) for idx in range(5, 10)])
+        self.assertTrue(source.is_closed())
+        self.assertRaises(ValueError, source.seek, 0)
+        self.assertTrue(source.is_closed())
+
+    def test_empty_file(self):
+        with open(self.filename, 'wb'):
+            pass
+        self.assertTrue(RecordSource(self.filename, record_size=8).is_closed())
+
+    @skipUnless(numpy, 'requires numpy')
+    def test_structured_arrays(self):
+        source = RecordSource(self.filename, dtype=[('id', '<i4'), ('score', '<f8')], records_per_frame=4)
+        frames = []
+        while not source.is_closed():
+            frames.append(source.get_frame())
+        self.assertListEqual([len(frame) for frame in frames], [4, 4, 2])
+        self.assertListEqual(list(frames[1]['id']), [4, 5, 6, 7])
+
+
+class TestWaitingSources(TestCase):
+
+    def test_queue_source_wakes_up(self):
+        source = QueueSource()
+        arrivals = []
+
+        @stream_sink
+        def record_arrival(frame):
+            arrivals.append((frame, time.perf_counter()))
+
+        def produce():
+            for idx in range(3):
+                time.sleep(0.05)
+                source.put(time.perf_counter())
+            source.close()
+
+        producer = threading.Thread(target=produce)
+        cpu_start = time.process_time()
+        producer.start()
+        Stream(source=source, sink=record_arrival()).run()
+        producer.join()
+        cpu_time = time.process_time() - cpu_start
+
+        self.assertEqual(len(arrivals), 3)
+        self.assertLess(max(arrived - sent for sent, arrived in arrivals), 0.02)
+        # the stream slept while waiting rather than spinning through 150ms of idle time
+        self.assertLess(cpu_time, 0.075)
+
+    def test_idle_timeout(self):
+        source = QueueSource()
+        source.put(1)
+        sink_result = []
+
+        @stream_sink
+        def add_to_list(frame):
+            sink_result.append(frame)
+
+        start = time.monotonic()
+        Stream(source=source, sink=add_to_list()).run(idle_timeout=0.05)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertListEqual(sink_result, [1])
+        self.assertFalse(source.is_closed())
+
+    def test_selector_source(self):
+        read_end, write_end = os.pipe()
+
+        def produce():
+            for chunk in [b'abc', b'def']:
+                time.sleep(0.02)
+                os.write(write_end, chunk)
+            os.close(write_end)
+
+        sink_result = []
+        @stream_sink
+        def add_to_list(frame):
+            sink_result.append(frame)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        Stream(source=SelectorSource(read_end), sink=add_to_list()).run()
+        producer.join()
+        os.close(read_end)
+
+        self.assertEqual(b''.join(sink_result), b'abcdef')
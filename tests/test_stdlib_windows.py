@@ -0,0 +1,72 @@
+import math
+import random
+import statistics
+from unittest import TestCase
+
+from strom import *
+from strom.stdlib.windows import SlidingWindow, TumblingWindow, SessionWindow, Count, Sum, Mean, Variance, Min, Max
+
+
+@stream_source
+def frames_of(frames):
+    yield from frames
+
+
+def run_window(window, frames):
+    result = []
+    @stream_sink
+    def add_to_list(frame):
+        result.append(frame)
+
+    stream = Stream(source=frames_of(frames), sink=add_to_list())
+    stream.add(window)
+    stream.run()
+    return result
+
+
+class TestWindows(TestCase):
+
+    def test_sliding_count_window_matches_recomputation(self):
+        values = [random.randint(-100, 100) for _ in range(200)]
+        window = SlidingWindow({'count': Count, 'sum': Sum, 'mean': Mean, 'var': Variance, 'min': Min, 'max': Max},
+                               size=7)
+        results = run_window(window, values)
+
+        self.assertEqual(len(results), 200)
+        for idx, result in enumerate(results):
+            expected = values[max(0, idx - 6):idx + 1]
+            self.assertEqual(result['count'], len(expected))
+            self.assertEqual(result['sum'], sum(expected))
+            self.assertEqual(result['min'], min(expected))
+            self.assertEqual(result['max'], max(expected))
+            self.assertAlmostEqual(result['mean'], statistics.mean(expected))
+            if len(expected) > 1:
+                self.assertAlmostEqual(result['var'], statistics.variance(expected), places=6)
+            else:
+                self.assertTrue(math.isnan(result['var']))
+
+    def test_sliding_time_window(self):
+        frames = [(0.0, 1), (0.5, 2), (1.2, 3), (3.0, 4)]
+        window = SlidingWindow({'sum': Sum}, duration=1.0, value=lambda f: f[1], time=lambda f: f[0])
+        self.assertListEqual([result['sum'] for result in run_window(window, frames)], [1, 3, 5, 4])
+
+    def test_tumbling_count_window(self):
+        results = run_window(TumblingWindow({'sum': Sum, 'max': Max}, size=3), range(8))
+        self.assertListEqual(results, [{'sum': 3, 'max': 2}, {'sum': 12, 'max': 5}, {'sum': 13, 'max': 7}])
+
+    def test_tumbling_time_window(self):
+        frames = [0.1, 0.5, 1.1, 1.9, 4.2]
+        results = run_window(TumblingWindow({'count': Count}, duration=1.0, time=lambda f: f), frames)
+        self.assertListEqual(results, [{'count': 2, 'start': 0.0, 'end': 1.0}, {'count': 2, 'start': 1.0, 'end': 2.0},
+                                       {'count': 1, 'start': 4.0, 'end': 5.0}])
+
+    def test_session_window(self):
+        frames = [0.0, 0.3, 0.5, 2.0, 2.4, 5.0]
+        results = run_window(SessionWindow({'count': Count}, gap=1.0, time=lambda f: f), frames)
+        self.assertListEqual(results, [{'count': 3, 'start': 0.0, 'end': 0.5}, {'count': 2, 'start': 2.0, 'end': 2.4},
+                                       {'count': 1, 'start': 5.0, 'end': 5.0}])
+
+    def test_window_extent(self):
+        self.assertRaises(ValueError, SlidingWindow, {'sum': Sum})
+        self.assertRaises(ValueError, TumblingWindow, {'sum': Sum}, size=2, duration=1.0)
+        self.assertRaises(ValueError, SlidingWindow, {}, size=2)